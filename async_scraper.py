@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Asyncio crawl engine for the division-district listing
+Reads the page count of every combination from its first page and spreads
+the remaining pages of all combinations over one shared, bounded pool of
+concurrent requests, paced by the shared adaptive rate controller.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+import aiohttp
+
+from division_district_scraper import DivisionDistrictScraper, REQUEST_HEADERS, SHARD_LEVELS, parse_fighters_page
+from listing_parser import available_backends, default_backend
+from rate_controller import (AdaptiveRateController, OK, THROTTLED, TIMEOUT, SERVER_ERROR,
+                             classify_status, parse_retry_after)
+from parse_pipeline import page_file_name
+from scrape_metrics import add_metrics_arguments, metrics_export, set_combination, set_worker
+
+
+class AsyncDivisionDistrictScraper(DivisionDistrictScraper):
+    def __init__(self, concurrency=16, requests_per_second=10.0, parse_workers=0,
+                 save_pages_dir=None, **kwargs):
+        super().__init__(**kwargs)
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.rate_controller = AdaptiveRateController(
+            initial_rate=min(requests_per_second or 5.0, 5.0),
+            max_rate=requests_per_second or None,
+            max_concurrency=concurrency,
+        )
+        self.parse_workers = parse_workers
+        self.save_pages_dir = save_pages_dir
+        self.parse_pool = None
+
+    async def fetch_page(self, http, combination, page):
+        """Fetch one listing page, returning the raw HTML bytes or None on failure"""
+        url = f"{self.base_url}/freedom-fighter-list"
+        params = {k: str(v) for k, v in self.build_page_params(combination, page).items()}
+        host = urlparse(url).netloc
+        error = None
+
+        cached, conditional = self.cache_lookup(combination, page)
+        if cached is not None:
+            return cached
+
+        failures = throttles = 0
+        while True:
+            with self.metrics.time('rate_wait'):
+                await self.rate_controller.acquire_async(host)
+            start = time.monotonic()
+            retry_after = None
+            body = None
+            outcome = SERVER_ERROR
+            try:
+                async with http.get(url, params=params, headers=conditional) as response:
+                    outcome = classify_status(response.status)
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    error = f"HTTP {response.status}"
+                    if outcome == OK:
+                        body = self.cache_response(combination, page, response.status,
+                                                   await response.read(), response.headers)
+            except asyncio.TimeoutError:
+                outcome, error = TIMEOUT, 'timeout'
+            except aiohttp.ClientError as e:
+                outcome, error = SERVER_ERROR, e
+            except Exception:
+                outcome = SERVER_ERROR  # Counted as a failed request, then raised to the caller
+                raise
+            finally:
+                # Always give back the in-flight slot (and a half-open breaker's probe)
+                self.rate_controller.release(host, outcome, time.monotonic() - start, retry_after)
+                self.metrics.observe('fetch', time.monotonic() - start)
+
+            if outcome == OK:
+                if body is not None:
+                    return body
+                conditional = {}  # Cached copy vanished after a 304; fetch it in full
+                continue
+            if outcome == THROTTLED:
+                throttles += 1
+            else:
+                failures += 1
+            if not self.retry_policy.should_retry(outcome, failures, throttles):
+                break
+
+            delay = max(self.retry_policy.delay(failures + throttles - 1), retry_after or 0)
+            self.rate_controller.record_retry()
+            self.metrics.count('retries')
+            self.log(f"  Retrying page {page} for {combination['key']} in {delay:.1f}s ({error})")
+            await asyncio.sleep(delay)
+
+        self.metrics.count('failed_pages')
+        print(f"Error fetching page {page} for {combination['key']} after {failures + throttles} failed attempts: {error}")
+        return None
+
+    async def parse_page(self, combination, page, html_content):
+        """Parse a page in the process pool if one is configured, else inline"""
+        if self.save_pages_dir:
+            with open(os.path.join(self.save_pages_dir, page_file_name(combination['key'], page)), 'wb') as f:
+                f.write(html_content)
+        with self.metrics.time('parse'):
+            if self.parse_pool is None:
+                return parse_fighters_page(html_content, combination, self.parser_backend)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.parse_pool, parse_fighters_page,
+                                              html_content, combination, self.parser_backend)
+
+    async def worker(self, queue, http, worker_id=0):
+        """Take (combination, page) work items off the shared queue until cancelled"""
+        set_worker(worker_id)
+        while True:
+            combination, page = await queue.get()
+            set_combination(combination['key'])
+            try:
+                html_content = await self.fetch_page(http, combination, page)
+                if html_content is not None:
+                    parsed = await self.parse_page(combination, page, html_content)
+                    for next_page in self.handle_page(combination, page, parsed):
+                        queue.put_nowait((combination, next_page))
+            except Exception as e:
+                print(f"Error processing page {page} for {combination['key']}: {e}")
+            finally:
+                queue.task_done()
+
+    async def crawl(self, combinations):
+        """Crawl every combination through one shared pool of requests"""
+        queue = asyncio.Queue()
+        for combination in combinations:
+            # Pages of combinations whose count is already known are queued up front
+            total_pages = self.progress['completed_combinations'].get(combination['key'], {}).get('total_pages', 0)
+            self.plan.add(combination, total_pages)
+            for page in range(combination['start_page'], max(total_pages, combination['start_page']) + 1):
+                queue.put_nowait((combination, page))
+
+        if self.save_pages_dir:
+            os.makedirs(self.save_pages_dir, exist_ok=True)
+        if self.parse_workers:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ssl=False)
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=REQUEST_HEADERS) as http:
+            workers = [asyncio.create_task(self.worker(queue, http, worker_id))
+                       for worker_id in range(self.concurrency)]
+            await queue.join()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown()
+            self.parse_pool = None
+
+    def run_scraping(self, max_workers=None):
+        """Run the asyncio crawl over all pending combinations"""
+        if max_workers:
+            self.concurrency = max_workers
+        combinations = self.generate_combinations()
+
+        print(f"Starting async division-district scraper")
+        print(f"Total combinations to process: {len(combinations)} ({self.shard_by} level)")
+        print(f"Concurrency: up to {self.concurrency} requests, rate limit: {self.requests_per_second or 'none'} req/s (adaptive)")
+        print(f"Existing fighters in CSV: {len(self.existing_fighters)}")
+
+        if not combinations:
+            print("All division-district combinations have been processed!")
+            return
+
+        start_time = time.time()
+        try:
+            asyncio.run(self.crawl(combinations))
+            residual = self.generate_residual_combinations()
+            if residual:
+                print(f"Checking {len(residual)} sharded districts for fighters outside every shard")
+                asyncio.run(self.crawl(residual))
+        finally:
+            self.checkpoint_progress()
+            self.sink.close()
+        elapsed_time = time.time() - start_time
+
+        fetched, planned, completed, total = self.plan.totals()
+        print(f"\nAsync division-district scraping completed!")
+        print(f"Total time: {elapsed_time:.2f} seconds")
+        print(f"Total new records found: {sum(self.plan.new_records(key) for key in self.plan.states)}")
+        print(f"Pages fetched: {fetched}/{planned} planned")
+        print(f"Combinations left incomplete: {total - completed}")
+        self.report_incomplete()
+        print(f"Request pacing: {self.rate_controller.snapshot()}")
+        if self.response_cache is not None:
+            print(f"Response cache: {self.response_cache.summary()}")
+        print(f"Total existing fighters: {len(self.existing_fighters)}")
+        print(f"CSV file: {self.csv_file}")
+        print(f"Stage timings (all workers):\n{self.metrics.report()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Async division-district freedom fighter scraper')
+    parser.add_argument('--concurrency', type=int, default=16, help='Maximum concurrent requests across all districts')
+    parser.add_argument('--rate', type=float, default=10.0, help='Maximum global request rate (requests/sec, 0 = unlimited); the controller adapts below it')
+    parser.add_argument('--base-url', default='https://mis.molwa.gov.bd', help='Listing site root (e.g. a local stand-in server)')
+    parser.add_argument('--parser', choices=available_backends(), default=default_backend(), help='Listing page parser backend')
+    parser.add_argument('--parse-workers', type=int, default=0, help='Parser processes (0 = parse on the event loop)')
+    parser.add_argument('--shard-by', choices=SHARD_LEVELS, default='district',
+                        help='Work unit size: whole districts, upazilas, or upazila x prove type')
+    parser.add_argument('--save-pages', help='Directory to save raw listing pages to, for offline replay')
+    parser.add_argument('--cache-dir', help='Directory for the conditional-request response cache')
+    parser.add_argument('--cache-max-age', type=float, default=0,
+                        help='Serve cached pages younger than this many seconds without a request (0 = always revalidate)')
+    parser.add_argument('--location-file', default='location_data.json')
+    parser.add_argument('--csv-file', default='../freedom_fighters_data.csv')
+    parser.add_argument('--progress-file', default='division_district_progress.json')
+    parser.add_argument('--status', action='store_true', help='Print per-district completion from the progress file and exit')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    scraper = AsyncDivisionDistrictScraper(
+        concurrency=args.concurrency,
+        requests_per_second=args.rate,
+        parse_workers=args.parse_workers,
+        save_pages_dir=args.save_pages,
+        csv_file=args.csv_file,
+        progress_file=args.progress_file,
+        location_file=args.location_file,
+        base_url=args.base_url,
+        parser_backend=args.parser,
+        shard_by=args.shard_by,
+        cache_dir=args.cache_dir,
+        cache_max_age=args.cache_max_age,
+    )
+    if args.status:
+        scraper.print_status()
+        return
+    export = metrics_export(scraper.metrics, args)
+    try:
+        scraper.run_scraping()
+    finally:
+        export.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Consolidated Parquet dataset built from the fighters/*.json release files
+Worker processes each parse a chunk of JSON files into three tables and
+stage them as Parquet parts; the parts are then repartitioned by district
+(hive layout, district=<name>/) into:
+  fighters/         one row per fighter, basic_info flattened to basic_info.<field>
+  prove_documents/  one row per document, keyed by fighter_number
+  waris_info/       one row per heir, keyed by fighter_number
+load_table/load_dataframe read only the columns and districts asked for.
+Needs pyarrow (and pandas for DataFrames). Run with --benchmark to compare
+load time and peak RSS against the per-file JSON path.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    ds = None
+    pq = None
+
+from fighter_index import normalize_fighter_number
+
+TABLES = ('fighters', 'prove_documents', 'waris_info')
+PARTITION_COLUMN = 'district'
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the columnar dataset")
+
+
+def _scalar(value):
+    """Store every field as text; nested values are kept as JSON"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def flatten_record(record):
+    """Split one fighter record into (fighter row, document rows, heir rows)"""
+    fighter_number = record.get('fighter_number')
+    basic_info = record.get('basic_info') or {}
+    district = _scalar(basic_info.get('district')) or None
+    key = {'fighter_number': fighter_number, PARTITION_COLUMN: district}
+
+    fighter = dict(key)
+    fighter['fighter_number_int'] = normalize_fighter_number(fighter_number or '')
+    for field in ('detail_url', 'fighter_photo_url', 'scraped_at'):
+        fighter[field] = _scalar(record.get(field))
+    for field, value in basic_info.items():
+        fighter[f"basic_info.{field}"] = _scalar(value)
+
+    children = []
+    for field in ('prove_documents', 'waris_info'):
+        rows = []
+        for position, item in enumerate(record.get(field) or []):
+            row = dict(key, position=position)
+            if isinstance(item, dict):
+                row.update((name, _scalar(value)) for name, value in item.items())
+            else:
+                row['value'] = _scalar(item)
+            rows.append(row)
+        children.append(rows)
+    return fighter, children[0], children[1]
+
+
+def _table(rows):
+    """Arrow table of string columns (fighter_number_int and position stay integers)"""
+    columns = {}
+    for row in rows:
+        for name in row:
+            columns.setdefault(name, None)
+    fields = [pa.field(name, pa.int64() if name in ('fighter_number_int', 'position') else pa.string())
+              for name in columns]
+    return pa.Table.from_pylist(rows, schema=pa.schema(fields))
+
+
+def build_chunk(chunk_id, paths, staging_dir):
+    """Worker entry point: parse a chunk of JSON files into staged Parquet parts"""
+    tables = ([], [], [])
+    errors = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+            fighter, documents, heirs = flatten_record(record)
+        except Exception as e:
+            errors.append(f"{os.path.basename(path)}: {e}")
+            continue
+        tables[0].append(fighter)
+        tables[1].extend(documents)
+        tables[2].extend(heirs)
+
+    for name, rows in zip(TABLES, tables):
+        if rows:
+            pq.write_table(_table(rows), os.path.join(staging_dir, name, f"part-{chunk_id:05d}.parquet"))
+    return len(tables[0]), errors
+
+
+def fighter_files(fighters_dir):
+    """Sorted paths of the fighter JSON files"""
+    return sorted(entry.path for entry in os.scandir(fighters_dir)
+                  if entry.is_file() and entry.name.endswith('.json'))
+
+
+def build_dataset(fighters_dir, out_dir, workers=None, chunk_size=5000):
+    """Build the partitioned Parquet tables; returns (records, errors)"""
+    _require_pyarrow()
+    paths = fighter_files(fighters_dir)
+    staging_dir = os.path.join(out_dir, '_staging')
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    for name in TABLES:
+        os.makedirs(os.path.join(staging_dir, name))
+
+    records = 0
+    errors = []
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(build_chunk, chunk_id, chunk, staging_dir)
+                   for chunk_id, chunk in enumerate(chunks)]
+        for done, future in enumerate(futures, 1):
+            count, chunk_errors = future.result()
+            records += count
+            errors.extend(chunk_errors)
+            print(f"  Parsed chunk {done}/{len(chunks)} ({records} records)")
+
+    partitioning = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor='hive')
+    for name in TABLES:
+        parts = sorted(os.path.join(staging_dir, name, part)
+                       for part in os.listdir(os.path.join(staging_dir, name)))
+        target = os.path.join(out_dir, name)
+        shutil.rmtree(target, ignore_errors=True)
+        if not parts:
+            continue
+        # Chunks can see different basic_info/document fields; missing ones become nulls
+        schema = pa.unify_schemas([pq.read_schema(part) for part in parts])
+        ds.write_dataset(ds.dataset(parts, schema=schema, format='parquet'), target,
+                         format='parquet', partitioning=partitioning,
+                         basename_template='part-{i}.parquet',
+                         existing_data_behavior='delete_matching')
+    shutil.rmtree(staging_dir)
+
+    with open(os.path.join(out_dir, 'dataset_info.json'), 'w', encoding='utf-8') as f:
+        json.dump({'records': records, 'errors': len(errors), 'source': os.path.abspath(fighters_dir),
+                   'built_at': datetime.now().isoformat(), 'tables': list(TABLES)},
+                  f, ensure_ascii=False, indent=2)
+    return records, errors
+
+
+def open_table(dataset_dir, table='fighters'):
+    """pyarrow Dataset for one table of a built dataset"""
+    _require_pyarrow()
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table!r}; expected one of {TABLES}")
+    partitioning = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor='hive')
+    return ds.dataset(os.path.join(dataset_dir, table), format='parquet', partitioning=partitioning)
+
+
+def load_table(dataset_dir, table='fighters', columns=None, districts=None):
+    """Read a table as a pyarrow Table, only the given columns and districts (partition pruning)"""
+    dataset = open_table(dataset_dir, table)
+    row_filter = ds.field(PARTITION_COLUMN).isin(list(districts)) if districts else None
+    return dataset.to_table(columns=columns, filter=row_filter)
+
+
+def load_dataframe(dataset_dir, table='fighters', columns=None, districts=None):
+    """Like load_table, as a pandas DataFrame (column names match pd.json_normalize)"""
+    return load_table(dataset_dir, table, columns, districts).to_pandas()
+
+
+def _peak_rss_mb():
+    # ru_maxrss survives exec on Linux, so a spawned child would report its
+    # parent's peak; VmHWM belongs to the child's own address space
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1e3
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def _load_json_files(fighters_dir):
+    import pandas as pd
+    from pathlib import Path
+    data = []
+    for path in Path(fighters_dir).glob('*.json'):
+        with open(path, encoding='utf-8') as f:
+            data.append(json.load(f))
+    return len(pd.json_normalize(data))
+
+
+def _load_parquet(dataset_dir, columns, districts):
+    return len(load_dataframe(dataset_dir, 'fighters', columns, districts))
+
+
+def _timed(result_queue, function, *args):
+    start = time.perf_counter()
+    rows = function(*args)
+    result_queue.put((rows, time.perf_counter() - start, _peak_rss_mb()))
+
+
+def benchmark(fighters_dir, dataset_dir, district=None):
+    """Time each load path in a fresh process so peak RSS is not shared"""
+    context = multiprocessing.get_context('spawn')
+    runs = [
+        ('per-file JSON + json_normalize', _load_json_files, (fighters_dir,)),
+        ('Parquet, all fighter columns', _load_parquet, (dataset_dir, None, None)),
+        ('Parquet, 3 columns', _load_parquet, (dataset_dir, ['fighter_number', 'basic_info.name', PARTITION_COLUMN], None)),
+    ]
+    if district:
+        runs.append((f"Parquet, district={district}", _load_parquet, (dataset_dir, None, [district])))
+
+    print(f"{'load path':<36}{'rows':>10}{'seconds':>10}{'peak RSS MB':>14}")
+    for label, function, args in runs:
+        result_queue = context.Queue()
+        process = context.Process(target=_timed, args=(result_queue, function) + args)
+        process.start()
+        rows, elapsed, peak = result_queue.get()
+        process.join()
+        print(f"{label:<36}{rows:>10}{elapsed:>10.2f}{peak:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or benchmark the Parquet dataset from fighters/*.json')
+    parser.add_argument('--fighters-dir', default='fighters')
+    parser.add_argument('--out', default='fighters_parquet', help='Output directory for the Parquet tables')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Parser processes')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='JSON files per worker task')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='First write this many synthetic fighter files to --fighters-dir (for benchmarking)')
+    parser.add_argument('--location-file', default='location_data.json', help='Used with --synthetic')
+    parser.add_argument('--benchmark', action='store_true', help='Compare load time and peak RSS with the JSON files')
+    parser.add_argument('--district', help='District name to time a partition-pruned load with --benchmark')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        from fake_molwa_server import FakeMolwaData, write_fighter_files
+        with open(args.location_file, 'r', encoding='utf-8') as f:
+            location_data = json.load(f)
+        per_district = -(-args.synthetic // sum(len(d) for d in location_data['districts'].values()))
+        written = write_fighter_files(FakeMolwaData(location_data, default_size=per_district),
+                                      args.fighters_dir, limit=args.synthetic)
+        print(f"Wrote {written} synthetic fighter files to {args.fighters_dir}")
+
+    start = time.perf_counter()
+    records, errors = build_dataset(args.fighters_dir, args.out, args.workers, args.chunk_size)
+    print(f"Built {args.out} from {records} records in {time.perf_counter() - start:.2f} seconds "
+          f"with {args.workers} workers ({len(errors)} unreadable files)")
+    for error in errors[:10]:
+        print(f"  {error}")
+
+    if args.benchmark:
+        benchmark(args.fighters_dir, args.out, args.district)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Single-pass statistics over the full fighter dataset
+The rollups of sample-analysis.ipynb are computed here without a
+DataFrame:
+- division, district and upazila counts and living status
+- document types and heir relationships
+- photo coverage and basic_info field completeness
+Worker processes reduce chunks of fighters/*.json files (or block ranges
+of a fighter_archive.py pack) to a partial Rollup. Partial rollups are
+counters, so they merge by addition and memory stays bounded by the
+number of distinct values, not the number of records.
+For a directory, a SQLite state file keeps each file's size, mtime and
+the small tuple of facts it contributed. A later run only reads new and
+changed files, subtracts the facts of changed and deleted ones, and
+adds the new facts. The result goes to a summary file with a format
+version and a revision that increases with every update.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+FORMAT_VERSION = 1
+COMPLETENESS_FIELDS = ('name', 'father_name', 'mother_name', 'living_status', 'division',
+                       'district', 'upazila', 'post_office', 'village')
+TOTALS = ('records', 'fighters_with_photos', 'fighters_with_documents', 'documents',
+          'fighters_with_heirs', 'heirs', 'heirs_with_photos')
+COUNTERS = ('divisions', 'districts', 'upazilas', 'living_status', 'document_types',
+            'relationships', 'fields_filled')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER, mtime_ns INTEGER,
+    facts TEXT                        -- record_facts() as JSON, NULL if the file was unreadable
+);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def record_facts(record):
+    """The part of one record the rollups depend on, small enough to keep per file"""
+    basic = record.get('basic_info')
+    if not isinstance(basic, dict):
+        basic = {}
+    documents = [document.get('document_type') or 'Unknown'
+                 for document in record.get('prove_documents') or [] if isinstance(document, dict)]
+    heirs = [heir for heir in record.get('waris_info') or [] if isinstance(heir, dict)]
+    filled = sum(1 << i for i, field in enumerate(COMPLETENESS_FIELDS) if basic.get(field))
+    return [basic.get('division') or '', basic.get('district') or '', basic.get('upazila') or '',
+            basic.get('living_status') or '', documents,
+            [heir.get('relationship') or 'Unknown' for heir in heirs],
+            sum(1 for heir in heirs if heir.get('photo_url')),
+            bool(record.get('fighter_photo_url')), filled]
+
+
+class Rollup:
+    """Mergeable totals and counters; add(facts, -1) takes a record back out"""
+
+    def __init__(self):
+        self.totals = dict.fromkeys(TOTALS, 0)
+        self.counters = {name: Counter() for name in COUNTERS}
+
+    def add(self, facts, sign=1):
+        division, district, upazila, status, documents, relationships, heir_photos, has_photo, filled = facts
+        totals = self.totals
+        counters = self.counters
+        totals['records'] += sign
+        totals['fighters_with_photos'] += sign * has_photo
+        totals['fighters_with_documents'] += sign * bool(documents)
+        totals['documents'] += sign * len(documents)
+        totals['fighters_with_heirs'] += sign * bool(relationships)
+        totals['heirs'] += sign * len(relationships)
+        totals['heirs_with_photos'] += sign * heir_photos
+        if division:
+            counters['divisions'][division] += sign
+        if district:
+            counters['districts'][district] += sign
+        if upazila:
+            counters['upazilas'][f"{district}/{upazila}"] += sign
+        if status:
+            counters['living_status'][status] += sign
+        for document_type in documents:
+            counters['document_types'][document_type] += sign
+        for relationship in relationships:
+            counters['relationships'][relationship] += sign
+        for i, field in enumerate(COMPLETENESS_FIELDS):
+            if filled >> i & 1:
+                counters['fields_filled'][field] += sign
+
+    def merge(self, other):
+        for name, value in other.totals.items():
+            self.totals[name] += value
+        for name, counter in other.counters.items():
+            self.counters[name].update(counter)
+        return self
+
+    def to_dict(self):
+        return {'totals': dict(self.totals),
+                'counters': {name: {key: count for key, count in counter.most_common() if count}
+                             for name, counter in self.counters.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        rollup = cls()
+        rollup.totals.update(data['totals'])
+        for name, counts in data['counters'].items():
+            rollup.counters[name].update(counts)
+        return rollup
+
+    def summary(self):
+        """The notebook's statistics: counts, shares and averages"""
+        totals = self.to_dict()['totals']
+        counters = self.to_dict()['counters']
+        records = totals['records']
+
+        def percent(count, whole=records):
+            return round(100 * count / whole, 2) if whole else 0.0
+
+        return {
+            'records': records,
+            'divisions': counters['divisions'],
+            'districts': counters['districts'],
+            'upazilas': counters['upazilas'],
+            'living_status': counters['living_status'],
+            'document_types': counters['document_types'],
+            'relationship_types': counters['relationships'],
+            'photo_coverage': {
+                'fighters_with_photos': totals['fighters_with_photos'],
+                'fighters_with_photos_percent': percent(totals['fighters_with_photos']),
+                'heirs_with_photos': totals['heirs_with_photos'],
+                'heirs_with_photos_percent': percent(totals['heirs_with_photos'], totals['heirs']),
+            },
+            'data_quality': {
+                'fighters_with_documents': totals['fighters_with_documents'],
+                'fighters_with_heirs': totals['fighters_with_heirs'],
+                'avg_documents_per_fighter': round(totals['documents'] / records, 3) if records else 0.0,
+                'avg_heirs_per_fighter': round(totals['heirs'] / records, 3) if records else 0.0,
+            },
+            'field_completeness': {field: {'filled': counters['fields_filled'].get(field, 0),
+                                           'percent': percent(counters['fields_filled'].get(field, 0))}
+                                   for field in COMPLETENESS_FIELDS},
+        }
+
+
+def rollup_files(directory, entries):
+    """Worker entry point: a partial rollup and the state rows for a chunk of (name, size, mtime_ns)"""
+    rollup = Rollup()
+    rows = []
+    for name, size, mtime_ns in entries:
+        try:
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                facts = record_facts(json.load(f))
+        except (OSError, ValueError, AttributeError):
+            facts = None  # Unreadable, or not a JSON object; retried once the file changes
+        if facts is not None:
+            rollup.add(facts)
+        rows.append((name, size, mtime_ns, None if facts is None else json.dumps(facts, ensure_ascii=False)))
+    return rollup, rows
+
+
+def rollup_archive_blocks(archive_path, start_block, stop_block):
+    """Worker entry point: a partial rollup and record count for a block range of a packed archive"""
+    from fighter_archive import FighterArchive
+    rollup = Rollup()
+    records = 0
+    with FighterArchive(archive_path) as archive:
+        for data in archive.iter_bytes(start_block, stop_block):
+            records += 1
+            try:
+                rollup.add(record_facts(json.loads(data)))
+            except (ValueError, AttributeError):
+                continue
+    return rollup, records
+
+
+def _run_chunks(function, tasks, workers):
+    """Results of function(*args) for every task, from a process pool when there is more than one task"""
+    if workers == 1 or len(tasks) <= 1:
+        for args in tasks:
+            yield function(*args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(function, *args) for args in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def update_directory(source, state_path, workers=None, chunk_size=2000, full=False):
+    """Bring the rollup of a fighters/ directory up to date; returns (rollup, stats)"""
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    db = sqlite3.connect(state_path)
+    db.executescript(SCHEMA)
+    stored = db.execute("SELECT value FROM meta WHERE name = 'rollup'").fetchone()
+    if full or stored is None:
+        db.execute('DELETE FROM files')
+        stored = None
+    known = {name: (size, mtime_ns) for name, size, mtime_ns in db.execute('SELECT name, size, mtime_ns FROM files')}
+    rollup = Rollup.from_dict(json.loads(stored[0])) if stored else Rollup()
+
+    pending = []
+    seen = set()
+    with os.scandir(source) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.json'):
+                continue
+            seen.add(entry.name)
+            stat = entry.stat()
+            if known.get(entry.name) != (stat.st_size, stat.st_mtime_ns):
+                pending.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    removed = [name for name in known if name not in seen]
+    changed = [name for name, _, _ in pending if name in known]
+    stats = {'added': len(pending) - len(changed), 'changed': len(changed), 'removed': len(removed),
+             'unchanged': len(seen) - len(pending), 'unreadable': 0, 'full': stored is None}
+
+    # Take the old contribution of changed and deleted files back out
+    outdated = changed + removed
+    for i in range(0, len(outdated), 500):
+        batch = outdated[i:i + 500]
+        query = f"SELECT facts FROM files WHERE name IN ({','.join('?' * len(batch))}) AND facts IS NOT NULL"
+        for (facts,) in db.execute(query, batch):
+            rollup.add(json.loads(facts), -1)
+    db.executemany('DELETE FROM files WHERE name = ?', [(name,) for name in removed])
+
+    pending.sort()
+    tasks = [(source, pending[i:i + chunk_size]) for i in range(0, len(pending), chunk_size)]
+    for partial, rows in _run_chunks(rollup_files, tasks, workers):
+        rollup.merge(partial)
+        stats['unreadable'] += sum(1 for row in rows if row[3] is None)
+        db.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', rows)
+
+    db.execute("INSERT OR REPLACE INTO meta VALUES ('rollup', ?)", (json.dumps(rollup.to_dict(), ensure_ascii=False),))
+    db.commit()  # Rollup and per-file facts change together or not at all
+    db.close()
+    stats['seconds'] = round(time.perf_counter() - start, 2)
+    return rollup, stats
+
+
+def rollup_archive(source, workers=None, chunk_size=2000):
+    """Rollup of a packed archive in one full pass; returns (rollup, stats)"""
+    from fighter_archive import FighterArchive
+    start = time.perf_counter()
+    with FighterArchive(source) as archive:
+        block_count = archive.block_count
+        blocks_per_chunk = max(1, chunk_size * block_count // max(len(archive), 1))
+    tasks = [(source, first, min(first + blocks_per_chunk, block_count))
+             for first in range(0, block_count, blocks_per_chunk)]
+    rollup = Rollup()
+    records = 0
+    for partial, count in _run_chunks(rollup_archive_blocks, tasks, workers or os.cpu_count() or 1):
+        rollup.merge(partial)
+        records += count
+    stats = {'added': records, 'unreadable': records - rollup.totals['records'], 'full': True,
+             'seconds': round(time.perf_counter() - start, 2)}
+    return rollup, stats
+
+
+def write_summary(path, source, rollup, stats):
+    """Write the summary with the next revision number (atomically); returns the revision"""
+    revision = 1
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                revision = json.load(f).get('revision', 0) + 1
+        except ValueError:
+            pass
+    summary = {
+        'format_version': FORMAT_VERSION,
+        'revision': revision,
+        'generated_at': datetime.now().isoformat(),
+        'source': os.path.abspath(source),
+        'update': stats,
+        'statistics': rollup.summary(),
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return revision
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute dataset statistics over every fighter record in one pass')
+    parser.add_argument('--source', default='fighters', help='fighters/ directory or a fighter_archive.py pack')
+    parser.add_argument('--out', default='dataset_summary.json', help='Versioned summary file')
+    parser.add_argument('--state', default='dataset_stats.sqlite', help='Per-file facts for incremental updates (directories only)')
+    parser.add_argument('--full', action='store_true', help='Recompute from scratch instead of updating')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=2000, help='Records per worker task')
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        rollup, stats = update_directory(args.source, args.state, args.workers, args.chunk_size, args.full)
+    else:
+        rollup, stats = rollup_archive(args.source, args.workers, args.chunk_size)
+    revision = write_summary(args.out, args.source, rollup, stats)
+
+    summary = rollup.summary()
+    print(f"{'Full pass' if stats['full'] else 'Update'} in {stats['seconds']:.2f}s: {stats.get('added', 0)} added, "
+          f"{stats.get('changed', 0)} changed, {stats.get('removed', 0)} removed, "
+          f"{stats.get('unchanged', 0)} unchanged, {stats['unreadable']} unreadable")
+    print(f"{summary['records']:,} records in {len(summary['districts'])} districts; "
+          f"{len(summary['document_types'])} document types; "
+          f"photos {summary['photo_coverage']['fighters_with_photos_percent']}%; "
+          f"avg documents {summary['data_quality']['avg_documents_per_fighter']}, "
+          f"avg heirs {summary['data_quality']['avg_heirs_per_fighter']}")
+    print(f"Wrote revision {revision} of {args.out}")
+
+
+if __name__ == "__main__":
+    main()
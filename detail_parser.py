@@ -0,0 +1,117 @@
+"""
+Fighter detail page parser
+A details page (/freedom-fighter-list/details/{id}) has one card per
+section: the fighter's basic information as label/value rows with the
+photo, a table of supporting documents and a table of heirs. The Bengali
+labels and column headers are mapped to the field names used in the
+fighters/*.json release files; labels not listed are kept as they are.
+
+The markup matched here (card titles, label/value rows, img.fighter-photo)
+is the one fake_molwa_server.py renders; it is assumed, not checked
+against pages saved from the live site. A page without the basic
+information card parses to None, which the detail scraper records as a
+failure to retry rather than as an unknown fighter.
+"""
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401 (BeautifulSoup's faster tree builder)
+    SOUP_FEATURES = 'lxml'
+except ImportError:
+    SOUP_FEATURES = 'html.parser'
+
+from listing_parser import clean_text
+
+SITE_URL = 'https://mis.molwa.gov.bd'
+
+BASIC_INFO_TITLE = 'মুক্তিযোদ্ধার তথ্য'
+PROVE_DOCUMENTS_TITLE = 'প্রমাণক'
+WARIS_INFO_TITLE = 'ওয়ারিশের তথ্য'
+
+BASIC_INFO_LABELS = {
+    'নাম': 'name',
+    'পিতার নাম': 'father_name',
+    'মাতার নাম': 'mother_name',
+    'জীবিত কি না?': 'living_status',
+    'বিভাগ': 'division',
+    'জেলা': 'district',
+    'উপজেলা': 'upazila',
+    'ডাকঘর': 'post_office',
+    'গ্রাম/মহল্লা': 'village',
+}
+PROVE_DOCUMENT_COLUMNS = {
+    'প্রমাণকের ধরন': 'document_type',
+    'প্রমাণক নম্বর': 'document_no',
+}
+WARIS_COLUMNS = {
+    'নাম': 'name',
+    'সম্পর্ক': 'relationship',
+    'ছবি': 'photo_url',
+}
+
+
+def absolute_url(src):
+    """Site-relative upload paths become full URLs; empty stays empty"""
+    if not src:
+        return ''
+    return src if src.startswith('http') else f"{SITE_URL}{src}"
+
+
+def _sections(soup):
+    """Map each card's header text to the card element"""
+    sections = {}
+    for card in soup.find_all('div', class_='card'):
+        header = card.find(class_='card-header')
+        if header:
+            sections[clean_text(header.get_text())] = card
+    return sections
+
+
+def _table_rows(card, columns):
+    """Rows of a section table as dicts keyed by the mapped column names"""
+    table = card.find('table') if card else None
+    if table is None:
+        return []
+    headers = [clean_text(th.get_text()) for th in table.find('thead').find_all('th')] if table.find('thead') else []
+    names = [columns.get(header, header) for header in headers]
+
+    rows = []
+    body = table.find('tbody') or table
+    for tr in body.find_all('tr'):
+        cells = tr.find_all('td')
+        if not cells:
+            continue
+        row = {}
+        for name, cell in zip(names, cells):
+            image = cell.find('img')
+            row[name] = absolute_url(image.get('src')) if image else clean_text(cell.get_text())
+        rows.append(row)
+    return rows
+
+
+def parse_detail_page(html_content):
+    """
+    Parse a details page into (basic_info, photo_url, prove_documents, waris_info).
+    Returns None when the page has no basic information section (not a
+    details page in the expected markup).
+    """
+    soup = BeautifulSoup(html_content, SOUP_FEATURES)
+    sections = _sections(soup)
+    basic_card = sections.get(BASIC_INFO_TITLE)
+    if basic_card is None:
+        return None
+
+    basic_info = {}
+    table = basic_card.find('table')
+    for tr in table.find_all('tr') if table else []:
+        label, value = tr.find('th'), tr.find('td')
+        if label and value:
+            text = clean_text(label.get_text())
+            basic_info[BASIC_INFO_LABELS.get(text, text)] = clean_text(value.get_text())
+
+    photo = basic_card.find('img', class_='fighter-photo')
+    photo_url = absolute_url(photo.get('src')) if photo else ''
+    return (basic_info, photo_url,
+            _table_rows(sections.get(PROVE_DOCUMENTS_TITLE), PROVE_DOCUMENT_COLUMNS),
+            _table_rows(sections.get(WARIS_INFO_TITLE), WARIS_COLUMNS))
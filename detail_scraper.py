@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Async, resumable fighter detail scraper
+Fighter numbers are read lazily from fflist.csv or the listing CSV, the
+/freedom-fighter-list/details/{id} pages are fetched with bounded aiohttp
+concurrency paced by the adaptive rate controller, parsed in a process
+pool, and each record is written to fighters/{id}.json with an atomic
+rename before its completion entry is appended to the progress journal.
+
+Progress is a low-water mark: the input row (and, for plain CSV, the byte
+offset) below which every row is committed, plus the few rows committed
+ahead of it. Resuming seeks straight to the mark, so its cost grows with
+the rows remaining rather than with the rows already done.
+"""
+
+import asyncio
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+
+import aiohttp
+
+from csv_sink import iter_rows, output_format
+from detail_parser import SITE_URL, parse_detail_page
+from division_district_scraper import REQUEST_HEADERS
+from fighter_index import FIGHTER_NUMBER_FIELD, to_ascii_digits
+from rate_controller import (AdaptiveRateController, RetryPolicy, OK, THROTTLED, TIMEOUT,
+                             SERVER_ERROR, classify_status, parse_retry_after)
+from scrape_metrics import StageMetrics, set_worker
+
+NUMBER_COLUMNS = (FIGHTER_NUMBER_FIELD, 'fighter_number', 'Fighter Number')
+BENGALI_DIGITS = str.maketrans('0123456789', '০১২৩৪৫৬৭৮৯')
+
+
+def _number_column(fieldnames):
+    for name in NUMBER_COLUMNS:
+        if name in fieldnames:
+            return name
+    return fieldnames[0]
+
+
+def iter_fighter_numbers(path, start_row=0, start_offset=0):
+    """
+    Yield (row, resume_offset, fighter_number) for every data row after
+    start_row. For plain CSV, resume_offset is the byte offset just past the
+    row, so a resume can seek there; other sink formats are skipped row by row.
+    """
+    if output_format(path) != 'csv':
+        rows = iter_rows(path)
+        column = None
+        for row_number, row in enumerate(itertools.islice(rows, start_row, None), start_row + 1):
+            column = column or _number_column(list(row))
+            yield row_number, 0, (row.get(column) or '').strip()
+        return
+
+    with open(path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8-sig')]), [])
+        if not header:
+            return
+        column = header.index(_number_column(header))
+        if start_offset:
+            f.seek(start_offset)
+        row_number = start_row
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            offset = f.tell()
+            if not line.strip():
+                continue
+            row_number += 1
+            cells = next(csv.reader([line.decode('utf-8')]))
+            yield row_number, offset, cells[column].strip() if column < len(cells) else ''
+
+
+class DetailProgress:
+    """
+    Checkpoint plus append-only journal of committed rows.
+    Each journal line records one committed (or permanently failed) row;
+    every compact_every lines the state is checkpointed with an atomic
+    rename and the journal truncated.
+    """
+
+    def __init__(self, progress_file, compact_every=1000, fsync=False):
+        self.progress_file = progress_file
+        self.journal_file = f"{os.path.splitext(progress_file)[0]}.journal.jsonl"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.state = {'csv_file': None, 'row': 0, 'offset': 0, 'ahead': {},
+                      'completed': 0, 'failed': {}, 'journal_seq': 0}
+        self.entries_since_checkpoint = 0
+        self._fh = None
+
+    def load(self, csv_file):
+        """Read the checkpoint and replay the journal; a different input file starts over"""
+        if os.path.exists(self.progress_file):
+            with open(self.progress_file, 'r', encoding='utf-8') as f:
+                self.state.update(json.load(f))
+            self.state['ahead'] = {int(row): offset for row, offset in self.state['ahead'].items()}
+        if os.path.exists(self.journal_file):
+            valid_end = 0
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn final line from a crash mid-write
+                    valid_end += len(line)
+                    if entry['seq'] > self.state['journal_seq']:
+                        self._apply(entry)
+            # Drop the torn tail so the next entry does not land on the end of a broken line
+            if valid_end < os.path.getsize(self.journal_file):
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(valid_end)
+        if self.state['csv_file'] not in (None, os.path.abspath(csv_file)):
+            print(f"Progress file belongs to {self.state['csv_file']}; starting over for {csv_file}")
+            self.state.update(row=0, offset=0, ahead={}, completed=0, failed={})
+        self.state['csv_file'] = os.path.abspath(csv_file)
+        self._fh = open(self.journal_file, 'a', encoding='utf-8')
+
+    def _apply(self, entry):
+        state = self.state
+        state['journal_seq'] = entry['seq']
+        number = entry['fighter_number']
+        if entry.get('error'):
+            state['failed'][number] = entry['error']
+        else:
+            state['completed'] += 1
+            state['failed'].pop(number, None)
+
+        row = entry.get('row')
+        if row is not None and row > state['row']:
+            state['ahead'][row] = entry.get('offset', 0)
+            # Advance the mark over every contiguous committed row
+            while state['row'] + 1 in state['ahead']:
+                state['row'] += 1
+                state['offset'] = state['ahead'].pop(state['row'])
+
+    def is_done(self, row):
+        return row <= self.state['row'] or row in self.state['ahead']
+
+    def commit(self, fighter_number, row=None, offset=0, error=None):
+        """Journal one row after its record file is in place"""
+        entry = {'seq': self.state['journal_seq'] + 1, 'fighter_number': fighter_number,
+                 'row': row, 'offset': offset}
+        if error:
+            entry['error'] = error
+        self._apply(entry)
+        self._fh.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._fh.flush()
+        if self.fsync:
+            os.fsync(self._fh.fileno())
+        self.entries_since_checkpoint += 1
+        if self.entries_since_checkpoint >= self.compact_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Write the state atomically, then truncate the journal it covers"""
+        state = dict(self.state, last_update=datetime.now().isoformat())
+        tmp_path = f"{self.progress_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.progress_file)
+        if self.fsync:
+            # The rename must be durable before the journal it replaces is emptied
+            self._sync_directory()
+        if self._fh is not None:
+            self._fh.truncate(0)
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+        self.entries_since_checkpoint = 0
+
+    def _sync_directory(self):
+        if not hasattr(os, 'O_DIRECTORY'):
+            return  # Windows: directories cannot be opened for fsync
+        fd = os.open(os.path.dirname(os.path.abspath(self.progress_file)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        self.checkpoint()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+def build_record(fighter_number, ascii_id, parsed):
+    """A fighters/{id}.json record in the release layout"""
+    basic_info, photo_url, prove_documents, waris_info = parsed
+    record = {
+        'fighter_number': fighter_number,
+        'detail_url': f"{SITE_URL}/freedom-fighter-list/details/{ascii_id}",
+        'fighter_photo_url': photo_url,
+        'basic_info': basic_info,
+        'prove_documents': prove_documents,
+        'waris_info': waris_info,
+        'scraped_at': datetime.now().isoformat(),
+    }
+    if not photo_url:
+        del record['fighter_photo_url']
+    return record
+
+
+def write_record(path, record, fsync=False):
+    """Write a record file atomically (temp file + rename)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+async def fetch_with_retries(http, url, rate_controller, retry_policy, metrics, headers=None):
+    """
+    GET a URL with pacing and retries. Returns (status, body, response
+    headers, error); 304 and 404 come back at once, status is None when
+    every attempt failed.
+    """
+    host = urlparse(url).netloc
+    failures = throttles = 0
+    while True:
+        with metrics.time('rate_wait'):
+            await rate_controller.acquire_async(host)
+        start = time.monotonic()
+        retry_after = None
+        outcome = SERVER_ERROR
+        try:
+            async with http.get(url, headers=headers) as response:
+                if response.status in (304, 404):
+                    outcome = OK
+                    return response.status, None, response.headers, None
+                outcome = classify_status(response.status)
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                error = f"HTTP {response.status}"
+                if outcome == OK:
+                    body = await response.read()
+                    return response.status, body, response.headers, None
+        except asyncio.TimeoutError:
+            outcome, error = TIMEOUT, 'timeout'
+        except aiohttp.ClientError as e:
+            outcome, error = SERVER_ERROR, str(e)
+        except Exception:
+            outcome = SERVER_ERROR  # Counted as a failed request, then raised to the caller
+            raise
+        finally:
+            # Always give back the in-flight slot (and a half-open breaker's probe)
+            rate_controller.release(host, outcome, time.monotonic() - start, retry_after)
+            metrics.observe('fetch', time.monotonic() - start)
+
+        if outcome == THROTTLED:
+            throttles += 1
+        else:
+            failures += 1
+        if not retry_policy.should_retry(outcome, failures, throttles):
+            metrics.count('failed_requests')
+            return None, None, None, error
+        rate_controller.record_retry()
+        metrics.count('retries')
+        await asyncio.sleep(max(retry_policy.delay(failures + throttles - 1), retry_after or 0))
+
+
+class DetailScraper:
+    def __init__(self, csv_file='fflist.csv', output_dir='fighters',
+                 progress_file='detail_scraping_progress.json', base_url=SITE_URL,
+                 concurrency=20, requests_per_second=10.0, parse_workers=None,
+                 retry_failed=False, limit=None, fsync=False):
+        self.csv_file = csv_file
+        self.output_dir = output_dir
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.parse_workers = os.cpu_count() if parse_workers is None else parse_workers
+        self.retry_failed = retry_failed
+        self.limit = limit
+        self.fsync = fsync
+        self.progress = DetailProgress(progress_file, fsync=fsync)
+        self.rate_controller = AdaptiveRateController(
+            initial_rate=min(requests_per_second or 5.0, 5.0),
+            max_rate=requests_per_second or None,
+            max_concurrency=concurrency,
+        )
+        self.retry_policy = RetryPolicy()
+        self.parse_pool = None
+        self.metrics = StageMetrics()
+        self.stats = {'committed': 0, 'not_found': 0, 'failed': 0, 'unrecognised': 0}
+
+    async def fetch(self, http, url, headers=None):
+        """GET a page with pacing and retries (see fetch_with_retries)"""
+        return await fetch_with_retries(http, url, self.rate_controller, self.retry_policy,
+                                        self.metrics, headers)
+
+    def detail_url(self, ascii_id):
+        return f"{self.base_url}/freedom-fighter-list/details/{ascii_id}"
+
+    async def fetch_detail(self, http, ascii_id):
+        """Fetch a details page; returns (html bytes or None, error)"""
+        status, body, _, error = await self.fetch(http, self.detail_url(ascii_id))
+        if status == 404:
+            return None, 'not found'
+        return body, error
+
+    async def parse(self, html_content):
+        with self.metrics.time('parse'):
+            if self.parse_pool is None:
+                return parse_detail_page(html_content)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.parse_pool, parse_detail_page, html_content)
+
+    async def scrape_one(self, http, row, offset, fighter_number):
+        """Fetch, parse and commit one fighter"""
+        ascii_id = to_ascii_digits(fighter_number)
+        if not ascii_id.isdigit():
+            self.progress.commit(fighter_number, row, offset, error='invalid fighter number')
+            self.stats['failed'] += 1
+            return
+
+        html_content, error = await self.fetch_detail(http, ascii_id)
+        if html_content is None:
+            self.stats['not_found' if error == 'not found' else 'failed'] += 1
+            self.progress.commit(fighter_number, row, offset, error=error)
+            return
+        parsed = await self.parse(html_content)
+        if parsed is None:
+            # A 200 without the expected details markup (maintenance page, changed layout) says
+            # nothing about the fighter: it is a failure that --retry-failed fetches again
+            self.stats['failed'] += 1
+            self.stats['unrecognised'] += 1
+            self.progress.commit(fighter_number, row, offset, error='unrecognised details page')
+            return
+
+        record = build_record(ascii_id.translate(BENGALI_DIGITS), ascii_id, parsed)
+        path = os.path.join(self.output_dir, f"{ascii_id}.json")
+        with self.metrics.time('record_write'):
+            await asyncio.to_thread(write_record, path, record, self.fsync)
+        with self.metrics.time('progress_save'):
+            self.progress.commit(fighter_number, row, offset)
+        self.stats['committed'] += 1
+
+    def pending(self):
+        """Work items (row, offset, fighter_number) not yet committed, read lazily"""
+        items = ()
+        if self.retry_failed:
+            # Earlier failures sit below the mark; they do not move it when retried
+            items = [(None, 0, number) for number in list(self.progress.state['failed'])]
+        state = self.progress.state
+        remaining = (item for item in iter_fighter_numbers(self.csv_file, state['row'], state['offset'])
+                     if not self.progress.is_done(item[0]))
+        return itertools.islice(itertools.chain(items, remaining), self.limit)
+
+    async def worker(self, queue, http, worker_id=0):
+        set_worker(worker_id)
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    return
+                await self.scrape_one(http, *item)
+            except Exception as e:
+                print(f"Error processing fighter {item[2]}: {e}")
+            finally:
+                queue.task_done()
+
+    def report_progress(self, elapsed):
+        done = self.stats['committed']
+        print(f"  Committed {done} records ({done / elapsed:.1f}/s), "
+              f"{self.stats['not_found']} not found, {self.stats['failed']} failed; "
+              f"resume point: row {self.progress.state['row']}")
+
+    async def crawl(self):
+        queue = asyncio.Queue(maxsize=self.concurrency * 4)  # Bounded: the input is never read far ahead
+        if self.parse_workers:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ssl=False)
+        timeout = aiohttp.ClientTimeout(total=30)
+        start = time.monotonic()
+        last_report = start
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=REQUEST_HEADERS) as http:
+                workers = [asyncio.create_task(self.worker(queue, http, worker_id))
+                           for worker_id in range(self.concurrency)]
+                try:
+                    for item in self.pending():
+                        await queue.put(item)
+                        if time.monotonic() - last_report >= 10:
+                            last_report = time.monotonic()
+                            self.report_progress(last_report - start)
+                    for _ in workers:
+                        await queue.put(None)
+                    await asyncio.gather(*workers)
+                finally:
+                    # On Ctrl+C, stop the workers before the session closes under them
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            if self.parse_pool is not None:
+                self.parse_pool.shutdown()
+                self.parse_pool = None
+
+    def run_scraper(self):
+        """Scrape every fighter not yet committed; safe to interrupt and rerun"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.progress.load(self.csv_file)
+        state = self.progress.state
+        print(f"Resuming after input row {state['row']} ({state['completed']} records committed, "
+              f"{len(state['failed'])} failed)" if state['row'] else f"Starting at the first row of {self.csv_file}")
+        start_time = time.time()
+        try:
+            asyncio.run(self.crawl())
+        finally:
+            self.progress.close()
+            elapsed = time.time() - start_time
+            print(f"Committed {self.stats['committed']} records in {elapsed:.2f} seconds "
+                  f"({self.stats['committed'] / max(elapsed, 1e-9):.1f}/s); "
+                  f"{self.stats['not_found']} not found, {self.stats['failed']} failed")
+            if self.stats['unrecognised']:
+                print(f"⚠️  {self.stats['unrecognised']} details pages did not match the expected markup "
+                      f"(see detail_parser.py); rerun with --retry-failed once the parser handles them")
+            print(f"Request pacing: {self.rate_controller.snapshot()}")
+            print(f"Stage timings (all workers):\n{self.metrics.report()}")
+
+    def print_statistics(self):
+        state = self.progress.state
+        print(f"Records committed: {state['completed']}")
+        print(f"Input rows done: {state['row'] + len(state['ahead'])}")
+        print(f"Failed: {len(state['failed'])} (rerun with --retry-failed)")
+        print(f"Output directory: {self.output_dir}/")
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Lease-based work queue for crawling the listing from several processes or machines
+A SQLite database on a volume every worker can reach holds one row per
+work unit (a combination at the --shard-by level). Workers lease a unit
+for --lease-seconds, extend the lease from a heartbeat thread while they
+crawl it, and write its rows to their own shard file
+{key}.{lease_id}.csv next to the database. A lease that is not extended
+(the worker crashed or lost the volume) expires and the unit goes back
+to the queue. Completing a unit is fenced by its lease id, so a worker
+that lost its lease cannot complete the unit, and its partial shard is
+never merged. --merge writes the shards of completed units in
+unit order, and refuses while any unit has failed or is unfinished
+unless --allow-unfinished is given. Within a unit, rows are sorted by fighter number, and a
+fighter number seen before is dropped, so the same units always merge to
+the same file.
+SQLite locking needs a filesystem with working POSIX locks; the queue is
+only touched once per lease, heartbeat and completion. It uses the
+rollback journal rather than WAL: WAL keeps its index in shared memory,
+which processes on different machines do not share, so on NFS or SMB
+they would read and write the database inconsistently.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+
+from async_scraper import AsyncDivisionDistrictScraper
+from csv_sink import CSV_FIELDNAMES, iter_rows
+from division_district_scraper import SHARD_LEVELS
+from fighter_index import FIGHTER_NUMBER_FIELD, normalize_fighter_number
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    key TEXT PRIMARY KEY,              -- combination key, e.g. 4-35 or 4-35-312
+    sort_key TEXT NOT NULL,            -- zero-padded key parts: merge order
+    state TEXT NOT NULL DEFAULT 'pending',  -- pending, leased, done or failed
+    owner TEXT, lease_id INTEGER, lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    rows INTEGER, error TEXT
+);
+CREATE INDEX IF NOT EXISTS units_state ON units(state, attempts, sort_key);
+CREATE TABLE IF NOT EXISTS leases (
+    lease_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL, owner TEXT NOT NULL, granted REAL NOT NULL,
+    outcome TEXT                       -- NULL while held; done, failed, expired or lost
+);
+CREATE TABLE IF NOT EXISTS workers (worker_id TEXT PRIMARY KEY, started REAL, last_heartbeat REAL);
+"""
+
+
+def sort_key(key):
+    return '-'.join(f"{int(part):05d}" for part in key.split('-'))
+
+
+def shard_path(shard_dir, key, lease_id):
+    return os.path.join(shard_dir, f"{key}.{lease_id}.csv")
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Lease:
+    def __init__(self, key, lease_id, expires):
+        self.key = key
+        self.lease_id = lease_id
+        self.expires = expires
+
+
+class LeaseQueue:
+    def __init__(self, db_path, max_attempts=5):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.db = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        # Not WAL: its shared-memory index only works between processes on one host
+        self.db.execute('PRAGMA journal_mode=DELETE')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers never lease the same unit
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
+    def seed(self, keys):
+        """Add work units (existing keys are left as they are); returns how many were new"""
+        with self._transaction():
+            before = self.db.execute('SELECT COUNT(*) FROM units').fetchone()[0]
+            self.db.executemany('INSERT OR IGNORE INTO units (key, sort_key) VALUES (?, ?)',
+                                [(key, sort_key(key)) for key in keys])
+            return self.db.execute('SELECT COUNT(*) FROM units').fetchone()[0] - before
+
+    def register(self, worker_id):
+        now = time.time()
+        self.db.execute('INSERT OR REPLACE INTO workers VALUES (?, ?, ?)', (worker_id, now, now))
+
+    def _reclaim_expired(self, now):
+        self.db.execute("UPDATE leases SET outcome = 'expired' WHERE lease_id IN "
+                        "(SELECT lease_id FROM units WHERE state = 'leased' AND lease_expires < ?)", (now,))
+        self.db.execute("UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                        "owner = NULL, error = 'lease expired' WHERE state = 'leased' AND lease_expires < ?",
+                        (self.max_attempts, now))
+
+    def lease(self, worker_id, lease_seconds):
+        """Lease the next pending unit (fewest attempts first), or None"""
+        now = time.time()
+        with self._transaction():
+            self._reclaim_expired(now)
+            row = self.db.execute("SELECT key FROM units WHERE state = 'pending' "
+                                  "ORDER BY attempts, sort_key LIMIT 1").fetchone()
+            if row is None:
+                return None
+            lease_id = self.db.execute('INSERT INTO leases (key, owner, granted) VALUES (?, ?, ?)',
+                                       (row[0], worker_id, now)).lastrowid
+            self.db.execute("UPDATE units SET state = 'leased', owner = ?, lease_id = ?, lease_expires = ?, "
+                            "attempts = attempts + 1 WHERE key = ?", (worker_id, lease_id, now + lease_seconds, row[0]))
+        return Lease(row[0], lease_id, now + lease_seconds)
+
+    def heartbeat(self, worker_id, lease_ids, lease_seconds):
+        """Extend the worker's leases; returns the lease ids it still holds"""
+        now = time.time()
+        held = set()
+        with self._transaction():
+            self.db.execute('UPDATE workers SET last_heartbeat = ? WHERE worker_id = ?', (now, worker_id))
+            for lease_id in lease_ids:
+                cursor = self.db.execute("UPDATE units SET lease_expires = ? WHERE lease_id = ? AND owner = ? "
+                                         "AND state = 'leased' AND lease_expires >= ?",
+                                         (now + lease_seconds, lease_id, worker_id, now))
+                if cursor.rowcount:
+                    held.add(lease_id)
+        return held
+
+    def complete(self, lease, rows):
+        """Mark a unit done if the lease is still current; False means the lease was lost"""
+        with self._transaction():
+            cursor = self.db.execute("UPDATE units SET state = 'done', rows = ?, error = NULL WHERE key = ? "
+                                     "AND lease_id = ? AND state = 'leased'", (rows, lease.key, lease.lease_id))
+            done = cursor.rowcount == 1
+            self.db.execute('UPDATE leases SET outcome = ? WHERE lease_id = ? AND outcome IS NULL',
+                            ('done' if done else 'lost', lease.lease_id))
+        return done
+
+    def fail(self, lease, error):
+        """Give a unit back (or mark it failed after max_attempts)"""
+        with self._transaction():
+            self.db.execute("UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                            "owner = NULL, error = ? WHERE key = ? AND lease_id = ? AND state = 'leased'",
+                            (self.max_attempts, error, lease.key, lease.lease_id))
+            self.db.execute("UPDATE leases SET outcome = 'failed' WHERE lease_id = ? AND outcome IS NULL",
+                            (lease.lease_id,))
+
+    def is_finished(self):
+        return not self.db.execute("SELECT 1 FROM units WHERE state IN ('pending', 'leased') LIMIT 1").fetchone()
+
+    def unfinished_units(self):
+        """(key, state, error) of every unit not done, in merge order"""
+        return self.db.execute("SELECT key, state, error FROM units WHERE state != 'done' "
+                               "ORDER BY sort_key").fetchall()
+
+    def done_units(self):
+        """(key, lease_id) of every completed unit in merge order"""
+        return self.db.execute("SELECT key, lease_id FROM units WHERE state = 'done' ORDER BY sort_key").fetchall()
+
+    def status(self):
+        units = dict(self.db.execute('SELECT state, COUNT(*) FROM units GROUP BY state'))
+        leases = dict(self.db.execute("SELECT COALESCE(outcome, 'held'), COUNT(*) FROM leases GROUP BY outcome"))
+        by_worker = self.db.execute("SELECT owner, COUNT(*) FROM leases WHERE outcome = 'done' "
+                                    "GROUP BY owner ORDER BY owner").fetchall()
+        return {'units': units, 'leases': leases, 'done_by_worker': dict(by_worker)}
+
+
+class Heartbeat:
+    """Extends a worker's leases every lease_seconds / 3 from a thread with its own connection"""
+
+    def __init__(self, db_path, worker_id, lease_seconds):
+        self.db_path = db_path
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def hold(self, lease_id):
+        with self._lock:
+            self.held.add(lease_id)
+
+    def drop(self, lease_id):
+        with self._lock:
+            self.held.discard(lease_id)
+
+    def _run(self):
+        queue = LeaseQueue(self.db_path)
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                with self._lock:
+                    lease_ids = set(self.held)
+                queue.heartbeat(self.worker_id, lease_ids, self.lease_seconds)
+        finally:
+            queue.close()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def crawl_unit(key, csv_file, scraper_options, crash_after_pages=None):
+    """Crawl one combination into its own shard CSV; returns the rows written"""
+    work_dir = tempfile.mkdtemp(prefix='unit-', dir=os.path.dirname(csv_file))
+    succeeded = False
+    try:
+        scraper = AsyncDivisionDistrictScraper(csv_file=csv_file, progress_file=os.path.join(work_dir, 'progress.json'),
+                                               quiet=True, **scraper_options)
+        if crash_after_pages is not None:
+            # Crash tests: die without any cleanup, as a killed machine would
+            handle_page = scraper.handle_page
+
+            def crashing_handle_page(*args):
+                follow_up = handle_page(*args)
+                crash_after_pages[0] -= 1
+                if crash_after_pages[0] <= 0:
+                    os._exit(1)
+                return follow_up
+            scraper.handle_page = crashing_handle_page
+
+        try:
+            asyncio.run(scraper.crawl([scraper.combination_from_key(key)]))
+        finally:
+            scraper.checkpoint_progress()
+            scraper.sink.close()
+            scraper.existing_fighters.close()
+            scraper.journal.close()
+
+        _, _, completed, total = scraper.plan.totals()
+        if completed < total:
+            raise RuntimeError("pages still missing after retries")
+        succeeded = True
+        return scraper.sink.rows_written
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        for path in glob.glob(f"{glob.escape(csv_file)}.idx*"):
+            os.remove(path)
+        if not succeeded and os.path.exists(csv_file):
+            os.remove(csv_file)  # A partial shard is never merged; the next lease starts a new one
+
+
+def run_worker(db_path, scraper_options, worker_id=None, lease_seconds=60.0, idle_wait=2.0,
+               crash_after_pages=None):
+    """Lease and crawl units until none are pending or leased; returns units completed"""
+    worker_id = worker_id or default_worker_id()
+    shard_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), 'shards')
+    os.makedirs(shard_dir, exist_ok=True)
+    queue = LeaseQueue(db_path)
+    queue.register(worker_id)
+    heartbeat = Heartbeat(db_path, worker_id, lease_seconds)
+    crash_counter = [crash_after_pages] if crash_after_pages else None
+    completed = 0
+    try:
+        while True:
+            lease = queue.lease(worker_id, lease_seconds)
+            if lease is None:
+                if queue.is_finished():
+                    break
+                time.sleep(idle_wait)  # Other workers hold the rest; their leases may still expire
+                continue
+
+            heartbeat.hold(lease.lease_id)
+            path = shard_path(shard_dir, lease.key, lease.lease_id)
+            start = time.time()
+            try:
+                rows = crawl_unit(lease.key, path, scraper_options, crash_counter)
+            except Exception as e:
+                print(f"[{worker_id}] {lease.key} failed: {e}")
+                queue.fail(lease, str(e))
+                continue
+            finally:
+                heartbeat.drop(lease.lease_id)
+
+            if queue.complete(lease, rows):
+                completed += 1
+                print(f"[{worker_id}] {lease.key}: {rows} rows in {time.time() - start:.1f}s (lease {lease.lease_id})")
+            else:
+                print(f"[{worker_id}] {lease.key}: lease {lease.lease_id} expired before completion; shard discarded")
+                os.remove(path)
+    finally:
+        heartbeat.stop()
+        queue.close()
+    return completed
+
+
+def merge_shards(db_path, out_path, allow_unfinished=False):
+    """
+    Write the completed units' shards to one CSV in unit order, deduplicated;
+    returns (rows, duplicates, unfinished units). Raises if any unit is not
+    done (failed, or still pending or leased) unless allow_unfinished is set.
+    """
+    shard_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), 'shards')
+    queue = LeaseQueue(db_path)
+    unfinished = queue.unfinished_units()
+    if unfinished and not allow_unfinished:
+        queue.close()
+        listed = ', '.join(f"{key} ({state}{': ' + error if error else ''})" for key, state, error in unfinished[:10])
+        raise RuntimeError(f"{len(unfinished)} units not done: {listed}"
+                           f"{' ...' if len(unfinished) > 10 else ''}")
+    seen = set()
+    rows_written = duplicates = 0
+    tmp_path = f"{out_path}.tmp"
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDNAMES)
+            writer.writeheader()
+            for key, lease_id in queue.done_units():
+                rows = []
+                for row in iter_rows(shard_path(shard_dir, key, lease_id)):
+                    rows.append((normalize_fighter_number(row[FIGHTER_NUMBER_FIELD]) or 0, row))
+                rows.sort(key=lambda item: item[0])  # Page order within a unit depends on timing
+                for number, row in rows:
+                    if number in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(number)
+                    writer.writerow(row)
+                    rows_written += 1
+        os.replace(tmp_path, out_path)
+    finally:
+        queue.close()
+    return rows_written, duplicates, unfinished
+
+
+def seed_queue(db_path, location_file, shard_by):
+    from division_district_scraper import DivisionDistrictScraper
+    with tempfile.TemporaryDirectory() as tmp:
+        scraper = DivisionDistrictScraper(csv_file=os.path.join(tmp, 'unused.csv'),
+                                          progress_file=os.path.join(tmp, 'unused.json'),
+                                          location_file=location_file, shard_by=shard_by, quiet=True)
+        keys = [combination['key'] for combination in scraper.all_combinations()]
+    queue = LeaseQueue(db_path)
+    try:
+        return queue.seed(keys), len(keys)
+    finally:
+        queue.close()
+
+
+def demo(location_file, workers, default_size, lease_seconds, crash_after_pages):
+    """Crawl a fake server with several worker processes, one of which crashes mid-unit"""
+    from fake_molwa_server import FakeMolwaServer
+
+    with open(location_file, 'r', encoding='utf-8') as f:
+        location_data = json.load(f)
+    context = multiprocessing.get_context('spawn')
+    with FakeMolwaServer(location_data, default_size=default_size, latency=0.01) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'queue.sqlite')
+        added, _ = seed_queue(db_path, location_file, 'district')
+        options = {'location_file': location_file, 'base_url': server.base_url,
+                   'concurrency': 8, 'requests_per_second': 0}
+        print(f"{added} units, {workers} workers, {lease_seconds:.0f}s leases; "
+              f"worker-0 crashes after {crash_after_pages} pages")
+
+        start = time.time()
+        processes = []
+        for n in range(workers):
+            crash = crash_after_pages if n == 0 else None
+            process = context.Process(target=run_worker, args=(db_path, options, f"worker-{n}", lease_seconds, 0.5, crash))
+            process.start()
+            processes.append(process)
+        for process in processes:
+            process.join()
+        elapsed = time.time() - start
+
+        queue = LeaseQueue(db_path)
+        status = queue.status()
+        queue.close()
+        out_path = os.path.join(tmp, 'merged.csv')
+        rows, duplicates, _ = merge_shards(db_path, out_path)
+        merged = [normalize_fighter_number(row[FIGHTER_NUMBER_FIELD]) for row in iter_rows(out_path)]
+        expected = {normalize_fighter_number(fighter['fighter_number']) for fighter in server.httpd.data.all_fighters()}
+        with open(out_path, 'rb') as f:
+            first_merge = f.read()
+        merge_shards(db_path, out_path)
+        with open(out_path, 'rb') as f:
+            deterministic = f.read() == first_merge
+
+        print(f"\nCrawled in {elapsed:.1f}s; exit codes {[p.exitcode for p in processes]}")
+        print(f"Units: {status['units']}; leases: {status['leases']}")
+        print(f"Units completed per worker: {status['done_by_worker']}")
+        print(f"Merged {rows} rows ({duplicates} duplicates dropped); "
+              f"server has {len(expected)} fighters; "
+              f"missing {len(expected - set(merged))}, repeated {len(merged) - len(set(merged))}; "
+              f"re-merge identical: {deterministic}")
+        print(f"Server requests: {server.request_count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl the listing from several processes or machines through a shared lease queue')
+    parser.add_argument('--queue', default='crawl_queue.sqlite', help='Queue database on a volume every worker can reach')
+    parser.add_argument('--seed', action='store_true', help='Add every combination at --shard-by level as a work unit')
+    parser.add_argument('--work', action='store_true', help='Lease and crawl units until the queue is drained')
+    parser.add_argument('--status', action='store_true')
+    parser.add_argument('--merge', metavar='CSV', help='Merge the shards of completed units into this CSV')
+    parser.add_argument('--allow-unfinished', action='store_true',
+                        help='Let --merge leave out failed, pending or leased units instead of refusing')
+    parser.add_argument('--demo', action='store_true', help='Run several local workers against a fake server, with one crash')
+    parser.add_argument('--worker-id', help='Default: hostname-pid')
+    parser.add_argument('--lease-seconds', type=float, help='Lease length, extended every third of it (default: 60, 3 for --demo)')
+    parser.add_argument('--shard-by', choices=SHARD_LEVELS, default='district')
+    parser.add_argument('--location-file', default='location_data.json')
+    parser.add_argument('--base-url', default='https://mis.molwa.gov.bd')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent requests per worker')
+    parser.add_argument('--rate', type=float, default=10.0, help='Request rate limit per worker (requests/sec)')
+    parser.add_argument('--workers', type=int, default=4, help='Worker processes for --demo')
+    parser.add_argument('--default-size', type=int, default=300, help='Fighters per district for --demo')
+    parser.add_argument('--crash-after-pages', type=int, default=15, help='Pages worker-0 crawls before crashing in --demo')
+    args = parser.parse_args()
+
+    if args.demo:
+        demo(args.location_file, args.workers, args.default_size, args.lease_seconds or 3.0, args.crash_after_pages)
+        return
+    if args.seed:
+        added, total = seed_queue(args.queue, args.location_file, args.shard_by)
+        print(f"Seeded {added} new units ({total} at {args.shard_by} level) into {args.queue}")
+        if args.shard_by != 'district':
+            print("Note: fighters without an upazila are only listed by a district-level crawl")
+    if args.work:
+        options = {'location_file': args.location_file, 'base_url': args.base_url,
+                   'concurrency': args.concurrency, 'requests_per_second': args.rate}
+        completed = run_worker(args.queue, options, args.worker_id, args.lease_seconds or 60.0)
+        print(f"Queue drained; this worker completed {completed} units")
+    if args.merge:
+        try:
+            rows, duplicates, unfinished = merge_shards(args.queue, args.merge, args.allow_unfinished)
+        except RuntimeError as e:
+            parser.exit(1, f"Not merging: {e}\nRerun --work, or pass --allow-unfinished to merge without them\n")
+        print(f"Merged {rows} rows into {args.merge} ({duplicates} duplicates dropped)")
+        if unfinished:
+            print(f"Left out {len(unfinished)} units that are not done: "
+                  f"{', '.join(f'{key} ({state})' for key, state, _ in unfinished)}")
+    if args.status or not (args.seed or args.work or args.merge):
+        queue = LeaseQueue(args.queue)
+        print(json.dumps(queue.status(), indent=2))
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,153 @@
 import requests
 import json
-import csv
 import time
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 import urllib3
 import os
 from datetime import datetime
-import re
+from urllib.parse import urlparse
+
+from listing_parser import clean_text, default_backend, parse_listing_page
+from csv_sink import FighterSink, iter_rows
+from fighter_index import FighterIndex
+from http_transport import ACCEPT_ENCODING, ResponseCache, build_session, resize_pool
+from page_planner import PagePlan, WorkStealingQueue, completion_report, page_chunks
+from progress_journal import ProgressJournal
+from rate_controller import (AdaptiveRateController, RetryPolicy, OK, THROTTLED, TIMEOUT,
+                             SERVER_ERROR, classify_status, parse_retry_after)
+from scrape_metrics import StageMetrics, TimedLock, set_combination, set_worker
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+BASE_URL = "https://mis.molwa.gov.bd"
+SHARD_LEVELS = ('district', 'upazila', 'prove_type')  # Work unit granularity of the listing crawl
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+def parse_fighters_page(html_content, combination, parser_backend='bs4'):
+    """Parse a listing page into fighter rows without deduplication (safe to run in worker processes)"""
+    fighters = []
+    
+    try:
+        rows, total_count, has_next_link = parse_listing_page(html_content, parser_backend)
+        if not rows:
+            return fighters, 0, False
+        
+        # Check if there are more pages - simplified approach
+        has_more_pages = False
+        if has_next_link:
+            # If we find a "Next" link, assume there are more pages
+            has_more_pages = True
+        # Alternative: check if we got a full page of results (assuming 10 per page)
+        elif len(rows) >= 10:
+            has_more_pages = True
+        
+        for cells, details_href in rows:
+            if len(cells) >= 7:  # Ensure we have enough columns
+                try:
+                    fighter_number, name, father_name, living_status, village, post_office = cells[1:7]
+                    
+                    # Upazila shards know their upazila; otherwise try the address or other info
+                    upazila_name = combination.get('upazila_name') or "Unknown"
+                    # Look for upazila info in additional cells if available
+                    if len(cells) > 8 and cells[8]:
+                        upazila_name = cells[8]
+                    
+                    # Get details link if available
+                    details = ""
+                    if details_href:
+                        details = f"{BASE_URL}{details_href}"
+                    
+                    fighter_data = {
+                        'মুক্তিযোদ্ধার নম্বর': fighter_number,
+                        'নাম': name,
+                        'পিতার নাম': father_name,
+                        'জীবিত কি না?': living_status,
+                        'গ্রাম/মহল্লা': village,
+                        'ডাকঘর': post_office,
+                        'উপজেলা': upazila_name,
+                        'জেলা': combination['district_name'],
+                        'বিভাগ': combination['division_name'],
+                        'তালিকা': combination.get('list_name', 'District Level Search'),
+                        'বিস্তারিত': details
+                    }
+                    
+                    fighters.append(fighter_data)
+                    
+                except Exception as e:
+                    print(f"Error parsing row: {e}")
+                    continue
+        
+        return fighters, total_count, has_more_pages
+        
+    except Exception as e:
+        print(f"Error parsing HTML for {combination['key']}: {e}")
+        return fighters, 0, False
+
 class DivisionDistrictScraper:
-    def __init__(self):
-        self.session = requests.Session()
-        self.csv_file = '../freedom_fighters_data.csv'
-        self.progress_file = 'division_district_progress.json'
-        self.existing_fighters = set()
-        self.csv_lock = threading.Lock()
-        self.progress_lock = threading.Lock()
+    def __init__(self, csv_file='../freedom_fighters_data.csv',
+                 progress_file='division_district_progress.json',
+                 location_file='location_data.json',
+                 base_url=BASE_URL, parser_backend=None, chunk_pages=10, shard_by='district',
+                 cache_dir=None, cache_max_age=0, quiet=False):
+        self.quiet = quiet
+        self.session = build_session(REQUEST_HEADERS, pool_size=8)
+        self.response_cache = ResponseCache(cache_dir, cache_max_age) if cache_dir else None
+        self.csv_file = csv_file
+        self.progress_file = progress_file
+        self.base_url = base_url.rstrip('/')
+        self.parser_backend = parser_backend or default_backend()
+        self.rate_controller = AdaptiveRateController()
+        self.retry_policy = RetryPolicy()
+        self.metrics = StageMetrics()
+        self.existing_fighters = FighterIndex(f"{csv_file}.idx")
+        self.sink = FighterSink(csv_file, metrics=self.metrics)
+        self.progress_lock = TimedLock(self.metrics, 'progress')
+        self.page_lock = TimedLock(self.metrics, 'page')
+        self.plan = PagePlan()
+        self.chunk_pages = chunk_pages
+        if shard_by not in SHARD_LEVELS:
+            raise ValueError(f"shard_by must be one of {SHARD_LEVELS}, got {shard_by!r}")
+        self.shard_by = shard_by
         
         # Load location data
-        with open('location_data_complete.json', 'r', encoding='utf-8') as f:
+        with open(location_file, 'r', encoding='utf-8') as f:
             self.location_data = json.load(f)
         
-        # Load progress if exists
+        # Load progress if exists (checkpoint plus journal replay)
+        self.journal = ProgressJournal(progress_file)
         self.progress = self.load_progress()
         
         # Load existing fighter numbers from CSV
         self.load_existing_fighters()
     
+    def log(self, message):
+        """Print progress output unless quiet; errors are always printed"""
+        if not self.quiet:
+            print(message)
+    
     def load_existing_fighters(self):
-        """Load existing freedom fighter numbers to avoid duplicates"""
-        if os.path.exists(self.csv_file):
-            try:
-                with open(self.csv_file, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        fighter_num = row.get('মুক্তিযোদ্ধার নম্বর', '').strip()
-                        if fighter_num:
-                            self.existing_fighters.add(fighter_num)
-                print(f"Loaded {len(self.existing_fighters)} existing fighter records from CSV")
-            except Exception as e:
-                print(f"Error loading existing data: {e}")
+        """Bring the persistent fighter-number index up to date with the CSV"""
+        try:
+            added = self.existing_fighters.sync_with_csv(self.csv_file)
+            self.log(f"Loaded {len(self.existing_fighters)} existing fighter records from index ({added} caught up from CSV)")
+        except Exception as e:
+            print(f"Error loading existing data: {e}")
     
     def load_progress(self):
-        """Load scraping progress"""
+        """Load scraping progress from the last checkpoint and replay the journal on top"""
+        return self.journal.load(self.load_checkpoint())
+    
+    def load_checkpoint(self):
+        """Load the checkpointed progress document"""
         if os.path.exists(self.progress_file):
             try:
                 with open(self.progress_file, 'r', encoding='utf-8') as f:
@@ -64,299 +164,391 @@ class DivisionDistrictScraper:
         }
     
     def save_progress(self, combination_key, page_number, total_pages=None, completed=False, new_records=0):
-        """Save scraping progress"""
+        """Save scraping progress (appended to the journal, checkpointed periodically)"""
+        with self.progress_lock, self.metrics.time('progress_save'):
+            self.journal.record(self.progress, combination_key, page_number, total_pages,
+                                completed=completed, new_records=new_records)
+    
+    def checkpoint_progress(self):
+        """Flush buffered rows, then fold the journal into the progress file"""
+        self.sink.flush()
+        self.existing_fighters.record_csv_size(self.csv_file)
         with self.progress_lock:
-            if combination_key not in self.progress['completed_combinations']:
-                self.progress['completed_combinations'][combination_key] = {
-                    'last_page': 0,
-                    'total_pages': 0,
-                    'completed': False
-                }
+            self.journal.compact(self.progress)
+    
+    def generate_combinations(self):
+        """Generate all pending work units at the configured shard level"""
+        combinations = []
+        
+        for combination in self.all_combinations():
+            entry = self.progress['completed_combinations'].get(combination['key'])
             
-            self.progress['completed_combinations'][combination_key]['last_page'] = page_number
-            if total_pages:
-                self.progress['completed_combinations'][combination_key]['total_pages'] = total_pages
-            if completed:
-                self.progress['completed_combinations'][combination_key]['completed'] = True
+            # Check if already completed
+            if entry and entry.get('completed', False):
+                continue
             
-            self.progress['new_records_found'] += new_records
-            self.progress['last_update'] = datetime.now().isoformat()
-            self.progress['current_combination'] = combination_key
+            # Get starting page if resuming
+            if entry:
+                combination['start_page'] = entry['last_page'] + 1
             
-            with open(self.progress_file, 'w', encoding='utf-8') as f:
-                json.dump(self.progress, f, ensure_ascii=False, indent=2)
+            combinations.append(combination)
+        
+        return combinations
     
-    def generate_combinations(self):
-        """Generate all division-district combinations"""
-        combinations = []
+    def all_combinations(self):
+        """Every work unit: division-district pairs, split per upazila (and prove type) when sharding"""
+        upazilas = self.location_data.get('upazilas', {})
+        prove_types = self.location_data.get('prove_types', {})
         
-        for div_id, div_name in self.location_data['divisions'].items():
+        for div_id in self.location_data['divisions']:
             if div_id not in self.location_data['districts']:
                 continue
-                
-            for dist_id, dist_name in self.location_data['districts'][div_id].items():
-                combination_key = f"{div_id}-{dist_id}"
-                
-                # Check if already completed
-                if (combination_key in self.progress['completed_combinations'] and 
-                    self.progress['completed_combinations'][combination_key].get('completed', False)):
+            
+            for dist_id in self.location_data['districts'][div_id]:
+                district_upazilas = upazilas.get(div_id, {}).get(dist_id, {})
+                if self.shard_by == 'district' or not district_upazilas:
+                    yield self.build_combination(div_id, dist_id)
                     continue
                 
-                # Get starting page if resuming
-                start_page = 1
-                if combination_key in self.progress['completed_combinations']:
-                    start_page = self.progress['completed_combinations'][combination_key]['last_page'] + 1
-                
-                combinations.append({
-                    'key': combination_key,
-                    'division_id': div_id,
-                    'division_name': div_name,
-                    'district_id': dist_id,
-                    'district_name': dist_name,
-                    'start_page': start_page
-                })
+                for thana_id in district_upazilas:
+                    if self.shard_by == 'upazila':
+                        yield self.build_combination(div_id, dist_id, thana_id=thana_id)
+                    else:
+                        for prove_type in prove_types:
+                            yield self.build_combination(div_id, dist_id, thana_id=thana_id,
+                                                         prove_type=prove_type)
+    
+    def build_combination(self, div_id, dist_id, start_page=1, thana_id='', prove_type=''):
+        """Build the work item for one division-district pair, or one upazila/prove type shard of it"""
+        combination = {
+            'key': '-'.join(part for part in (div_id, dist_id, thana_id, prove_type) if part),
+            'division_id': div_id,
+            'division_name': self.location_data['divisions'][div_id],
+            'district_id': dist_id,
+            'district_name': self.location_data['districts'][div_id][dist_id],
+            'start_page': start_page
+        }
+        if thana_id:
+            combination['thana_id'] = thana_id
+            combination['upazila_name'] = self.location_data['upazilas'][div_id][dist_id][thana_id]
+            combination['list_name'] = 'Upazila Level Search'
+        if prove_type:
+            combination['prove_type'] = prove_type
+            combination['list_name'] = self.location_data['prove_types'][prove_type]
+        return combination
+    
+    def combination_from_key(self, key, start_page=1):
+        """Rebuild a work item from its key ("div-dist[-thana[-prove_type]]")"""
+        div_id, dist_id, *rest = key.split('-')
+        thana_id, prove_type = (rest + ['', ''])[:2]
+        return self.build_combination(div_id, dist_id, start_page, thana_id, prove_type)
+    
+    def generate_residual_combinations(self):
+        """
+        District-level passes after sharding, for districts whose shards all
+        finished but left fewer unique rows in the output than the district
+        has entries (fighters without an upazila or prove type fall outside
+        every shard). Rows the shards already wrote are skipped by the index;
+        a district that turns out to be covered costs only its first page.
+        """
+        if self.shard_by == 'district':
+            return []
+        
+        self.sink.flush()
+        progress = self.progress['completed_combinations']
+        pending = {}
+        for combination in self.all_combinations():
+            district_key = f"{combination['division_id']}-{combination['district_id']}"
+            if not progress.get(combination['key'], {}).get('completed', False):
+                pending[district_key] = False
+            else:
+                pending.setdefault(district_key, True)
+        
+        rows_written = {}
+        if os.path.exists(self.csv_file):
+            for row in iter_rows(self.csv_file):
+                name_pair = (row.get('বিভাগ'), row.get('জেলা'))
+                rows_written[name_pair] = rows_written.get(name_pair, 0) + 1
         
+        combinations = []
+        for district_key, shards_done in pending.items():
+            entry = progress.get(district_key, {})
+            if not shards_done or entry.get('completed', False):
+                continue
+            div_id, dist_id = district_key.split('-')
+            combination = self.build_combination(div_id, dist_id, entry.get('last_page', 0) + 1)
+            combination['expected_count'] = rows_written.get(
+                (combination['division_name'], combination['district_name']), 0)
+            combinations.append(combination)
         return combinations
     
-    def get_page_results(self, combination, page=1):
-        """Get results for a specific page of a combination"""
-        url = "https://mis.molwa.gov.bd/freedom-fighter-list"
-        
-        params = {
+    def build_page_params(self, combination, page=1):
+        """Build the listing query parameters for a page of a combination"""
+        return {
             'division_id': combination['division_id'],
             'district_id': combination['district_id'],
-            'thana_id': '',  # Empty to get all upazilas in the district
-            'prove_type': '',  # Empty to get all prove types
+            'thana_id': combination.get('thana_id', ''),  # Empty to get all upazilas in the district
+            'prove_type': combination.get('prove_type', ''),  # Empty to get all prove types
             'name': '',
             'gazette_no': '',
             'beneficiary_code': '',
             'page': page
         }
+    
+    def get_page_results(self, combination, page=1):
+        """Get results for a specific page of a combination, retrying transient failures"""
+        url = f"{self.base_url}/freedom-fighter-list"
+        params = self.build_page_params(combination, page)
+        host = urlparse(url).netloc
+        error = None
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
+        cached, conditional = self.cache_lookup(combination, page)
+        if cached is not None:
+            return cached
         
-        try:
-            response = self.session.get(url, params=params, headers=headers, 
-                                      timeout=30, verify=False)
-            response.raise_for_status()
-            return response.text
-        except Exception as e:
-            print(f"Error fetching page {page} for {combination['key']}: {e}")
-            return None
+        failures = throttles = 0
+        while True:
+            with self.metrics.time('rate_wait'):
+                self.rate_controller.acquire(host)
+            start = time.monotonic()
+            retry_after = None
+            outcome = SERVER_ERROR
+            try:
+                response = self.session.get(url, params=params, headers=conditional,
+                                          timeout=30, verify=False)
+                outcome = classify_status(response.status_code)
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                error = f"HTTP {response.status_code}"
+            except requests.Timeout as e:
+                outcome, error = TIMEOUT, e
+            except requests.RequestException as e:
+                outcome, error = SERVER_ERROR, e
+            except Exception:
+                outcome = SERVER_ERROR  # Counted as a failed request, then raised to the caller
+                raise
+            finally:
+                # Always give back the in-flight slot (and a half-open breaker's probe)
+                self.rate_controller.release(host, outcome, time.monotonic() - start, retry_after)
+                self.metrics.observe('fetch', time.monotonic() - start)
+            
+            if outcome == OK:
+                body = self.cache_response(combination, page, response.status_code,
+                                           response.content, response.headers)
+                if body is not None:
+                    return body
+                conditional = {}  # Cached copy vanished after a 304; fetch it in full
+                continue
+            if outcome == THROTTLED:
+                throttles += 1
+            else:
+                failures += 1
+            if not self.retry_policy.should_retry(outcome, failures, throttles):
+                break
+            
+            delay = max(self.retry_policy.delay(failures + throttles - 1), retry_after or 0)
+            self.rate_controller.record_retry()
+            self.metrics.count('retries')
+            self.log(f"  Retrying page {page} for {combination['key']} in {delay:.1f}s ({error})")
+            time.sleep(delay)
+        
+        self.metrics.count('failed_pages')
+        print(f"Error fetching page {page} for {combination['key']} after {failures + throttles} failed attempts: {error}")
+        return None
+    
+    def cache_lookup(self, combination, page):
+        """(cached body to use without a request, or None; conditional request headers)"""
+        if self.response_cache is None:
+            return None, {}
+        cached, conditional = self.response_cache.lookup(combination['key'], page)
+        if cached is not None:
+            self.metrics.count('cache_fresh_hits')
+        return cached, conditional
+    
+    def cache_response(self, combination, page, status, body, headers):
+        """Return the page body, storing a 200 in the response cache or reading it back for a 304"""
+        if self.response_cache is None:
+            return body
+        if status == 304:
+            return self.response_cache.not_modified(combination['key'], page)
+        self.response_cache.store(combination['key'], page, body, headers)
+        return body
     
     def clean_text(self, text):
         """Clean and normalize text"""
-        if not text:
-            return ""
-        
-        # Remove extra whitespace and normalize
-        text = re.sub(r'\s+', ' ', str(text).strip())
-        return text
+        return clean_text(text)
+    
+    def filter_new_fighters(self, fighters):
+        """Drop fighters already in the CSV (or seen earlier this session) and mark the rest as seen"""
+        new_fighters = []
+        for fighter in fighters:
+            # Skip if this fighter already exists in our CSV or was reserved earlier this session;
+            # the number is committed to the index once its row is on disk (see save_page)
+            if self.existing_fighters.reserve(fighter['মুক্তিযোদ্ধার নম্বর']):
+                new_fighters.append(fighter)
+        return new_fighters
     
     def extract_fighters_from_html(self, html_content, combination):
         """Extract freedom fighter data from HTML"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        fighters = []
-        total_count = 0
+        fighters, total_count, has_more_pages = parse_fighters_page(html_content, combination, self.parser_backend)
+        return self.filter_new_fighters(fighters), total_count, has_more_pages
+    
+    def save_fighters_to_csv(self, fighters, on_durable=None):
+        """Queue fighters for the output sink; on_durable runs once they are fsynced"""
+        self.sink.write(fighters, on_durable)
+    
+    def save_page(self, combination_key, page_number, fighters, total_pages=None, completed=False):
+        """Queue a page's rows and journal its progress only after the rows are on disk"""
+        def record_progress():
+            self.existing_fighters.commit([f['মুক্তিযোদ্ধার নম্বর'] for f in fighters])
+            self.save_progress(combination_key, page_number, total_pages,
+                               completed=completed, new_records=len(fighters))
+        self.save_fighters_to_csv(fighters, on_durable=record_progress)
+    
+    def handle_page(self, combination, page, parsed):
+        """Deduplicate and store one parsed page; return the follow-up pages to schedule"""
+        key = combination['key']
+        fighters, total_count, has_more_pages = parsed
+        with self.metrics.time('dedup'):
+            fighters = self.filter_new_fighters(fighters)
+        self.metrics.count('pages')
         
-        try:
-            # Find the table with freedom fighter data
-            table = soup.find('table', class_='table')
-            if not table:
-                return fighters, 0, False
-            
-            # Find tbody and get rows safely
-            tbody = table.find('tbody')
-            rows = []
-            if tbody and str(type(tbody)) != "<class 'bs4.element.NavigableString'>":
-                try:
-                    rows = tbody.find_all('tr')
-                except:
-                    pass
-            
-            if not rows:
-                return fighters, 0, False
-            
-            # Get total count from pagination info if available
-            pagination_info = soup.find('div', class_='dataTables_info')
-            if pagination_info:
-                text = pagination_info.get_text()
-                # Extract total count from text like "Showing 1 to 10 of 57 entries"
-                match = re.search(r'of (\d+) entries', text)
-                if match:
-                    total_count = int(match.group(1))
-            
-            # Check if there are more pages - simplified approach
-            has_more_pages = False
-            next_links = soup.find_all('a', string='Next')
-            if next_links:
-                # If we find a "Next" link, assume there are more pages
-                has_more_pages = True
-            # Alternative: check if we got a full page of results (assuming 10 per page)
-            elif len(rows) >= 10:
-                has_more_pages = True
-            
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 7:  # Ensure we have enough columns
-                    try:
-                        fighter_number = self.clean_text(cells[1].get_text())
-                        name = self.clean_text(cells[2].get_text())
-                        father_name = self.clean_text(cells[3].get_text())
-                        living_status = self.clean_text(cells[4].get_text())
-                        village = self.clean_text(cells[5].get_text())
-                        post_office = self.clean_text(cells[6].get_text())
-                        
-                        # Skip if this fighter already exists in our CSV
-                        if fighter_number in self.existing_fighters:
-                            continue
-                        
-                        # Try to determine upazila from the address or other info
-                        upazila_name = "Unknown"
-                        # Look for upazila info in additional cells if available
-                        if len(cells) > 8:
-                            upazila_info = self.clean_text(cells[8].get_text())
-                            if upazila_info:
-                                upazila_name = upazila_info
-                        
-                        # Get details link if available
-                        details = ""
-                        details_link = cells[7].find('a') if len(cells) > 7 else None
-                        if details_link and details_link.get('href'):
-                            details = f"https://mis.molwa.gov.bd{details_link.get('href')}"
-                        
-                        fighter_data = {
-                            'মুক্তিযোদ্ধার নম্বর': fighter_number,
-                            'নাম': name,
-                            'পিতার নাম': father_name,
-                            'জীবিত কি না?': living_status,
-                            'গ্রাম/মহল্লা': village,
-                            'ডাকঘর': post_office,
-                            'উপজেলা': upazila_name,
-                            'জেলা': combination['district_name'],
-                            'বিভাগ': combination['division_name'],
-                            'তালিকা': 'District Level Search',
-                            'বিস্তারিত': details
-                        }
-                        
-                        fighters.append(fighter_data)
-                        # Add to existing fighters set to avoid duplicates within this session
-                        self.existing_fighters.add(fighter_number)
-                        
-                    except Exception as e:
-                        print(f"Error parsing row: {e}")
-                        continue
-            
-            return fighters, total_count, has_more_pages
-            
-        except Exception as e:
-            print(f"Error parsing HTML for {combination['key']}: {e}")
-            return fighters, 0, False
+        if fighters:
+            self.log(f"  {key} page {page}: Found {len(fighters)} new fighters")
+        
+        follow_up = []
+        if not self.plan.total_pages(key):
+            if total_count > 0 and total_count <= combination.get('expected_count', -1):
+                # Residual district pass: the shards already wrote every entry
+                self.plan.plan(key, total_count, page, covered=True)
+                self.log(f"Covered by shards: {key} ({combination['district_name']}) - {total_count} entries")
+            elif total_count > 0:
+                # The entry count gives the exact page list; no trailing empty page is requested
+                follow_up = self.plan.plan(key, total_count, page)
+                self.log(f"Planned: {key} ({combination.get('upazila_name') or combination['district_name']}) - "
+                      f"{self.plan.total_pages(key)} pages, {len(follow_up)} to fetch")
+            elif has_more_pages:
+                # No entry count on the page: fall back to following the Next link
+                follow_up = [page + 1]
+            elif page == combination['start_page'] and not fighters:
+                self.log(f"  No new data found for combination: {key}")
+        
+        # The sink writes batches in queue order, so queueing under the same lock that advances
+        # last_page keeps a page's rows ahead of any journal entry that counts it as done
+        with self.page_lock:
+            last_page, total_pages, completed = self.plan.page_done(key, page, len(fighters),
+                                                                    has_more_pages=bool(follow_up))
+            self.save_page(key, last_page, fighters, total_pages, completed=completed)
+        if completed:
+            self.report_completed(combination)
+        return follow_up
     
-    def save_fighters_to_csv(self, fighters):
-        """Save fighters data to CSV file"""
-        if not fighters:
-            return
+    def report_completed(self, combination):
+        """Print a combination's result and overall page progress"""
+        fetched, planned, completed, total = self.plan.totals()
+        self.log(f"Completed: {combination['key']} - New fighters found: {self.plan.new_records(combination['key'])}")
+        self.log(f"Progress: {completed}/{total} combinations completed, "
+              f"{fetched}/{planned} planned pages fetched")
+    
+    def report_incomplete(self):
+        """Print exact completion for every combination left unfinished"""
+        for key in self.plan.incomplete():
+            state = self.plan.states[key]
+            print(f"  {key}: {self.plan.percent(key):.1f}% "
+                  f"(contiguous through page {state['last_page']} of {state['total_pages'] or '?'})")
+    
+    def print_status(self):
+        """Print exact completion per division-district pair (summed over its shards) from the saved progress"""
+        units = {}
+        for combination in self.all_combinations():
+            units.setdefault((combination['division_id'], combination['district_id']), []).append(combination['key'])
         
-        with self.csv_lock:
+        pages_done = pages_total = 0
+        for (div_id, dist_id), keys in units.items():
+            report = completion_report(self.progress, keys)
+            done = sum(min(last_page, total_pages) for _, last_page, total_pages, _ in report)
+            total = sum(total_pages for _, _, total_pages, _ in report)
+            units_done = sum(1 for *_, percent in report if percent == 100.0)
+            if units_done == len(keys):
+                percent = 100.0
+            else:
+                percent = done / total * 100 if total else 0.0
+            shards = f", {units_done}/{len(keys)} shards" if len(keys) > 1 else ""
+            print(f"{div_id}-{dist_id:<3} {self.location_data['districts'][div_id][dist_id]:<20} "
+                  f"{percent:6.1f}% ({done}/{total or '?'} pages{shards})")
+            pages_done += done
+            pages_total += total
+        if pages_total:
+            print(f"Overall: {pages_done}/{pages_total} known pages ({pages_done / pages_total * 100:.1f}%)")
+    
+    def queue_combination(self, combination, work_queue):
+        """Register a combination and queue its known pages (or just its first page)"""
+        entry = self.progress['completed_combinations'].get(combination['key'], {})
+        total_pages = entry.get('total_pages', 0)
+        self.plan.add(combination, total_pages)
+        if total_pages:
+            pages = list(range(combination['start_page'], total_pages + 1))
+        else:
+            pages = [combination['start_page']]
+        for chunk in page_chunks(pages, self.chunk_pages):
+            work_queue.put((combination, chunk))
+    
+    def scrape_worker(self, worker_id, work_queue):
+        """Fetch page chunks from the work-stealing queue until no work is left"""
+        set_worker(worker_id)
+        while True:
+            with self.metrics.time('queue_wait'):
+                unit = work_queue.get(worker_id)
+            if unit is None:
+                return
+            combination, pages = unit
+            set_combination(combination['key'])
             try:
-                # Check if file exists to determine if we need headers
-                file_exists = os.path.exists(self.csv_file)
-                
-                with open(self.csv_file, 'a', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=[
-                        'মুক্তিযোদ্ধার নম্বর', 'নাম', 'পিতার নাম', 'জীবিত কি না?', 
-                        'গ্রাম/মহল্লা', 'ডাকঘর', 'উপজেলা', 'জেলা', 'বিভাগ', 'তালিকা', 'বিস্তারিত'
-                    ])
-                    
-                    # Write headers only if file is new
-                    if not file_exists:
-                        writer.writeheader()
-                    
-                    for fighter in fighters:
-                        writer.writerow(fighter)
-                        
-                print(f"Saved {len(fighters)} new fighters to CSV")
-                
+                for page in pages:
+                    html_content = self.get_page_results(combination, page)
+                    if not html_content:
+                        print(f"  Giving up on {combination['key']} page {page}; it will be fetched again on the next run")
+                        continue
+                    with self.metrics.time('parse'):
+                        parsed = parse_fighters_page(html_content, combination, self.parser_backend)
+                    follow_up = self.handle_page(combination, page, parsed)
+                    # Keep new chunks on this worker; idle workers steal them from the back
+                    for chunk in page_chunks(follow_up, self.chunk_pages):
+                        work_queue.put((combination, chunk), worker_id)
             except Exception as e:
-                print(f"Error saving to CSV: {e}")
+                print(f"Error processing {combination['key']} pages {pages[0]}-{pages[-1]}: {e}")
+            finally:
+                set_combination(None)
+                work_queue.task_done()
     
-    def process_combination(self, combination):
-        """Process a single division-district combination and extract all fighters"""
-        print(f"Processing: {combination['key']} ({combination['division_name']} > {combination['district_name']})")
-        
-        total_new_fighters = 0
-        page = combination['start_page']
-        has_more_pages = True
-        total_pages_estimate = 0
-        
-        while has_more_pages:
-            print(f"  Processing page {page}...")
-            
-            html_content = self.get_page_results(combination, page)
-            if not html_content:
-                break
-            
-            fighters, total_count, has_more_pages = self.extract_fighters_from_html(html_content, combination)
-            
-            # Calculate total pages estimate
-            if total_count > 0 and total_pages_estimate == 0:
-                total_pages_estimate = (total_count + 9) // 10  # Assuming 10 records per page
-            
-            if fighters:
-                self.save_fighters_to_csv(fighters)
-                total_new_fighters += len(fighters)
-                print(f"  Page {page}: Found {len(fighters)} new fighters")
-            else:
-                if page == combination['start_page']:
-                    print(f"  No new data found for combination: {combination['key']}")
-            
-            # Save progress for this page
-            self.save_progress(combination['key'], page, total_pages_estimate, 
-                             completed=not has_more_pages, new_records=len(fighters) if fighters else 0)
-            
-            if has_more_pages:
-                page += 1
-                time.sleep(0.8)  # Rate limiting between pages
-            
-            # Safety check: don't process more than 1000 pages for any combination
-            if page > 1000:
-                print(f"  Warning: Reached page limit (1000) for {combination['key']}")
-                break
+    def scrape_combinations(self, combinations, max_workers):
+        """Scrape combinations with worker threads sharing a work-stealing queue; returns chunks stolen"""
+        work_queue = WorkStealingQueue(max_workers)
+        for combination in combinations:
+            self.queue_combination(combination, work_queue)
         
-        print(f"Completed: {combination['key']} - New fighters found: {total_new_fighters}")
-        return total_new_fighters
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for worker_id in range(max_workers):
+                executor.submit(self.scrape_worker, worker_id, work_queue)
+        return work_queue.steals
     
     def run_scraping(self, max_workers=8):
-        """Run the scraping process with multiple threads"""
+        """Run the scraping process with multiple threads sharing one page-level work queue"""
         combinations = self.generate_combinations()
         total_combinations_to_process = len(combinations)
         
-        # Calculate total possible combinations
-        total_possible_combinations = 0
-        completed_combinations = 0
-        for div_id in self.location_data['divisions']:
-            if div_id in self.location_data['districts']:
-                div_districts = len(self.location_data['districts'][div_id])
-                total_possible_combinations += div_districts
-                # Count completed combinations
-                for dist_id in self.location_data['districts'][div_id]:
-                    combination_key = f"{div_id}-{dist_id}"
-                    if (combination_key in self.progress['completed_combinations'] and 
-                        self.progress['completed_combinations'][combination_key].get('completed', False)):
-                        completed_combinations += 1
+        # Calculate total possible combinations and count completed ones
+        all_keys = [combination['key'] for combination in self.all_combinations()]
+        total_possible_combinations = len(all_keys)
+        completed_combinations = sum(
+            1 for key in all_keys
+            if self.progress['completed_combinations'].get(key, {}).get('completed', False))
         
         print(f"Starting division-district scraper")
-        print(f"Total combinations to process: {total_combinations_to_process}")
+        print(f"Total combinations to process: {total_combinations_to_process} ({self.shard_by} level)")
         print(f"Already completed: {completed_combinations}/{total_possible_combinations}")
         print(f"Using {max_workers} concurrent workers")
+        self.rate_controller.max_concurrency = max_workers
+        resize_pool(self.session, max_workers)
         print(f"Existing fighters in CSV: {len(self.existing_fighters)}")
         
         if not combinations:
@@ -368,40 +560,31 @@ class DivisionDistrictScraper:
             return
         
         start_time = time.time()
-        total_new_records = 0
-        completed_in_this_run = 0
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all combinations
-            future_to_combination = {
-                executor.submit(self.process_combination, combo): combo 
-                for combo in combinations
-            }
-            
-            # Process results as they complete
-            for future in as_completed(future_to_combination):
-                combination = future_to_combination[future]
-                try:
-                    new_records = future.result()
-                    total_new_records += new_records
-                    completed_in_this_run += 1
-                    
-                    # Progress update
-                    current_completed = completed_combinations + completed_in_this_run
-                    print(f"Progress: {current_completed}/{total_possible_combinations} combinations completed ({completed_in_this_run}/{total_combinations_to_process} in this run)")
-                    
-                except Exception as e:
-                    print(f"Error processing combination {combination['key']}: {e}")
-                
-                # Add delay between combinations to be respectful
-                time.sleep(1.5)
+        steals = 0
+        try:
+            steals += self.scrape_combinations(combinations, max_workers)
+            residual = self.generate_residual_combinations()
+            if residual:
+                print(f"Checking {len(residual)} sharded districts for fighters outside every shard")
+                steals += self.scrape_combinations(residual, max_workers)
+        finally:
+            self.checkpoint_progress()
+            self.sink.close()
         
         elapsed_time = time.time() - start_time
+        fetched, planned, completed, total = self.plan.totals()
         print(f"\nDivision-district scraping completed!")
         print(f"Total time: {elapsed_time:.2f} seconds")
-        print(f"Total new records found: {total_new_records}")
+        print(f"Total new records found: {sum(self.plan.new_records(key) for key in self.plan.states)}")
+        print(f"Pages fetched: {fetched}/{planned} planned, {steals} chunks stolen by idle workers")
+        print(f"Combinations completed: {completed}/{total}")
+        self.report_incomplete()
         print(f"Total existing fighters: {len(self.existing_fighters)}")
+        print(f"Request pacing: {self.rate_controller.snapshot()}")
+        if self.response_cache is not None:
+            print(f"Response cache: {self.response_cache.summary()}")
         print(f"CSV file: {self.csv_file}")
+        print(f"Stage timings (all workers):\n{self.metrics.report()}")
 
 def main():
     scraper = DivisionDistrictScraper()
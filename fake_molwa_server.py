@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for mis.molwa.gov.bd/freedom-fighter-list
+Serves deterministic synthetic listing pages with the same table markup,
+dataTables_info text and pagination links as the real site, plus a details
+page per fighter, so the scrapers can be run and timed without touching
+the government server. With --replay DIR it serves recorded pages instead
+(listing/{key}-p{page}.html as saved by --save-pages, details/{id}.html).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from html import escape
+from urllib.parse import urlparse, parse_qs
+
+from detail_parser import (BASIC_INFO_LABELS, BASIC_INFO_TITLE, PROVE_DOCUMENT_COLUMNS,
+                           PROVE_DOCUMENTS_TITLE, WARIS_COLUMNS, WARIS_INFO_TITLE)
+
+PAGE_SIZE = 10
+SITE_URL = 'https://mis.molwa.gov.bd'
+RELATIONSHIPS = ['স্ত্রী', 'পুত্র', 'কন্যা', 'স্বামী']
+BENGALI_DIGITS = str.maketrans('0123456789', '০১২৩৪৫৬৭৮৯')
+LIVING_STATUSES = ['জীবিত', 'মৃত']
+
+
+def to_bengali_digits(value):
+    """Convert ASCII digits in a value to Bengali numerals"""
+    return str(value).translate(BENGALI_DIGITS)
+
+
+class FakeMolwaData:
+    """Deterministic synthetic fighter list keyed by division and district"""
+
+    def __init__(self, location_data, district_sizes=None, default_size=57, unassigned_every=0):
+        self.location_data = location_data
+        self.district_sizes = district_sizes or {}
+        self.default_size = default_size
+        self.unassigned_every = unassigned_every  # Every Nth fighter has no upazila (0 = none)
+        self._cache = {}
+
+    def _make_fighter(self, div_id, dist_id, n):
+        upazilas = list(self.location_data.get('upazilas', {}).get(div_id, {}).get(dist_id, {}).items()) or [('0', 'Unknown')]
+        prove_types = list(self.location_data.get('prove_types', {}).keys()) or ['1']
+        upazila_id, upazila_name = upazilas[n % len(upazilas)]
+        if self.unassigned_every and n % self.unassigned_every == self.unassigned_every - 1:
+            upazila_id, upazila_name = '', ''
+        ascii_number = f"{int(dist_id):02d}{int(div_id):02d}{n + 1:07d}"
+        return {
+            'n': n,
+            'fighter_number': to_bengali_digits(ascii_number),
+            'ascii_number': ascii_number,
+            'name': f"মুক্তিযোদ্ধা {to_bengali_digits(n + 1)}",
+            'father_name': f"পিতা {to_bengali_digits(n + 1)}",
+            'mother_name': f"মাতা {to_bengali_digits(n + 1)}",
+            'division_name': self.location_data['divisions'].get(div_id, ''),
+            'district_name': self.location_data['districts'].get(div_id, {}).get(dist_id, ''),
+            'living_status': LIVING_STATUSES[n % len(LIVING_STATUSES)],
+            'village': f"গ্রাম {to_bengali_digits(n % 97)}",
+            'post_office': f"ডাকঘর {to_bengali_digits(n % 13)}",
+            'thana_id': upazila_id,
+            'upazila_name': upazila_name,
+            'prove_type': prove_types[n % len(prove_types)],
+        }
+
+    def fighters_for(self, div_id, dist_id):
+        """Return every synthetic fighter row for a division-district pair"""
+        key = f"{div_id}-{dist_id}"
+        if key not in self._cache:
+            size = self.district_sizes.get(key, self.default_size)
+            self._cache[key] = [self._make_fighter(div_id, dist_id, n) for n in range(size)]
+        return self._cache[key]
+
+    def mutate(self, modified=0, removed=0, added=0, seed=0):
+        """
+        Change the list in place for re-verification tests: flip the living
+        status (and rename) of `modified` fighters, drop `removed` fighters
+        and append `added` new ones. Returns {kind: [fighter numbers]}.
+        """
+        rng = random.Random(seed)
+        districts = [(div_id, dist_id) for div_id, districts in self.location_data['districts'].items()
+                     for dist_id in districts]
+        everyone = [(div_id, dist_id, fighter) for div_id, dist_id in districts
+                    for fighter in self.fighters_for(div_id, dist_id)]
+        picked = rng.sample(everyone, min(modified + removed, len(everyone)))
+        changes = {'modified': [], 'removed': [], 'added': []}
+
+        for div_id, dist_id, fighter in picked[:modified]:
+            fighter['living_status'] = LIVING_STATUSES[(LIVING_STATUSES.index(fighter['living_status']) + 1) % len(LIVING_STATUSES)]
+            fighter['name'] += ' (সংশোধিত)'
+            changes['modified'].append(fighter['fighter_number'])
+        for div_id, dist_id, fighter in picked[modified:]:
+            self.fighters_for(div_id, dist_id).remove(fighter)
+            changes['removed'].append(fighter['fighter_number'])
+        for _ in range(added):
+            div_id, dist_id = rng.choice(districts)
+            fighters = self.fighters_for(div_id, dist_id)
+            fighter = self._make_fighter(div_id, dist_id, max((f['n'] for f in fighters), default=-1) + 1)
+            fighters.append(fighter)
+            changes['added'].append(fighter['fighter_number'])
+        return changes
+
+    def all_fighters(self):
+        """Every synthetic fighter in every district of the location data"""
+        for div_id, districts in self.location_data['districts'].items():
+            for dist_id in districts:
+                yield from self.fighters_for(div_id, dist_id)
+
+    def detail_record(self, fighter):
+        """A fighters/{id}.json record for a synthetic fighter, shaped like the release files"""
+        n = fighter['n']
+        prove_types = list(self.location_data.get('prove_types', {}).values()) or ['বেসামরিক গেজেট']
+        record = {
+            'fighter_number': fighter['fighter_number'],
+            'detail_url': f"{SITE_URL}/freedom-fighter-list/details/{fighter['ascii_number']}",
+            'fighter_photo_url': f"{SITE_URL}/uploads/ffbeneficiary/photo-{fighter['ascii_number']}.png" if n % 3 else '',
+            'basic_info': {
+                'name': fighter['name'],
+                'father_name': fighter['father_name'],
+                'mother_name': fighter['mother_name'],
+                'living_status': fighter['living_status'],
+                'division': fighter['division_name'],
+                'district': fighter['district_name'],
+                'upazila': fighter['upazila_name'],
+                'post_office': fighter['post_office'],
+                'village': fighter['village'],
+            },
+            'prove_documents': [
+                {
+                    'document_type': prove_types[(n + i) % len(prove_types)],
+                    'document_no': to_bengali_digits(f"{n * 7 + i:06d}"),
+                }
+                for i in range(n % 3 + 1)
+            ],
+            'waris_info': [
+                {
+                    'name': f"ওয়ারিশ {to_bengali_digits(n + 1)}-{to_bengali_digits(i + 1)}",
+                    'relationship': RELATIONSHIPS[(n + i) % len(RELATIONSHIPS)],
+                    'photo_url': f"{SITE_URL}/uploads/waris/photo-{fighter['ascii_number']}-{i + 1}.png" if (n + i) % 2 else '',
+                }
+                for i in range(n % 4)
+            ],
+            'scraped_at': '2025-07-25T19:32:24.490947',
+        }
+        if not record['fighter_photo_url']:
+            del record['fighter_photo_url']  # Not every fighter has a photo
+        return record
+
+    def find(self, ascii_number):
+        """The synthetic fighter with an ASCII detail id, or None"""
+        if len(ascii_number) != 11 or not ascii_number.isdigit():
+            return None
+        dist_id, div_id = str(int(ascii_number[:2])), str(int(ascii_number[2:4]))
+        if dist_id not in self.location_data['districts'].get(div_id, {}):
+            return None
+        return next((f for f in self.fighters_for(div_id, dist_id) if f['ascii_number'] == ascii_number), None)
+
+    def search(self, params):
+        """Filter fighters the way the listing search form does"""
+        div_id = params.get('division_id', '')
+        dist_id = params.get('district_id', '')
+        if not div_id or not dist_id:
+            return []
+
+        fighters = self.fighters_for(div_id, dist_id)
+        thana_id = params.get('thana_id', '')
+        prove_type = params.get('prove_type', '')
+        if thana_id:
+            fighters = [f for f in fighters if f['thana_id'] == thana_id]
+        if prove_type:
+            fighters = [f for f in fighters if f['prove_type'] == prove_type]
+        return fighters
+
+    def listing_page(self, params, page, page_size=PAGE_SIZE):
+        return render_listing_page(self.search(params), page, page_size)
+
+    def detail_page(self, ascii_number):
+        """Details page HTML, or None for an unknown fighter"""
+        fighter = self.find(ascii_number)
+        return None if fighter is None else render_detail_page(self.detail_record(fighter))
+
+
+class ReplayData:
+    """Recorded pages in place of the synthetic list, with the same interface for the handler"""
+
+    def __init__(self, fixtures_dir):
+        self.listing_dir = os.path.join(fixtures_dir, 'listing')
+        self.details_dir = os.path.join(fixtures_dir, 'details')
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def listing_page(self, params, page, page_size=PAGE_SIZE):
+        # Same key as DivisionDistrictScraper.build_combination; unrecorded pages are empty result pages
+        key = '-'.join(params[name] for name in ('division_id', 'district_id', 'thana_id', 'prove_type')
+                       if params.get(name))
+        html = self._read(os.path.join(self.listing_dir, f"{key}-p{page}.html"))
+        return html if html is not None else render_listing_page([], page, page_size)
+
+    def detail_page(self, ascii_number):
+        if not ascii_number.isdigit():
+            return None
+        return self._read(os.path.join(self.details_dir, f"{ascii_number}.html"))
+
+    def detail_ids(self):
+        """ASCII ids of every recorded details page"""
+        if not os.path.isdir(self.details_dir):
+            return []
+        return sorted(name[:-len('.html')] for name in os.listdir(self.details_dir) if name.endswith('.html'))
+
+
+def render_listing_page(fighters, page, page_size=PAGE_SIZE):
+    """Render one listing page with the same markup as the MOLWA site"""
+    total = len(fighters)
+    start = (page - 1) * page_size
+    page_rows = fighters[start:start + page_size]
+
+    rows = []
+    for offset, fighter in enumerate(page_rows):
+        rows.append(
+            '<tr>'
+            f'<td>{to_bengali_digits(start + offset + 1)}</td>'
+            f'<td>{fighter["fighter_number"]}</td>'
+            f'<td>{escape(fighter["name"])}</td>'
+            f'<td>{escape(fighter["father_name"])}</td>'
+            f'<td>{escape(fighter["living_status"])}</td>'
+            f'<td>{escape(fighter["village"])}</td>'
+            f'<td>{escape(fighter["post_office"])}</td>'
+            f'<td><a class="btn btn-info btn-sm" href="/freedom-fighter-list/details/{fighter["ascii_number"]}">বিস্তারিত</a></td>'
+            '</tr>'
+        )
+
+    pagination = ''
+    if total:
+        shown_to = min(start + page_size, total)
+        pagination = f'<div class="dataTables_info">Showing {start + 1 if page_rows else 0} to {shown_to if page_rows else 0} of {total} entries</div>'
+        links = []
+        if page > 1:
+            links.append(f'<li class="page-item"><a class="page-link" href="?page={page - 1}">Previous</a></li>')
+        if start + page_size < total:
+            links.append(f'<li class="page-item"><a class="page-link" href="?page={page + 1}">Next</a></li>')
+        pagination += f'<ul class="pagination">{"".join(links)}</ul>'
+
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>মুক্তিযোদ্ধা তালিকা</title></head><body>'
+        '<div class="card"><div class="card-body">'
+        '<table class="table table-bordered table-striped">'
+        '<thead><tr><th>ক্রমিক</th><th>মুক্তিযোদ্ধার নম্বর</th><th>নাম</th><th>পিতার নাম</th>'
+        '<th>জীবিত কি না?</th><th>গ্রাম/মহল্লা</th><th>ডাকঘর</th><th>বিস্তারিত</th></tr></thead>'
+        f'<tbody>{"".join(rows)}</tbody></table>{pagination}'
+        '</div></div></body></html>'
+    )
+
+
+def _site_path(url):
+    return url[len(SITE_URL):] if url.startswith(SITE_URL) else url
+
+
+def render_detail_page(record):
+    """Render a fighter's details page from its release record"""
+    basic_rows = ''.join(f'<tr><th>{escape(label)}</th><td>{escape(record["basic_info"].get(field, ""))}</td></tr>'
+                         for label, field in BASIC_INFO_LABELS.items())
+    photo = ''
+    if record.get('fighter_photo_url'):
+        photo = f'<img class="fighter-photo" src="{escape(_site_path(record["fighter_photo_url"]))}" alt="">'
+
+    def table(columns, rows):
+        head = ''.join(f'<th>{escape(label)}</th>' for label in columns)
+        body = []
+        for row in rows:
+            cells = []
+            for field in columns.values():
+                value = row.get(field, '')
+                if field == 'photo_url':
+                    cells.append(f'<td><img src="{escape(_site_path(value))}" alt=""></td>' if value else '<td></td>')
+                else:
+                    cells.append(f'<td>{escape(value)}</td>')
+            body.append(f'<tr>{"".join(cells)}</tr>')
+        return f'<table class="table table-bordered"><thead><tr>{head}</tr></thead><tbody>{"".join(body)}</tbody></table>'
+
+    def card(title, content):
+        return f'<div class="card"><div class="card-header">{escape(title)}</div><div class="card-body">{content}</div></div>'
+
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>মুক্তিযোদ্ধার বিস্তারিত</title></head><body>'
+        + card(BASIC_INFO_TITLE, f'{photo}<table class="table table-bordered">{basic_rows}</table>')
+        + card(PROVE_DOCUMENTS_TITLE, table(PROVE_DOCUMENT_COLUMNS, record['prove_documents']))
+        + card(WARIS_INFO_TITLE, table(WARIS_COLUMNS, record['waris_info']))
+        + '</body></html>'
+    )
+
+
+def write_fighter_files(data, out_dir, limit=None):
+    """Write synthetic fighters/{id}.json files; returns how many were written"""
+    os.makedirs(out_dir, exist_ok=True)
+    written = 0
+    for fighter in data.all_fighters():
+        if limit is not None and written >= limit:
+            break
+        with open(os.path.join(out_dir, f"{fighter['ascii_number']}.json"), 'w', encoding='utf-8') as f:
+            json.dump(data.detail_record(fighter), f, ensure_ascii=False, indent=2)
+        written += 1
+    return written
+
+
+class FakeMolwaHandler(BaseHTTPRequestHandler):
+    """Request handler; server-wide settings live on self.server"""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, keep-alive
+    # clients wait out a delayed ACK (~40 ms) on every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query, keep_blank_values=True).items()}
+
+        with self.server.stats_lock:
+            self.server.request_count += 1
+            self.server.in_flight += 1
+            in_flight = self.server.in_flight
+        try:
+            self.handle_request(parsed, params, in_flight)
+        finally:
+            with self.server.stats_lock:
+                self.server.in_flight -= 1
+
+    def handle_request(self, parsed, params, in_flight):
+        server = self.server
+        if server.latency or server.latency_jitter:
+            time.sleep(server.latency + random.uniform(0, server.latency_jitter))
+
+        # Injected faults: overload throttling, then random server errors
+        if server.throttle_above and in_flight > server.throttle_above:
+            with server.stats_lock:
+                server.fault_count += 1
+            self.send_html('<html><body>Too Many Requests</body></html>', status=429,
+                           extra_headers={'Retry-After': '1'})
+            return
+        if server.error_rate and random.random() < server.error_rate:
+            with server.stats_lock:
+                server.fault_count += 1
+            self.send_html('<html><body>Server Error</body></html>', status=random.choice([500, 502, 503]))
+            return
+
+        if parsed.path.rstrip('/') == '/freedom-fighter-list':
+            try:
+                page = max(int(params.get('page') or 1), 1)
+            except ValueError:
+                page = 1
+            self.send_conditional(self.server.data.listing_page(params, page, self.server.page_size))
+        elif parsed.path.startswith('/freedom-fighter-list/details/'):
+            html = self.server.data.detail_page(parsed.path.rstrip('/').rsplit('/', 1)[-1])
+            if html is None:
+                self.send_html('<html><body>Not Found</body></html>', status=404)
+            else:
+                self.send_conditional(html)
+        else:
+            self.send_html('<html><body>Not Found</body></html>', status=404)
+
+    def send_conditional(self, html):
+        """Send a page with validators, answering a matching If-None-Match with 304"""
+        etag = '"' + hashlib.sha1(html.encode('utf-8')).hexdigest()[:16] + '"'
+        validators = {'ETag': etag, 'Last-Modified': self.server.last_modified}
+        if self.headers.get('If-None-Match') == etag:
+            with self.server.stats_lock:
+                self.server.not_modified_count += 1
+            self.send_response(304)
+            for name, value in validators.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        self.send_html(html, extra_headers=validators)
+
+    def send_html(self, html, status=200, extra_headers=None):
+        body = html.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class QuietThreadingHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that does not print tracebacks for clients hanging up mid-response"""
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+class FakeMolwaServer:
+    """Threaded local HTTP server that mimics the MOLWA listing and details endpoints"""
+
+    def __init__(self, location_data, district_sizes=None, default_size=57,
+                 host='127.0.0.1', port=0, latency=0.0, page_size=PAGE_SIZE, verbose=False,
+                 latency_jitter=0.0, error_rate=0.0, throttle_above=0, unassigned_every=0, replay_dir=None):
+        self.httpd = QuietThreadingHTTPServer((host, port), FakeMolwaHandler)
+        self.httpd.daemon_threads = True
+        if replay_dir:
+            self.httpd.data = ReplayData(replay_dir)
+        else:
+            self.httpd.data = FakeMolwaData(location_data, district_sizes, default_size, unassigned_every)
+        self.httpd.latency = latency
+        self.httpd.latency_jitter = latency_jitter
+        self.httpd.error_rate = error_rate
+        self.httpd.throttle_above = throttle_above
+        self.httpd.in_flight = 0
+        self.httpd.fault_count = 0
+        self.httpd.page_size = page_size
+        self.httpd.verbose = verbose
+        self.httpd.request_count = 0
+        self.httpd.not_modified_count = 0
+        self.httpd.last_modified = formatdate(time.time(), usegmt=True)
+        self.httpd.stats_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self):
+        return self.httpd.request_count
+
+    @property
+    def not_modified_count(self):
+        return self.httpd.not_modified_count
+
+    @property
+    def fault_count(self):
+        return self.httpd.fault_count
+
+    def start(self):
+        """Start serving in a background thread and return the base URL"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        """Shut the server down"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the MOLWA freedom fighter list')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--location-file', default='location_data.json')
+    parser.add_argument('--default-size', type=int, default=57, help='Fighters per district')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of delay per request')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='Extra random delay up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 5xx')
+    parser.add_argument('--throttle-above', type=int, default=0, help='Answer 429 when more requests than this are in flight')
+    parser.add_argument('--unassigned-every', type=int, default=0, help='Leave every Nth fighter without an upazila')
+    parser.add_argument('--replay', help='Serve recorded pages from this directory (listing/, details/) instead of synthetic ones')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    location_data = None
+    if not args.replay:
+        with open(args.location_file, 'r', encoding='utf-8') as f:
+            location_data = json.load(f)
+
+    server = FakeMolwaServer(location_data, default_size=args.default_size, host=args.host,
+                             port=args.port, latency=args.latency, verbose=args.verbose,
+                             latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                             throttle_above=args.throttle_above, unassigned_every=args.unassigned_every,
+                             replay_dir=args.replay)
+    print(f"Serving {'recorded pages from ' + args.replay if args.replay else 'fake MOLWA listing'} "
+          f"on {server.base_url}/freedom-fighter-list")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping server")
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Single-file packed archive of fighter records with an mmap'd offset index
+Records (compact JSON) are concatenated into blocks of about block_size
+bytes, each optionally compressed as one zstd frame. A sorted index of
+fighter numbers (normalised from Bengali digits to uint64) maps every
+record to its block and offset, so a point lookup is a binary search over
+the mmap plus one slice (and one block decompression) with no file opens.
+
+Layout (native byte order, every section 8-byte aligned):
+  header   magic, version, compression, record count, block count
+  blocks   [u32 length][record bytes]... per block, zstd-compressed or raw
+  index    block offsets (u64), block lengths (u64), keys (u64, sorted),
+           then u32 arrays: block id, offset in block, length per key
+  extras   JSON {fighter_number: [block, offset, length]} for non-numeric numbers
+  footer   index offset, extras offset, extras length, magic
+"""
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import random
+import struct
+import time
+from array import array
+from functools import lru_cache
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from fighter_index import normalize_fighter_number
+
+MAGIC = b'FFPACK01'
+VERSION = 1
+COMPRESSION_NONE = 0
+COMPRESSION_ZSTD = 1
+HEADER = struct.Struct('=8sHHIQQ')  # magic, version, compression, reserved, records, blocks
+FOOTER = struct.Struct('=QQQ8s')   # index offset, extras offset, extras length, magic
+LENGTH = struct.Struct('=I')
+
+
+def _pad(f):
+    """Pad the file to an 8-byte boundary so the index arrays can be cast in place"""
+    f.write(b'\0' * (-f.tell() % 8))
+
+
+def pack_records(records, archive_path, compression='zstd', block_size=65536, level=3):
+    """
+    Write (fighter_number, record dict) pairs to an archive; returns a stats dict.
+    Duplicate fighter numbers keep the first record.
+    """
+    if compression == 'zstd' and zstandard is None:
+        raise ImportError("zstandard is required for compression='zstd'")
+    compressor = zstandard.ZstdCompressor(level=level) if compression == 'zstd' else None
+
+    entries = {}
+    extras = {}
+    block_offsets = array('Q')
+    block_lengths = array('Q')
+    stats = {'records': 0, 'duplicates': 0, 'raw_bytes': 0}
+    block = bytearray()
+    tmp_path = f"{archive_path}.tmp"
+
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\0' * HEADER.size)
+
+        def flush_block():
+            data = compressor.compress(bytes(block)) if compressor else bytes(block)
+            block_offsets.append(f.tell())
+            block_lengths.append(len(data))
+            f.write(data)
+            block.clear()
+
+        for fighter_number, record in records:
+            key = normalize_fighter_number(fighter_number)
+            if (key if key is not None else fighter_number) in (entries if key is not None else extras):
+                stats['duplicates'] += 1
+                continue
+            body = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            location = (len(block_offsets), len(block) + LENGTH.size, len(body))
+            if key is not None:
+                entries[key] = location
+            else:
+                extras[fighter_number] = location
+            block += LENGTH.pack(len(body)) + body
+            stats['records'] += 1
+            stats['raw_bytes'] += len(body)
+            if len(block) >= block_size:
+                flush_block()
+        if block:
+            flush_block()
+
+        _pad(f)
+        index_offset = f.tell()
+        keys = array('Q', sorted(entries))
+        f.write(block_offsets.tobytes())
+        f.write(block_lengths.tobytes())
+        f.write(keys.tobytes())
+        for column in range(3):
+            f.write(array('I', (entries[key][column] for key in keys)).tobytes())
+        _pad(f)
+        extras_offset = f.tell()
+        extras_json = json.dumps(extras, ensure_ascii=False).encode('utf-8')
+        f.write(extras_json)
+        f.write(FOOTER.pack(index_offset, extras_offset, len(extras_json), MAGIC))
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, COMPRESSION_ZSTD if compressor else COMPRESSION_NONE, 0,
+                            stats['records'], len(block_offsets)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, archive_path)
+
+    stats['blocks'] = len(block_offsets)
+    stats['archive_bytes'] = os.path.getsize(archive_path)
+    return stats
+
+
+def iter_fighter_files(fighters_dir):
+    """(fighter_number, record) for every fighters/*.json file, in file-name order"""
+    for name in sorted(os.listdir(fighters_dir)):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(fighters_dir, name), 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        yield record.get('fighter_number') or name[:-len('.json')], record
+
+
+def pack_directory(fighters_dir, archive_path, compression='zstd', block_size=65536, level=3):
+    """Convert a fighters/ directory into a single archive file"""
+    return pack_records(iter_fighter_files(fighters_dir), archive_path, compression, block_size, level)
+
+
+class FighterArchive:
+    def __init__(self, path, block_cache=64):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.compression, _, self.count, self.block_count = HEADER.unpack_from(self._mm, 0)
+        index_offset, extras_offset, extras_length, end_magic = FOOTER.unpack_from(
+            self._mm, len(self._mm) - FOOTER.size)
+        if magic != MAGIC or end_magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a fighter archive (or was written by another version)")
+        if self.compression == COMPRESSION_ZSTD and zstandard is None:
+            raise ImportError("zstandard is required to read a compressed archive")
+
+        extras = json.loads(self._mm[extras_offset:extras_offset + extras_length])
+        n_keys = self.count - len(extras)
+        view = memoryview(self._mm)
+        sections = []
+        offset = index_offset
+        for fmt, length in (('Q', self.block_count), ('Q', self.block_count), ('Q', n_keys),
+                            ('I', n_keys), ('I', n_keys), ('I', n_keys)):
+            size = length * array(fmt).itemsize
+            sections.append(view[offset:offset + size].cast(fmt))
+            offset += size
+        (self._block_offsets, self._block_lengths, self._keys,
+         self._blocks, self._offsets, self._lengths) = sections
+        self._extras = extras
+
+        decompressor = zstandard.ZstdDecompressor() if self.compression == COMPRESSION_ZSTD else None
+        self._decompressor = decompressor
+        self._block = lru_cache(maxsize=block_cache)(self._read_block)
+
+    def _read_block(self, block_id):
+        start = self._block_offsets[block_id]
+        data = self._mm[start:start + self._block_lengths[block_id]]
+        return self._decompressor.decompress(data) if self._decompressor else data
+
+    def _locate(self, fighter_number):
+        key = normalize_fighter_number(fighter_number)
+        if key is None:
+            return self._extras.get(fighter_number)
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return self._blocks[i], self._offsets[i], self._lengths[i]
+        return None
+
+    def get_bytes(self, fighter_number):
+        """Raw JSON bytes of a record, or None"""
+        location = self._locate(fighter_number)
+        if location is None:
+            return None
+        block_id, offset, length = location
+        if self._decompressor is None:
+            # Uncompressed: slice straight out of the mmap, no block copy
+            start = self._block_offsets[block_id] + offset
+            return self._mm[start:start + length]
+        return self._block(block_id)[offset:offset + length]
+
+    def get(self, fighter_number):
+        """Record dict for a fighter number (Bengali or ASCII digits), or None"""
+        data = self.get_bytes(fighter_number)
+        return json.loads(data) if data is not None else None
+
+    def __contains__(self, fighter_number):
+        return self._locate(fighter_number) is not None
+
+    def __len__(self):
+        return self.count
+
+    def iter_bytes(self, start_block=0, stop_block=None):
+        """Raw JSON bytes of every record in file order, one block at a time (optionally a block range)"""
+        for block_id in range(start_block, self.block_count if stop_block is None else stop_block):
+            data = self._read_block(block_id)
+            position = 0
+            while position < len(data):
+                (length,) = LENGTH.unpack_from(data, position)
+                position += LENGTH.size
+                yield data[position:position + length]
+                position += length
+
+    def __iter__(self):
+        """Every record dict in file order"""
+        for data in self.iter_bytes():
+            yield json.loads(data)
+
+    def close(self):
+        for section in (self._block_offsets, self._block_lengths, self._keys,
+                        self._blocks, self._offsets, self._lengths):
+            section.release()
+        self._block.cache_clear()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark(fighters_dir, archive_path, lookups=20000):
+    """Point-lookup latency and scan throughput: archive vs one JSON file per fighter"""
+    names = sorted(name for name in os.listdir(fighters_dir) if name.endswith('.json'))
+    sample = random.Random(0).sample(names, min(lookups, len(names)))
+
+    start = time.perf_counter()
+    for name in sample:
+        with open(os.path.join(fighters_dir, name), 'r', encoding='utf-8') as f:
+            json.load(f)
+    file_lookup = (time.perf_counter() - start) / len(sample)
+
+    with FighterArchive(archive_path) as archive:
+        numbers = [name[:-len('.json')] for name in sample]
+        start = time.perf_counter()
+        for number in numbers:
+            archive.get(number)
+        archive_lookup = (time.perf_counter() - start) / len(numbers)
+
+        start = time.perf_counter()
+        scanned = sum(1 for _ in archive)
+        archive_scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in names:
+        with open(os.path.join(fighters_dir, name), 'r', encoding='utf-8') as f:
+            json.load(f)
+    file_scan = time.perf_counter() - start
+
+    print(f"{'':<24}{'lookup µs':>12}{'scan records/s':>16}")
+    print(f"{'fighters/*.json':<24}{file_lookup * 1e6:>12.1f}{len(names) / file_scan:>16.0f}")
+    print(f"{os.path.basename(archive_path):<24}{archive_lookup * 1e6:>12.1f}{scanned / archive_scan:>16.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack fighters/*.json into one indexed archive, look up or benchmark it')
+    parser.add_argument('--fighters-dir', default='fighters')
+    parser.add_argument('--archive', default='fighters.pack')
+    parser.add_argument('--pack', action='store_true', help='Convert --fighters-dir into --archive')
+    parser.add_argument('--compression', choices=['zstd', 'none'], default='zstd' if zstandard else 'none')
+    parser.add_argument('--level', type=int, default=3, help='zstd compression level')
+    parser.add_argument('--block-size', type=int, default=65536, help='Uncompressed bytes per block')
+    parser.add_argument('--get', help='Print the record for a fighter number')
+    parser.add_argument('--benchmark', action='store_true', help='Compare lookups and scans with the JSON files')
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.pack:
+        start = time.perf_counter()
+        stats = pack_directory(args.fighters_dir, args.archive, args.compression, args.block_size, args.level)
+        print(f"Packed {stats['records']} records into {args.archive} in {time.perf_counter() - start:.2f} seconds")
+        print(f"{stats['blocks']} blocks, {stats['raw_bytes'] / 1e6:.1f} MB of JSON -> "
+              f"{stats['archive_bytes'] / 1e6:.1f} MB ({args.compression}); {stats['duplicates']} duplicates skipped")
+
+    if args.get:
+        with FighterArchive(args.archive) as archive:
+            print(json.dumps(archive.get(args.get), ensure_ascii=False, indent=2))
+
+    if args.benchmark:
+        benchmark(args.fighters_dir, args.archive, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Persistent, memory-compact fighter-number index for deduplication
+Fighter numbers are normalised from Bengali digits to integers and kept in
+two files next to the output CSV:
+  {csv}.idx      sorted native-endian uint64 array, read through mmap
+  {csv}.idx.log  append-only uint64 records added since the last merge
+Membership is a binary search over the mmap (O(log n)) plus a lookup in the
+in-memory set of log entries. Memory footprint: 8 bytes per merged ID in
+the page cache (about 1.6 MB for 205k IDs) plus roughly 70 bytes per
+unmerged log entry (at most merge_threshold of them), against ~100+ bytes
+per Bengali string in the old Python set. Startup maps the file and reads
+the log instead of re-reading the CSV.
+
+Appends and merges take an flock on {csv}.idx.lock, so several processes
+can share one index; a miss re-reads the log tail before answering, at
+most once per refresh_interval seconds (0: on every miss), so numbers
+another process committed within that window can be missed.
+Numbers are first reserved in memory and only committed to the index once
+their CSV rows are durable, so a crash never leaves an ID indexed without
+its row.
+"""
+
+import argparse
+import bisect
+import contextlib
+import csv
+import io
+import json
+import mmap
+import os
+import threading
+import time
+from array import array
+
+try:
+    import fcntl
+except ImportError:  # Windows: thread-safe only, no cross-process locking
+    fcntl = None
+
+BENGALI_TO_ASCII = str.maketrans('০১২৩৪৫৬৭৮৯', '0123456789')
+FIGHTER_NUMBER_FIELD = 'মুক্তিযোদ্ধার নম্বর'
+RECORD_SIZE = array('Q').itemsize
+
+
+def to_ascii_digits(text):
+    """Convert Bengali numerals to ASCII digits"""
+    return str(text).translate(BENGALI_TO_ASCII)
+
+
+def normalize_fighter_number(fighter_number):
+    """Fighter number as an int, or None if it is not purely numeric"""
+    digits = to_ascii_digits(fighter_number).strip()
+    if not digits.isdigit():
+        return None
+    return int(digits)
+
+
+def _complete_lines(lines, torn):
+    """Yield newline-terminated lines; an unterminated last line goes to torn instead"""
+    for line in lines:
+        if not line.endswith('\n'):
+            torn.append(line)
+            return
+        yield line
+
+
+def _parquet_parts(path):
+    """{part file name: size} of a Parquet output directory"""
+    return {name: os.path.getsize(os.path.join(path, name))
+            for name in os.listdir(path) if name.endswith('.parquet')}
+
+
+class FighterIndex:
+    def __init__(self, path, merge_threshold=50000, refresh_interval=1.0):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.lock_path = f"{path}.lock"
+        self.meta_path = f"{path}.meta.json"
+        self.merge_threshold = merge_threshold
+        self.refresh_interval = refresh_interval
+        self._refreshed_at = 0.0
+        self._lock = threading.RLock()
+        self._mm = None
+        self._sorted = []
+        self._sorted_id = None
+        self._recent = set()
+        self._log_offset = 0
+        self._reserved = set()
+        self._other = set()  # Non-numeric fighter numbers; kept in memory only
+        self._refresh()
+
+    # -- cross-process locking -------------------------------------------
+    @contextlib.contextmanager
+    def _flock(self):
+        with open(self.lock_path, 'a') as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    # -- loading ---------------------------------------------------------
+    def _unmap(self):
+        if isinstance(self._sorted, memoryview):
+            self._sorted.release()
+        self._sorted = []
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def _map_sorted(self):
+        self._unmap()
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._sorted_id = None
+            return
+        self._sorted_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        usable = stat.st_size - stat.st_size % RECORD_SIZE
+        if usable:
+            with open(self.path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), usable, access=mmap.ACCESS_READ)
+            with memoryview(self._mm) as raw:
+                self._sorted = raw.cast('Q')
+
+    def _refresh(self):
+        """Pick up merges and log appends made by other processes"""
+        self._refreshed_at = time.monotonic()
+        try:
+            stat = os.stat(self.path)
+            sorted_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            sorted_id = None
+        if sorted_id != self._sorted_id:
+            self._map_sorted()
+            self._recent = set()
+            self._log_offset = 0
+
+        try:
+            log_size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            log_size = 0
+        if log_size < self._log_offset:
+            # Log was truncated by a merge we have not mapped yet
+            self._map_sorted()
+            self._recent = set()
+            self._log_offset = 0
+        log_size -= log_size % RECORD_SIZE
+        if log_size > self._log_offset:
+            with open(self.log_path, 'rb') as f:
+                f.seek(self._log_offset)
+                tail = array('Q')
+                tail.frombytes(f.read(log_size - self._log_offset))
+            self._recent.update(tail)
+            self._log_offset = log_size
+
+    # -- queries ---------------------------------------------------------
+    def _in_sorted(self, key):
+        i = bisect.bisect_left(self._sorted, key)
+        return i < len(self._sorted) and self._sorted[i] == key
+
+    def _contains_key(self, key):
+        return key in self._recent or self._in_sorted(key)
+
+    def _has(self, key):
+        if self._contains_key(key):
+            return True
+        if time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return False
+        # Another process may have committed it since we last looked
+        self._refresh()
+        return self._contains_key(key)
+
+    def __contains__(self, fighter_number):
+        key = normalize_fighter_number(fighter_number)
+        with self._lock:
+            if key is None:
+                return fighter_number in self._other
+            return self._has(key)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sorted) + len(self._recent) + len(self._other)
+
+    # -- updates ---------------------------------------------------------
+    def reserve(self, fighter_number):
+        """Claim a number for this session; False if it is indexed or already reserved"""
+        key = normalize_fighter_number(fighter_number)
+        with self._lock:
+            if key is None:
+                if fighter_number in self._other:
+                    return False
+                self._other.add(fighter_number)
+                return True
+            if key in self._reserved or self._has(key):
+                return False
+            self._reserved.add(key)
+            return True
+
+    def commit(self, fighter_numbers):
+        """Persist numbers (e.g. once their rows are on disk)"""
+        keys = [k for k in (normalize_fighter_number(n) for n in fighter_numbers) if k is not None]
+        if not keys:
+            return
+        with self._lock, self._flock():
+            self._refresh()
+            new_keys = array('Q', [k for k in set(keys) if not self._contains_key(k)])
+            if new_keys:
+                with open(self.log_path, 'ab') as f:
+                    f.write(new_keys.tobytes())
+                self._recent.update(new_keys)
+                self._log_offset += len(new_keys) * RECORD_SIZE
+            self._reserved.difference_update(keys)
+            if len(self._recent) >= self.merge_threshold:
+                self._merge()
+
+    def add(self, fighter_number):
+        """Persist a single number straight away; True if it was new"""
+        is_new = fighter_number not in self
+        self.commit([fighter_number])
+        return is_new
+
+    def merge(self):
+        """Fold the log into the sorted file"""
+        with self._lock, self._flock():
+            self._refresh()
+            self._merge()
+
+    def _merge(self):
+        if not self._recent:
+            return
+        merged = array('Q', sorted(set(self._sorted).union(self._recent)))
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(merged.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # A crash before this truncate only leaves entries that are now duplicates
+        with open(self.log_path, 'wb'):
+            pass
+        self._map_sorted()
+        self._recent = set()
+        self._log_offset = 0
+
+    # -- CSV catch-up ----------------------------------------------------
+    def _load_meta(self):
+        if not os.path.exists(self.meta_path):
+            return {}
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self, state):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(state, count=len(self)), f)
+        os.replace(tmp_path, self.meta_path)
+
+    def sync_with_csv(self, csv_path):
+        """
+        Make sure every fighter in the output is indexed. Only what was
+        appended since the last recorded position is read: new bytes of a
+        CSV, complete gzip members past the recorded end offset of a
+        .csv.gz, or part files of a .parquet directory that were not there
+        before. A missing or shrunken output (or a Parquet part that changed)
+        resets the index.
+        """
+        from csv_sink import output_format
+
+        meta = self._load_meta()
+        if not os.path.exists(csv_path):
+            if meta or len(self):
+                self.reset()
+            return 0
+
+        fmt = output_format(csv_path)
+        if fmt == 'parquet':
+            numbers, state = self._parquet_numbers(csv_path, meta.get('parts', {}))
+        elif fmt == 'csv.gz':
+            numbers, state = self._gzip_numbers(csv_path, meta.get('csv_size', 0))
+        else:
+            numbers, state = self._csv_numbers(csv_path, meta.get('csv_size', 0))
+        numbers = [n.strip() for n in numbers if n and n.strip()]
+        before = len(self)
+        self.commit(numbers)
+        added = len(self) - before
+        self._write_meta(state)
+        return added
+
+    def _csv_numbers(self, csv_path, covered):
+        size = os.path.getsize(csv_path)
+        if size == covered:
+            return [], {'csv_size': size}
+        if size < covered:
+            self.reset()
+            covered = 0
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            header = next(csv.reader(f), [])
+            if covered:
+                f.seek(covered)
+            column = header.index(FIGHTER_NUMBER_FIELD) if FIGHTER_NUMBER_FIELD in header else 0
+            torn = []
+            numbers = [row[column] for row in csv.reader(_complete_lines(f, torn)) if len(row) > column]
+        # A last row without its newline was torn by a crash; the sink cuts it off when it reopens the
+        # file, so it is neither indexed nor counted as covered
+        return numbers, {'csv_size': size - len(''.join(torn).encode('utf-8'))}
+
+    def _gzip_numbers(self, csv_path, covered):
+        from csv_sink import iter_gzip_members
+
+        size = os.path.getsize(csv_path)
+        if size == covered:
+            return [], {'csv_size': size}
+        if size < covered:
+            self.reset()
+            covered = 0
+        column = None
+        if covered:
+            # The header is only in the first member
+            first = next(iter_gzip_members(csv_path), (0, b'', False))[1]
+            header = next(csv.reader(io.StringIO(first.decode('utf-8', 'replace'), newline='')), [])
+            column = header.index(FIGHTER_NUMBER_FIELD) if FIGHTER_NUMBER_FIELD in header else 0
+        numbers = []
+        for offset, data, complete in iter_gzip_members(csv_path, covered):
+            if complete:
+                covered = offset
+            else:
+                # Rows of a torn last member are indexed, but it stays uncovered until the sink rewrites it
+                data = data[:data.rfind(b'\n') + 1]
+            reader = csv.reader(io.StringIO(data.decode('utf-8'), newline=''))
+            if column is None:
+                header = next(reader, [])
+                column = header.index(FIGHTER_NUMBER_FIELD) if FIGHTER_NUMBER_FIELD in header else 0
+            numbers.extend(row[column] for row in reader if len(row) > column)
+        return numbers, {'csv_size': covered}
+
+    def _parquet_numbers(self, csv_path, known_parts):
+        from csv_sink import pq
+
+        if pq is None:
+            raise ImportError("pyarrow is required to read Parquet output")
+        parts = _parquet_parts(csv_path)
+        if any(parts.get(name) != size for name, size in known_parts.items()):
+            self.reset()  # A part we indexed was removed or rewritten
+            known_parts = {}
+        numbers = []
+        for name in sorted(set(parts) - set(known_parts)):
+            table = pq.read_table(os.path.join(csv_path, name), columns=[FIGHTER_NUMBER_FIELD])
+            numbers.extend(table.column(0).to_pylist())
+        return numbers, {'parts': parts}
+
+    def record_csv_size(self, csv_path):
+        """Remember how much of the output is covered by the index"""
+        from csv_sink import iter_gzip_members, output_format
+
+        if not os.path.exists(csv_path):
+            state = {'csv_size': 0}
+        elif output_format(csv_path) == 'parquet':
+            state = {'parts': _parquet_parts(csv_path)}
+        elif output_format(csv_path) == 'csv.gz':
+            # Only complete members count; scanning starts at the last recorded member end
+            covered = self._load_meta().get('csv_size', 0)
+            if covered > os.path.getsize(csv_path):
+                covered = 0
+            for offset, _, complete in iter_gzip_members(csv_path, covered):
+                if complete:
+                    covered = offset
+            state = {'csv_size': covered}
+        else:
+            state = {'csv_size': os.path.getsize(csv_path)}
+        self._write_meta(state)
+
+    def reset(self):
+        """Drop every indexed number"""
+        with self._lock, self._flock():
+            for path in (self.path, self.log_path, self.meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._map_sorted()
+            self._recent = set()
+            self._log_offset = 0
+            self._reserved = set()
+            self._other = set()
+
+    def close(self):
+        with self._lock:
+            self._unmap()
+
+
+def crash_test(directory, rounds, seed=0):
+    """
+    SIGKILL csv_sink writers mid-write, half the time leaving a torn last
+    row, then resume the way the scraper does (index sync, then the sink
+    reopens and repairs the CSV). Every row must be indexed and the torn
+    row must not be, so its fighter can still be reserved when refetched.
+    """
+    import random
+    import signal
+    import subprocess
+    import sys
+    import tempfile
+    from csv_sink import FighterSink, iter_rows, sample_row
+
+    rng = random.Random(seed)
+    failures = 0
+    sink_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'csv_sink.py')
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        path = os.path.join(tmp, 'out.csv')
+        log_path = os.path.join(tmp, 'durable.log')
+        for _ in range(rounds):
+            child = subprocess.Popen([sys.executable, sink_script, '--crash-child', path, log_path])
+            time.sleep(rng.uniform(0.3, 0.8))
+            child.send_signal(signal.SIGKILL)
+            child.wait()
+            # crash_writer numbers rows 0, 1, 2, ...; the next row is the one a crash would tear
+            rows_before = sum(1 for _ in iter_rows(path))
+            torn_number = str(rows_before)
+            if rng.random() < 0.5:
+                line = ','.join(sample_row(torn_number).values())
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(line[:rng.randrange(1, len(line))])
+
+            index = FighterIndex(f"{path}.idx")
+            index.sync_with_csv(path)
+            sink = FighterSink(path)
+            sink.start()
+            sink.close()
+            numbers = [row[FIGHTER_NUMBER_FIELD] for row in iter_rows(path)]
+            missing = [n for n in numbers if n not in index]
+            if missing:
+                print(f"{len(missing)} of {len(numbers)} rows not indexed after resuming")
+                failures += 1
+            if torn_number not in numbers and not index.reserve(torn_number):
+                print(f"Fighter {torn_number} was cut from the CSV but is still indexed")
+                failures += 1
+            index.close()
+        print(f"{rounds} kills, {len(numbers)} rows indexed after the last resume")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or inspect the fighter-number index for a listing CSV')
+    parser.add_argument('--csv-file', default='../freedom_fighters_data.csv')
+    parser.add_argument('--lookups', type=int, default=100000, help='Membership tests to time')
+    parser.add_argument('--crash-test', type=int, metavar='ROUNDS',
+                        help='Kill a CSV writer ROUNDS times, tearing its last row, and check the index after each resume')
+    parser.add_argument('--dir', default='.', help='Directory for --crash-test files')
+    args = parser.parse_args()
+
+    if args.crash_test:
+        failures = crash_test(args.dir, args.crash_test)
+        print("OK" if not failures else f"{failures} failed checks")
+        raise SystemExit(1 if failures else 0)
+
+    index = FighterIndex(f"{args.csv_file}.idx")
+    start = time.perf_counter()
+    added = index.sync_with_csv(args.csv_file)
+    index.merge()
+    print(f"Indexed {len(index)} fighters ({added} new) in {time.perf_counter() - start:.2f} seconds")
+    print(f"Index file: {os.path.getsize(index.path) if os.path.exists(index.path) else 0} bytes")
+
+    start = time.perf_counter()
+    for n in range(args.lookups):
+        f"{n:011d}" in index
+    elapsed = time.perf_counter() - start
+    print(f"Membership test: {elapsed / max(args.lookups, 1) * 1e6:.2f} µs per lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Indexed queries over fighters/*.json
+A SQLite index (stdlib only) next to the dataset holds one row per fighter
+with the division/district/upazila resolved to their location_data.json
+ids, living status and document types, each with a secondary index, plus
+a character trigram inverted index over the normalised name and
+father_name for fuzzy Bengali search. Records themselves stay in the JSON
+files and are only read for the hits. Building is incremental: files are
+re-indexed only when their size or mtime changed, and deleted files are
+dropped. --benchmark prints p50/p99 latency for each kind of query.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sqlite3
+import statistics
+import time
+import unicodedata
+
+from fighter_index import normalize_fighter_number
+
+FIELDS = ('name', 'father_name')
+IGNORED_CHARS = re.compile(r'[‌‍­.,:;()\'"\-]')  # ZWNJ/ZWJ, soft hyphen, punctuation
+STOP_GRAM_FRACTION = 0.02  # Grams in more than this share of names are too common to find candidates with
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fighters (
+    id INTEGER PRIMARY KEY,           -- fighter number as an integer
+    fighter_number TEXT NOT NULL,
+    file TEXT NOT NULL,
+    size INTEGER, mtime_ns INTEGER,
+    name TEXT, father_name TEXT,
+    division TEXT, district TEXT, upazila TEXT,  -- location_data.json ids (raw name if unknown)
+    living_status TEXT
+);
+CREATE INDEX IF NOT EXISTS fighters_division ON fighters(division);
+CREATE INDEX IF NOT EXISTS fighters_district ON fighters(district);
+CREATE INDEX IF NOT EXISTS fighters_upazila ON fighters(upazila);
+CREATE INDEX IF NOT EXISTS fighters_living_status ON fighters(living_status);
+CREATE UNIQUE INDEX IF NOT EXISTS fighters_file ON fighters(file);
+CREATE TABLE IF NOT EXISTS documents (document_type TEXT, id INTEGER, PRIMARY KEY (document_type, id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS documents_id ON documents(id);
+CREATE TABLE IF NOT EXISTS grams (field INTEGER, gram TEXT, id INTEGER, PRIMARY KEY (field, gram, id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS gram_df (field INTEGER, gram TEXT, df INTEGER, PRIMARY KEY (field, gram)) WITHOUT ROWID;
+"""
+
+
+def normalize_name(text):
+    """NFC, no joiners or punctuation, single spaces"""
+    text = unicodedata.normalize('NFC', text or '')
+    return ' '.join(IGNORED_CHARS.sub(' ', text).split())
+
+
+def trigrams(text):
+    """Distinct character trigrams of a normalised name, padded at word edges"""
+    padded = f"  {normalize_name(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)} if padded.strip() else set()
+
+
+def dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 0.0
+
+
+class LocationIds:
+    """Name -> id lookups for divisions, districts, upazilas and prove types"""
+
+    def __init__(self, location_data):
+        self.divisions = {name: div_id for div_id, name in location_data['divisions'].items()}
+        self.districts = {}
+        self.upazilas = {}
+        for div_id, districts in location_data['districts'].items():
+            for dist_id, district in districts.items():
+                self.districts[district] = dist_id
+                for thana_id, upazila in location_data.get('upazilas', {}).get(div_id, {}).get(dist_id, {}).items():
+                    self.upazilas[(dist_id, upazila)] = thana_id
+        self.prove_types = {name: type_id for type_id, name in location_data.get('prove_types', {}).items()}
+
+    def resolve(self, basic_info):
+        division = basic_info.get('division') or None
+        district = basic_info.get('district') or None
+        upazila = basic_info.get('upazila') or None
+        dist_id = self.districts.get(district, district)
+        return (self.divisions.get(division, division), dist_id,
+                self.upazilas.get((dist_id, upazila), upazila))
+
+
+class FighterQuery:
+    def __init__(self, index_path='fighters_index.sqlite', fighters_dir='fighters',
+                 location_file='location_data.json'):
+        self.index_path = index_path
+        self.fighters_dir = fighters_dir
+        with open(location_file, 'r', encoding='utf-8') as f:
+            self.locations = LocationIds(json.load(f))
+        self.db = sqlite3.connect(index_path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('PRAGMA cache_size=-65536')  # 64 MB
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Building
+
+    def _delete(self, ids, touched):
+        for fighter_id in ids:
+            row = self.db.execute('SELECT name, father_name FROM fighters WHERE id = ?', (fighter_id,)).fetchone()
+            if row is None:
+                continue
+            # Postings are keyed by gram, so they are found again from the stored names
+            grams = [(field_number, gram) for field_number, text in enumerate(row) for gram in trigrams(text)]
+            touched.update(grams)
+            self.db.executemany('DELETE FROM grams WHERE field = ? AND gram = ? AND id = ?',
+                                [(f, g, fighter_id) for f, g in grams])
+            self.db.execute('DELETE FROM documents WHERE id = ?', (fighter_id,))
+            self.db.execute('DELETE FROM fighters WHERE id = ?', (fighter_id,))
+
+    def _index_record(self, record, name, stat, touched, known_ids):
+        fighter_id = normalize_fighter_number(record.get('fighter_number') or name[:-len('.json')])
+        if fighter_id is None:
+            return False
+        basic_info = record.get('basic_info') or {}
+        division, district, upazila = self.locations.resolve(basic_info)
+        if fighter_id in known_ids:
+            self._delete([fighter_id], touched)  # Same fighter under another file name
+        known_ids.add(fighter_id)
+        self.db.execute('INSERT INTO fighters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+            fighter_id, record.get('fighter_number'), name, stat.st_size, stat.st_mtime_ns,
+            basic_info.get('name'), basic_info.get('father_name'),
+            division, district, upazila, basic_info.get('living_status')))
+        document_types = {self.locations.prove_types.get(doc.get('document_type'), doc.get('document_type'))
+                          for doc in record.get('prove_documents') or [] if isinstance(doc, dict)}
+        self.db.executemany('INSERT INTO documents VALUES (?, ?)',
+                            [(doc_type, fighter_id) for doc_type in document_types if doc_type])
+        for field_number, field in enumerate(FIELDS):
+            grams = [(field_number, gram) for gram in trigrams(basic_info.get(field))]
+            touched.update(grams)
+            self.db.executemany('INSERT INTO grams VALUES (?, ?, ?)', [(f, g, fighter_id) for f, g in grams])
+        return True
+
+    def build(self, batch=5000):
+        """Index new and changed files, drop deleted ones; returns a stats dict"""
+        start = time.perf_counter()
+        known = {file: (size, mtime_ns, fighter_id) for file, size, mtime_ns, fighter_id
+                 in self.db.execute('SELECT file, size, mtime_ns, id FROM fighters')}
+        known_ids = {fighter_id for _, _, fighter_id in known.values()}
+        stats = {'indexed': 0, 'unchanged': 0, 'removed': 0, 'errors': 0}
+        touched = set()
+        seen = set()
+        pending = 0
+        with os.scandir(self.fighters_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                previous = known.get(entry.name)
+                if previous and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                    stats['unchanged'] += 1
+                    continue
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        record = json.load(f)
+                except (OSError, ValueError):
+                    stats['errors'] += 1
+                    continue
+                if previous:
+                    self._delete([previous[2]], touched)
+                    known_ids.discard(previous[2])
+                indexed = self._index_record(record, entry.name, stat, touched, known_ids)
+                stats['indexed' if indexed else 'errors'] += 1
+                pending += 1
+                if pending >= batch:
+                    self.db.commit()
+                    pending = 0
+
+        removed = [fighter_id for file, (_, _, fighter_id) in known.items() if file not in seen]
+        self._delete(removed, touched)
+        stats['removed'] = len(removed)
+        self._refresh_df(touched)
+        self.db.commit()
+        self.db.execute('PRAGMA optimize' if known else 'ANALYZE')  # Row counts for the query planner
+        stats['seconds'] = time.perf_counter() - start
+        return stats
+
+    def _refresh_df(self, touched):
+        """Recount document frequencies of the grams whose postings changed"""
+        by_field = {}
+        for field_number, gram in touched:
+            by_field.setdefault(field_number, []).append(gram)
+        for field_number, grams in by_field.items():
+            for i in range(0, len(grams), 500):
+                chunk = grams[i:i + 500]
+                marks = ','.join('?' * len(chunk))
+                self.db.execute(f'DELETE FROM gram_df WHERE field = ? AND gram IN ({marks})', [field_number, *chunk])
+                self.db.execute(f'INSERT INTO gram_df SELECT field, gram, COUNT(*) FROM grams '
+                                f'WHERE field = ? AND gram IN ({marks}) GROUP BY field, gram', [field_number, *chunk])
+
+    # Queries
+
+    def _filters(self, division=None, district=None, upazila=None, living_status=None, document_type=None):
+        """SQL conditions on the fighters table (aliased f) for the given filters"""
+        clauses, params = [], []
+        if division:
+            clauses.append('f.division = ?')
+            params.append(self.locations.divisions.get(division, division))
+        if district:
+            clauses.append('f.district = ?')
+            params.append(self.locations.districts.get(district, district))
+        if upazila:
+            # An upazila name is only unique within its district
+            ids = [thana_id for (_, name), thana_id in self.locations.upazilas.items() if name == upazila] or [upazila]
+            clauses.append(f"f.upazila IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        if living_status:
+            clauses.append('f.living_status = ?')
+            params.append(living_status)
+        if document_type:
+            clauses.append('f.id IN (SELECT id FROM documents WHERE document_type = ?)')
+            params.append(self.locations.prove_types.get(document_type, document_type))
+        return clauses, params
+
+    def find(self, limit=100, **filters):
+        """Fighter numbers matching every given filter (names or location_data ids)"""
+        clauses, params = self._filters(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return [row[0] for row in self.db.execute(
+            f'SELECT f.fighter_number FROM fighters f {where} ORDER BY f.id LIMIT ?', [*params, limit])]
+
+    def count(self, **filters):
+        clauses, params = self._filters(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self.db.execute(f'SELECT COUNT(*) FROM fighters f {where}', params).fetchone()[0]
+
+    def search_name(self, text, field='name', limit=20, min_similarity=0.5, **filters):
+        """
+        Fuzzy name search: [(fighter_number, similarity, name)], best first.
+        Candidates come from the query's rarer trigrams (a name similar
+        enough must share some of them); they are ranked by Dice similarity
+        of the full trigram sets.
+        """
+        field_number = FIELDS.index(field)
+        query_grams = trigrams(text)
+        if not query_grams:
+            return []
+        marks = ','.join('?' * len(query_grams))
+        df = dict(self.db.execute(f'SELECT gram, df FROM gram_df WHERE field = ? AND gram IN ({marks})',
+                                  [field_number, *query_grams]))
+        total = self.db.execute('SELECT COUNT(*) FROM fighters').fetchone()[0] or 1
+        rare = sorted((gram for gram in df if df[gram] <= max(STOP_GRAM_FRACTION * total, 50)), key=df.get)
+        clauses, params = self._filters(**filters)
+        # Filters are applied to the postings so that the candidate limit counts only matching fighters
+        join = f"JOIN fighters f ON f.id = g.id AND {' AND '.join(clauses)}" if clauses else ''
+        if rare:
+            # A name with Dice >= m against Q query grams shares at least m*Q/(2-m) of them
+            needed = math.ceil(min_similarity * len(query_grams) / (2 - min_similarity))
+            needed = max(1, needed - (len(query_grams) - len(rare)))
+            rare_marks = ','.join('?' * len(rare))
+            candidates = (f'SELECT g.id FROM grams g {join} WHERE g.field = ? AND g.gram IN ({rare_marks}) '
+                          f'GROUP BY g.id HAVING COUNT(*) >= ? ORDER BY COUNT(*) DESC LIMIT ?')
+            candidate_params = [*params, field_number, *rare, needed, limit * 50]
+        elif df:
+            # Only common grams: any name containing the rarest one is as good a start as any
+            candidates = f'SELECT g.id FROM grams g {join} WHERE g.field = ? AND g.gram = ? LIMIT ?'
+            candidate_params = [*params, field_number, min(df, key=df.get), limit * 50]
+        else:
+            return []
+        rows = self.db.execute(f'SELECT f.fighter_number, f.{field} FROM fighters f '
+                               f'JOIN ({candidates}) c ON c.id = f.id', candidate_params)
+
+        scored = []
+        for fighter_number, name in rows:
+            similarity = dice(query_grams, trigrams(name))
+            if similarity >= min_similarity:
+                scored.append((fighter_number, round(similarity, 3), name))
+        scored.sort(key=lambda hit: (-hit[1], hit[0]))
+        return scored[:limit]
+
+    def get(self, fighter_number):
+        """Full record of a fighter from its JSON file, or None"""
+        row = self.db.execute('SELECT file FROM fighters WHERE id = ?',
+                              (normalize_fighter_number(fighter_number),)).fetchone()
+        if row is None:
+            return None
+        with open(os.path.join(self.fighters_dir, row[0]), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples) * 1e3, samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e3
+
+
+def benchmark(query, runs=300, seed=0):
+    """p50/p99 latency of filter, count and fuzzy name queries on the built index"""
+    rng = random.Random(seed)
+    districts = [row[0] for row in query.db.execute('SELECT DISTINCT district FROM fighters WHERE district IS NOT NULL')]
+    statuses = [row[0] for row in query.db.execute('SELECT DISTINCT living_status FROM fighters WHERE living_status IS NOT NULL')]
+    doc_types = [row[0] for row in query.db.execute('SELECT DISTINCT document_type FROM documents')]
+    total = query.db.execute('SELECT MAX(rowid) FROM fighters').fetchone()[0] or 0
+    names = []
+    while len(names) < runs and total:
+        row = query.db.execute('SELECT name FROM fighters WHERE rowid >= ? LIMIT 1', (rng.randint(1, total),)).fetchone()
+        if row and row[0]:
+            name = row[0]
+            cut = rng.randrange(len(name))
+            names.append(name[:cut] + name[cut + 1:])  # One character dropped, as a typo
+
+    cases = {
+        'find district (100 rows)': lambda: query.find(district=rng.choice(districts)),
+        'find district+status': lambda: query.find(district=rng.choice(districts), living_status=rng.choice(statuses)),
+        'find document type': lambda: query.find(document_type=rng.choice(doc_types)) if doc_types else None,
+        'count district': lambda: query.count(district=rng.choice(districts)),
+        'fuzzy name (one typo)': lambda: query.search_name(names[rng.randrange(len(names))]),
+        'fuzzy name + district': lambda: query.search_name(names[rng.randrange(len(names))], district=rng.choice(districts)),
+    }
+    print(f"{'query':<28}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, run in cases.items():
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        p50, p99 = _percentiles(timings)
+        print(f"{label:<28}{p50:>10.2f}{p99:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and query the fighter index (filters and fuzzy Bengali name search)')
+    parser.add_argument('--fighters-dir', default='fighters')
+    parser.add_argument('--index', default='fighters_index.sqlite')
+    parser.add_argument('--location-file', default='location_data.json')
+    parser.add_argument('--build', action='store_true', help='Index new/changed files and drop deleted ones')
+    parser.add_argument('--division')
+    parser.add_argument('--district')
+    parser.add_argument('--upazila')
+    parser.add_argument('--living-status')
+    parser.add_argument('--document-type')
+    parser.add_argument('--name', help='Fuzzy search over names')
+    parser.add_argument('--father-name', help='Fuzzy search over father names')
+    parser.add_argument('--min-similarity', type=float, default=0.5)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--full', action='store_true', help='Print the full records of the hits')
+    parser.add_argument('--benchmark', action='store_true', help='p50/p99 latency of each query type')
+    args = parser.parse_args()
+
+    with FighterQuery(args.index, args.fighters_dir, args.location_file) as query:
+        if args.build:
+            stats = query.build()
+            print(f"Indexed {stats['indexed']} records in {stats['seconds']:.2f} seconds "
+                  f"({stats['unchanged']} unchanged, {stats['removed']} removed, {stats['errors']} unreadable)")
+
+        filters = dict(division=args.division, district=args.district, upazila=args.upazila,
+                       living_status=args.living_status, document_type=args.document_type)
+        if args.name or args.father_name:
+            field, text = ('name', args.name) if args.name else ('father_name', args.father_name)
+            hits = query.search_name(text, field, args.limit, args.min_similarity, **filters)
+            for fighter_number, similarity, name in hits:
+                print(f"{fighter_number}  {similarity:.2f}  {name}")
+            numbers = [hit[0] for hit in hits]
+        elif any(filters.values()):
+            numbers = query.find(args.limit, **filters)
+            print(f"{query.count(**filters)} matching fighters")
+            for fighter_number in numbers:
+                print(fighter_number)
+        else:
+            numbers = []
+
+        if args.full:
+            for fighter_number in numbers:
+                print(json.dumps(query.get(fighter_number), ensure_ascii=False, indent=2))
+        if args.benchmark:
+            benchmark(query)
+
+
+if __name__ == "__main__":
+    main()
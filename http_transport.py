@@ -0,0 +1,177 @@
+"""
+HTTP transport for the listing scrapers
+build_session returns a requests.Session whose connection pool is sized to
+the worker count (the default pool keeps only 10 connections, so more
+threads than that reconnect constantly), with the request headers set once
+and brotli advertised when a decoder is installed. ResponseCache keeps the
+last body of every (combination, page) on disk together with its ETag and
+Last-Modified validators, turns re-fetches into conditional requests and
+counts hits, 304s and bytes saved.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import brotli  # noqa: F401 (lets urllib3 and aiohttp decode br responses)
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+
+def build_session(headers=None, pool_size=10):
+    """A keep-alive session whose pool holds one connection per worker"""
+    session = requests.Session()
+    if headers:
+        session.headers.update(headers)
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    resize_pool(session, pool_size)
+    return session
+
+
+def resize_pool(session, pool_size):
+    """Remount the session's adapters with a pool of pool_size connections per host"""
+    # pool_block makes extra threads wait for a connection instead of opening
+    # throwaway ones that are discarded when the pool is full
+    for prefix in ('https://', 'http://'):
+        session.mount(prefix, HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                          pool_block=True))
+
+
+class ResponseCache:
+    """
+    On-disk cache of listing pages keyed by (combination key, page):
+      {cache_dir}/{key}-p{page}.html       last body received
+      {cache_dir}/{key}-p{page}.meta.json  ETag, Last-Modified, sha1, size, fetched_at
+    A page fetched less than max_age seconds ago is served without a
+    request; older ones are revalidated with If-None-Match/If-Modified-Since.
+    """
+
+    def __init__(self, cache_dir, max_age=0):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        os.makedirs(cache_dir, exist_ok=True)
+        self.stats = {'fresh_hits': 0, 'not_modified': 0, 'unchanged': 0, 'changed': 0,
+                      'new': 0, 'bytes_downloaded': 0, 'bytes_saved': 0}
+        self._lock = threading.Lock()
+
+    def _paths(self, key, page):
+        base = os.path.join(self.cache_dir, f"{key}-p{page}")
+        return f"{base}.html", f"{base}.meta.json"
+
+    def meta(self, key, page):
+        """Stored validators, sha1 and fetch time of a cached page, or None"""
+        body_path, meta_path = self._paths(key, page)
+        if not os.path.exists(body_path):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.stats[name] += value
+
+    def lookup(self, key, page):
+        """
+        Return (body, None) when the cached copy is fresh enough to use
+        without a request, else (None, conditional request headers).
+        """
+        meta = self.meta(key, page)
+        if meta is None:
+            return None, {}
+        if self.max_age and time.time() - meta.get('fetched_at', 0) < self.max_age:
+            body = self.load(key, page)
+            if body is not None:
+                self._count(fresh_hits=1, bytes_saved=len(body))
+                return body, None
+
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return None, headers
+
+    def load(self, key, page):
+        body_path, _ = self._paths(key, page)
+        try:
+            with open(body_path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def not_modified(self, key, page):
+        """Handle a 304: return the cached body and refresh its timestamp"""
+        body = self.load(key, page)
+        meta = self.meta(key, page)
+        if body is None or meta is None:
+            return None
+        meta['fetched_at'] = time.time()
+        self._write_meta(key, page, meta)
+        self._count(not_modified=1, bytes_saved=len(body))
+        return body
+
+    def discard(self, key, page):
+        """Forget a page that no longer exists (e.g. the list got shorter)"""
+        for path in self._paths(key, page):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def store(self, key, page, body, headers):
+        """Save a 200 response body with its validators; returns whether the content changed"""
+        previous = self.meta(key, page)
+        digest = hashlib.sha1(body).hexdigest()
+        changed = previous is None or previous.get('sha1') != digest
+
+        body_path, _ = self._paths(key, page)
+        if changed:
+            tmp_path = f"{body_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, body_path)
+        self._write_meta(key, page, {
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'sha1': digest,
+            'size': len(body),
+            'fetched_at': time.time(),
+        })
+
+        outcome = 'new' if previous is None else ('changed' if changed else 'unchanged')
+        self._count(bytes_downloaded=len(body), **{outcome: 1})
+        return changed
+
+    def _write_meta(self, key, page, meta):
+        _, meta_path = self._paths(key, page)
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def summary(self):
+        """One-line hit rate and bytes saved report"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['fresh_hits'] + stats['not_modified'] + stats['unchanged'] + stats['changed'] + stats['new']
+        hits = stats['fresh_hits'] + stats['not_modified']
+        hit_rate = hits / lookups * 100 if lookups else 0.0
+        return (f"{hits}/{lookups} pages served from cache ({hit_rate:.1f}%: {stats['fresh_hits']} fresh, "
+                f"{stats['not_modified']} not modified), {stats['unchanged']} re-downloaded unchanged, "
+                f"{stats['changed']} changed, {stats['new']} new; "
+                f"{stats['bytes_saved'] / 1e6:.2f} MB saved, {stats['bytes_downloaded'] / 1e6:.2f} MB downloaded")
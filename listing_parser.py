@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Listing page parser backends
+Each backend pulls only what the scrapers need out of a listing page: the
+cells of the fighter table rows, the dataTables_info entry count and
+whether a "Next" link exists. BeautifulSoup is the reference and the
+default; the other backends return the same results for MOLWA listing
+markup. Run this module to check every backend against the golden pages
+in fixtures/listing (expected results in expected.json, including the
+broken markup where a backend knowingly differs) and to benchmark
+pages/sec per core for each backend.
+"""
+
+import argparse
+import html
+import json
+import re
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    etree = None
+    lxml_html = None
+
+ENTRIES_RE = re.compile(r'of (\d+) entries')
+GOLDEN_DIR = Path(__file__).resolve().parent / 'fixtures' / 'listing'
+
+
+def clean_text(text):
+    """Strip and collapse whitespace (same result as re.sub(r'\\s+', ' ', text.strip()))"""
+    if not text:
+        return ""
+    return ' '.join(str(text).split())
+
+
+def _to_text(html_content):
+    if isinstance(html_content, bytes):
+        return html_content.decode('utf-8', errors='replace')
+    return html_content
+
+
+def parse_with_bs4(html_content):
+    """Reference backend: BeautifulSoup with html.parser"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    table = soup.find('table', class_='table')
+    if not table:
+        return [], 0, False
+
+    tbody = table.find('tbody')
+    if not tbody:
+        return [], 0, False
+
+    rows = []
+    for row in tbody.find_all('tr'):
+        cells = row.find_all('td')
+        link = cells[7].find('a') if len(cells) > 7 else None
+        rows.append(([clean_text(cell.get_text()) for cell in cells], link.get('href') if link else None))
+
+    total_count = 0
+    pagination_info = soup.find('div', class_='dataTables_info')
+    if pagination_info:
+        match = ENTRIES_RE.search(pagination_info.get_text())
+        if match:
+            total_count = int(match.group(1))
+
+    has_next_link = bool(soup.find_all('a', string='Next'))
+    return rows, total_count, has_next_link
+
+
+def _lxml_single_string(element):
+    # Mirrors bs4's Tag.string: the text of a tag whose only child is one string
+    if len(element) == 0:
+        return element.text
+    if len(element) == 1 and not element.text and not element[0].tail:
+        return _lxml_single_string(element[0])
+    return None
+
+
+def _lxml_text(element):
+    # text_content() keeps <script>/<style> text, which bs4's get_text() skips
+    if next(element.iter('script', 'style'), None) is None:
+        return element.text_content()
+    return ''.join(element.xpath('.//text()[not(ancestor::script or ancestor::style)]'))
+
+
+def parse_with_lxml(html_content):
+    """lxml backend: libxml2 HTML parser plus a handful of XPath lookups"""
+    try:
+        doc = lxml_html.fromstring(html_content)
+    except etree.ParserError:
+        # Empty body or nothing but comments: libxml2 has no document to return
+        return [], 0, False
+
+    tables = doc.xpath('//table[contains(concat(" ", normalize-space(@class), " "), " table ")]')
+    if not tables:
+        return [], 0, False
+
+    tbody = tables[0].find('.//tbody')
+    if tbody is None:
+        return [], 0, False
+
+    rows = []
+    for row in tbody.iterdescendants('tr'):
+        cells = list(row.iterdescendants('td'))
+        href = None
+        if len(cells) > 7:
+            link = next(cells[7].iterdescendants('a'), None)
+            if link is not None:
+                href = link.get('href')
+        rows.append(([clean_text(_lxml_text(cell)) for cell in cells], href))
+
+    total_count = 0
+    infos = doc.xpath('//div[contains(concat(" ", normalize-space(@class), " "), " dataTables_info ")]')
+    if infos:
+        match = ENTRIES_RE.search(_lxml_text(infos[0]))
+        if match:
+            total_count = int(match.group(1))
+
+    has_next_link = any(_lxml_single_string(a) == 'Next' for a in doc.iter('a'))
+    return rows, total_count, has_next_link
+
+
+# Attributes of a tag up to its closing '>', which may also appear inside a quoted value
+ATTRS = r'(?:[^>"\']|"[^"]*"|\'[^\']*\')*'
+# Comments, scripts and styles are swapped for SKIPPED so that, as in bs4, they still
+# count as a child when checking whether a link holds nothing but "Next"
+SKIPPED = '<!>'
+SKIP_RE = re.compile(r'<!--.*?(?:-->|\Z)|<(script|style)\b' + ATTRS + r'>.*?(?:</\1\s*>|\Z)', re.I | re.S)
+TABLE_OPEN_RE = re.compile(r'<table\b(' + ATTRS + ')>', re.I)
+TABLE_CLOSE_RE = re.compile(r'</table\s*>', re.I)
+TBODY_OPEN_RE = re.compile(r'<tbody\b' + ATTRS + '>', re.I)
+TBODY_CLOSE_RE = re.compile(r'</tbody\s*>', re.I)
+ELEMENT_TAG_RE = re.compile(r'<(/?)([a-z][^\s/>]*)' + ATTRS + '>', re.I)
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+TR_SPLIT_RE = re.compile(r'<tr\b' + ATTRS + '>', re.I)
+TD_RE = re.compile(r'<td\b' + ATTRS + r'>(.*?)</td\s*>', re.I | re.S)
+A_OPEN_RE = re.compile(r'<a\b(' + ATTRS + ')>', re.I)
+ATTR_RE = re.compile(r'([^\s=/>"\']+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+TAG_RE = re.compile(r'</?[a-z]' + ATTRS + '>|<!>', re.I)
+DIV_OPEN_RE = re.compile(r'<div\b(' + ATTRS + ')>', re.I)
+DIV_TAG_RE = re.compile(r'<(/?)div\b' + ATTRS + '>', re.I)
+NEXT_LINK_RE = re.compile(r'<a\b' + ATTRS + r'>(?:<[a-z]' + ATTRS + r'>)*Next(?:</[a-z]+\s*>)*</a\s*>', re.I)
+
+
+def _attributes(attrs):
+    # Like html.parser: lower-case names, entities unescaped, the last duplicate wins
+    return {match.group(1).lower(): html.unescape(match.group(2) or match.group(3) or match.group(4) or '')
+            for match in ATTR_RE.finditer(attrs)}
+
+
+def _has_class(attrs, name):
+    return name in _attributes(attrs).get('class', '').split()
+
+
+def _strip_tags(fragment):
+    return html.unescape(TAG_RE.sub('', fragment))
+
+
+def _div_inner(content, start):
+    # Markup of the div opened just before start, up to its matching </div>
+    depth = 1
+    for match in DIV_TAG_RE.finditer(content, start):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            return content[start:match.start()]
+    return content[start:]
+
+
+def _well_formed(table_html):
+    # Rows can only be split flat when every tag up to </tbody> is closed in
+    # order and no table, row or cell is nested in another; html.parser lets an
+    # unclosed <td> swallow the next cells and a stray end tag (</div>, </tr>)
+    # close the whole table
+    stack = []
+    for match in ELEMENT_TAG_RE.finditer(table_html):
+        name = match.group(2).lower()
+        if name == 'table' or (name in ('tr', 'td') and name in stack and not match.group(1)):
+            return False
+        if match.group(1):
+            if not stack or stack.pop() != name:
+                return False
+        elif name not in VOID_TAGS and not match.group(0).endswith('/>'):
+            stack.append(name)
+    return not stack
+
+
+def parse_with_regex(html_content):
+    """
+    Streaming regex backend: no DOM, only scans the table, info div and Next
+    link. Comments, scripts and styles are dropped first; a table with
+    unclosed tags or nested rows, cells or tables is handed to the bs4
+    backend instead.
+    """
+    content = SKIP_RE.sub(SKIPPED, html_content)
+
+    table_start = None
+    for match in TABLE_OPEN_RE.finditer(content):
+        if _has_class(match.group(1), 'table'):
+            table_start = match.end()
+            break
+    if table_start is None:
+        return [], 0, False
+
+    table_end = TABLE_CLOSE_RE.search(content, table_start)
+    table_html = content[table_start:table_end.start() if table_end else None]
+    tbody_open = TBODY_OPEN_RE.search(table_html)
+    if not tbody_open:
+        return [], 0, False
+    tbody_close = TBODY_CLOSE_RE.search(table_html, tbody_open.end())
+    if not tbody_close or not _well_formed(table_html[:tbody_close.end()]):
+        return parse_with_bs4(html_content)
+
+    rows = []
+    for row_html in TR_SPLIT_RE.split(table_html[tbody_open.end():tbody_close.start()])[1:]:
+        cells = TD_RE.findall(row_html)
+        href = None
+        if len(cells) > 7:
+            link = A_OPEN_RE.search(cells[7])
+            if link:
+                href = _attributes(link.group(1)).get('href')
+        rows.append(([clean_text(_strip_tags(cell)) for cell in cells], href))
+
+    total_count = 0
+    for match in DIV_OPEN_RE.finditer(content):
+        if 'dataTables_info' in match.group(1) and _has_class(match.group(1), 'dataTables_info'):
+            count = ENTRIES_RE.search(_strip_tags(_div_inner(content, match.end())))
+            if count:
+                total_count = int(count.group(1))
+            break
+
+    has_next_link = NEXT_LINK_RE.search(content) is not None
+    return rows, total_count, has_next_link
+
+
+PARSER_BACKENDS = {
+    'bs4': parse_with_bs4,
+    'lxml': parse_with_lxml,
+    'regex': parse_with_regex,
+}
+
+
+def available_backends():
+    """Names of the backends whose dependencies are installed"""
+    return [name for name in PARSER_BACKENDS if name != 'lxml' or lxml_html is not None]
+
+
+def default_backend():
+    """BeautifulSoup, the reference; lxml and regex are opt-in via --parser"""
+    return 'bs4'
+
+
+def parse_listing_page(html_content, backend='bs4'):
+    """
+    Parse a listing page with the given backend.
+    Returns (rows, total_count, has_next_link) where each row is
+    (cleaned cell texts, href of the link in the details cell or None).
+    """
+    if backend not in available_backends():
+        raise ValueError(f"Unknown or unavailable parser backend: {backend}")
+    return PARSER_BACKENDS[backend](_to_text(html_content))
+
+
+def _expected_result(result):
+    return [(cells, href) for cells, href in result['rows']], result['total_count'], result['has_next_link']
+
+
+def golden_pages(fixtures_dir=GOLDEN_DIR):
+    """
+    (name, html, expected result, {backend: expected result}) for each
+    golden page in fixtures_dir. The pages follow the site's listing markup
+    (layout, pagination, the empty-table row, a maintenance page) plus the
+    edge cases where parsers tend to part ways (empty body, scripts and
+    comments, '>' in attributes, unclosed and nested tags). expected.json
+    holds the result every backend must return for each, and under
+    "backends" the result of a backend that knowingly differs on broken
+    markup (lxml repairs it the way browsers do, html.parser does not).
+    """
+    fixtures_dir = Path(fixtures_dir)
+    with open(fixtures_dir / 'expected.json', 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    return [(name, (fixtures_dir / name).read_text(encoding='utf-8'), _expected_result(result),
+             {backend: _expected_result(other) for backend, other in result.get('backends', {}).items()})
+            for name, result in sorted(expected.items())]
+
+
+def saved_pages(pages_dir):
+    """Listing pages saved from a crawl (no expected results)"""
+    return [p.read_text(encoding='utf-8') for p in sorted(Path(pages_dir).glob('*.html'))]
+
+
+def check_golden(golden, backends):
+    """Return (page name, backend) for every backend result that differs from the expected one"""
+    return [(name, backend) for name, page, expected, by_backend in golden for backend in backends
+            if parse_listing_page(page, backend) != by_backend.get(backend, expected)]
+
+
+def check_equivalence(pages, backends):
+    """Return the indexes of pages where any backend disagrees with bs4"""
+    mismatches = []
+    for i, page in enumerate(pages):
+        expected = parse_listing_page(page, 'bs4')
+        for backend in backends:
+            if parse_listing_page(page, backend) != expected:
+                mismatches.append((i, backend))
+    return mismatches
+
+
+def benchmark(pages, backends, min_seconds=1.0):
+    """Single-core pages/sec for each backend"""
+    results = {}
+    for backend in backends:
+        parsed = 0
+        start = time.process_time()
+        while time.process_time() - start < min_seconds:
+            for page in pages:
+                parse_listing_page(page, backend)
+            parsed += len(pages)
+        results[backend] = parsed / (time.process_time() - start)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark listing parser backends')
+    parser.add_argument('--pages', help='Directory of saved listing *.html pages to compare against bs4 as well')
+    parser.add_argument('--seconds', type=float, default=1.0, help='CPU seconds to spend per backend')
+    args = parser.parse_args()
+
+    golden = golden_pages()
+    backends = available_backends()
+    print(f"Backends: {', '.join(backends)}")
+    print(f"Golden pages: {len(golden)}")
+
+    mismatches = check_golden(golden, backends)
+    if mismatches:
+        for name, backend in mismatches:
+            print(f"❌ {name}: {backend} output differs from the expected result")
+        raise SystemExit(1)
+    print("✅ All backends return the expected result for every golden page")
+
+    pages = [page for _, page, _, _ in golden]
+    if args.pages:
+        saved = saved_pages(args.pages)
+        print(f"Saved pages: {len(saved)}")
+        mismatches = check_equivalence(saved, backends)
+        if mismatches:
+            for i, backend in mismatches:
+                print(f"❌ Saved page {i}: {backend} output differs from bs4")
+            raise SystemExit(1)
+        print("✅ All backends match bs4 on every saved page")
+        pages += saved
+
+    for backend, rate in benchmark(pages, backends, args.seconds).items():
+        print(f"   {backend:6s} {rate:10.1f} pages/sec per core")
+
+
+if __name__ == "__main__":
+    main()
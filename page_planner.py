@@ -0,0 +1,180 @@
+"""
+Count-driven page planning for the listing scrapers
+The first page fetched for a combination carries the total entry count
+("Showing 1 to 10 of N entries"), which gives the exact page list, so no
+trailing empty page is ever requested. PagePlan tracks every combination's
+planned pages, contiguous progress and completion percentage;
+WorkStealingQueue hands page chunks to worker threads, and an idle worker
+steals chunks from the busiest one so one large district does not leave
+the other workers waiting.
+"""
+
+import threading
+from collections import deque
+
+PAGE_SIZE = 10  # Rows per listing page on the MOLWA site
+
+
+def total_pages_for(total_count, page_size=PAGE_SIZE):
+    """Number of listing pages needed for total_count entries"""
+    return (total_count + page_size - 1) // page_size
+
+
+def page_chunks(pages, chunk_pages):
+    """Split a page list into consecutive chunks of at most chunk_pages"""
+    return [pages[i:i + chunk_pages] for i in range(0, len(pages), chunk_pages)]
+
+
+def completion_percent(last_page, total_pages, completed=False):
+    """Exact completion of a combination from its progress entry"""
+    if completed:
+        return 100.0
+    if not total_pages:
+        return 0.0
+    return min(last_page / total_pages, 1.0) * 100
+
+
+def completion_report(progress, keys=None):
+    """(key, last_page, total_pages, percent) for every combination in a progress document"""
+    combinations = progress.get('completed_combinations', {})
+    report = []
+    for key in keys if keys is not None else sorted(combinations):
+        entry = combinations.get(key, {})
+        last_page = entry.get('last_page', 0)
+        total_pages = entry.get('total_pages', 0)
+        report.append((key, last_page, total_pages,
+                       completion_percent(last_page, total_pages, entry.get('completed', False))))
+    return report
+
+
+class PagePlan:
+    """Per-combination page bookkeeping shared by the threaded and async scrapers"""
+
+    def __init__(self):
+        self.states = {}
+        self._lock = threading.Lock()
+
+    def add(self, combination, total_pages=0):
+        """Register a combination that will be fetched from its start_page"""
+        with self._lock:
+            self.states[combination['key']] = {
+                'start_page': combination['start_page'],
+                'total_pages': total_pages,
+                'last_page': combination['start_page'] - 1,
+                'done': set(),
+                'new_records': 0,
+                'covered': False,
+                'completed': False,
+            }
+
+    def plan(self, key, total_count, page, covered=False):
+        """
+        Fix a combination's page count from the entry count on `page`; return
+        the pages after it. covered=True records the count but plans nothing
+        more, for a combination whose rows are already known to be saved.
+        """
+        with self._lock:
+            state = self.states[key]
+            state['total_pages'] = total_pages_for(total_count)
+            state['covered'] = covered
+            if covered:
+                return []
+            return list(range(page + 1, state['total_pages'] + 1))
+
+    def total_pages(self, key):
+        return self.states[key]['total_pages']
+
+    def page_done(self, key, page, new_records=0, has_more_pages=False):
+        """
+        Mark a page fetched and return (last contiguous page, total pages, completed).
+        Without a planned page count a combination is complete once a page
+        reports no further pages.
+        """
+        with self._lock:
+            state = self.states[key]
+            state['done'].add(page)
+            state['new_records'] += new_records
+            while state['last_page'] + 1 in state['done']:
+                state['last_page'] += 1
+                state['done'].discard(state['last_page'])
+
+            if state['covered']:
+                state['completed'] = True
+            elif state['total_pages']:
+                state['completed'] = state['last_page'] >= state['total_pages']
+            else:
+                state['completed'] = not has_more_pages and not state['done']
+            return state['last_page'], state['total_pages'], state['completed']
+
+    def percent(self, key):
+        state = self.states[key]
+        return completion_percent(state['last_page'] + len(state['done']), state['total_pages'],
+                                  state['completed'])
+
+    def new_records(self, key):
+        return self.states[key]['new_records']
+
+    def totals(self):
+        """(pages fetched, pages planned, combinations completed, combinations) in this run"""
+        with self._lock:
+            fetched = planned = completed = 0
+            for state in self.states.values():
+                pages = state['last_page'] - state['start_page'] + 1 + len(state['done'])
+                fetched += pages
+                if state['covered'] or not state['total_pages']:
+                    planned += pages  # Nothing more was planned (empty, covered or Next-link only)
+                else:
+                    planned += max(state['total_pages'] - state['start_page'] + 1, 0)
+                completed += state['completed']
+            return fetched, planned, completed, len(self.states)
+
+    def incomplete(self):
+        """Keys of combinations not finished in this run"""
+        return [key for key, state in self.states.items() if not state['completed']]
+
+
+class WorkStealingQueue:
+    """
+    One deque of work units per worker thread. A worker pops from the front
+    of its own deque; when that is empty it steals from the back of the
+    longest other deque. get() blocks while other workers may still produce
+    units and returns None once every unit has been handed out and finished.
+    """
+
+    def __init__(self, workers):
+        self.deques = [deque() for _ in range(workers)]
+        self.outstanding = 0
+        self.steals = 0
+        self._next = 0
+        self._cond = threading.Condition()
+
+    def put(self, unit, worker_id=None):
+        """Queue a unit on a worker's deque (round-robin if worker_id is None)"""
+        with self._cond:
+            if worker_id is None:
+                worker_id = self._next
+                self._next = (self._next + 1) % len(self.deques)
+            self.deques[worker_id].append(unit)
+            self._cond.notify()
+
+    def get(self, worker_id):
+        with self._cond:
+            while True:
+                own = self.deques[worker_id]
+                if own:
+                    self.outstanding += 1
+                    return own.popleft()
+                victim = max(self.deques, key=len)
+                if victim:
+                    self.steals += 1
+                    self.outstanding += 1
+                    return victim.pop()
+                if not self.outstanding:
+                    self._cond.notify_all()
+                    return None
+                self._cond.wait()
+
+    def task_done(self):
+        with self._cond:
+            self.outstanding -= 1
+            self._cond.notify_all()
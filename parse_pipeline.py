@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Pipelined fetch -> parse -> write mode for listing pages
+I/O threads push raw HTML bytes onto a bounded queue, a ProcessPoolExecutor
+of parser workers runs parse_fighters_page outside the GIL, and the calling
+thread is the single writer that deduplicates and appends rows to the CSV.
+Run this module to replay a directory of saved pages offline.
+"""
+
+import argparse
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from division_district_scraper import DivisionDistrictScraper, parse_fighters_page
+from listing_parser import available_backends, default_backend
+
+PAGE_FILE_RE = re.compile(r'^(\d+(?:-\d+){1,3})-p(\d+)\.html$')
+_DONE = object()
+
+
+def page_file_name(combination_key, page):
+    """File name a saved listing page is stored under"""
+    return f"{combination_key}-p{page}.html"
+
+
+def parse_page_batch(batch, parser_backend):
+    """Parser worker entry point: parse a batch of (combination, page, html bytes)"""
+    return [(combination, page) + parse_fighters_page(html_content, combination, parser_backend)
+            for combination, page, html_content in batch]
+
+
+class ParsePipeline:
+    """
+    Three-stage pipeline with configurable backpressure:
+    queue_size bounds raw pages waiting for a parser, max_in_flight bounds
+    batches submitted to the process pool but not yet written.
+    """
+
+    def __init__(self, scraper, parse_workers=None, io_threads=4, queue_size=64,
+                 max_in_flight=None, batch_size=8):
+        self.scraper = scraper
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.io_threads = io_threads
+        self.queue_size = queue_size
+        self.max_in_flight = max_in_flight or self.parse_workers * 2
+        self.batch_size = batch_size
+        self.stats = {'pages': 0, 'failed_pages': 0, 'rows': 0, 'new_rows': 0, 'elapsed': 0.0}
+        self.stats_lock = threading.Lock()
+
+    def _io_worker(self, items, raw_queue, fetch, cancel):
+        while True:
+            item = items.get()
+            if item is _DONE:
+                raw_queue.put(_DONE)
+                return
+            if cancel.is_set():
+                continue  # The dispatcher failed; take the remaining items without fetching them
+            combination, page = item
+            try:
+                html_content = fetch(combination, page)
+            except Exception as e:
+                print(f"Error fetching page {page} for {combination['key']}: {e}")
+                html_content = None
+            if html_content is None:
+                with self.stats_lock:
+                    self.stats['failed_pages'] += 1
+                continue
+            if isinstance(html_content, str):
+                html_content = html_content.encode('utf-8')
+            raw_queue.put((combination, page, html_content))
+
+    def _dispatcher(self, pool, raw_queue, parsed_queue, in_flight, cancel):
+        submitted = 0
+        finished_io = 0
+        batch = []
+        outcome = None
+
+        def submit(batch):
+            in_flight.acquire()
+            future = pool.submit(parse_page_batch, batch, self.scraper.parser_backend)
+            future.add_done_callback(parsed_queue.put)
+
+        try:
+            while finished_io < self.io_threads:
+                item = raw_queue.get()
+                if item is _DONE:
+                    finished_io += 1
+                    continue
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    submit(batch)
+                    submitted += 1
+                    batch = []
+
+            if batch:
+                submit(batch)
+                submitted += 1
+            outcome = submitted
+        except BaseException as e:
+            # e.g. BrokenProcessPool after a parser process died
+            outcome = e
+            cancel.set()
+        finally:
+            # run() waits for this: the batch count, or the error it re-raises
+            parsed_queue.put(outcome)
+
+        # After a failure, keep taking pages so no I/O thread blocks on the full queue
+        while finished_io < self.io_threads:
+            if raw_queue.get() is _DONE:
+                finished_io += 1
+
+    def run(self, work_items, fetch):
+        """
+        Fetch, parse and write every (combination, page) in work_items.
+        fetch(combination, page) returns the page HTML (str or bytes) or None.
+        """
+        items = queue.Queue(maxsize=self.queue_size)
+        raw_queue = queue.Queue(maxsize=self.queue_size)
+        parsed_queue = queue.Queue()
+        in_flight = threading.Semaphore(self.max_in_flight)
+        cancel = threading.Event()
+        start_time = time.time()
+
+        def feed():
+            for item in work_items:
+                items.put(item)
+            for _ in range(self.io_threads):
+                items.put(_DONE)
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            threads = [threading.Thread(target=feed, daemon=True)]
+            threads += [threading.Thread(target=self._io_worker, args=(items, raw_queue, fetch, cancel), daemon=True)
+                        for _ in range(self.io_threads)]
+            threads.append(threading.Thread(target=self._dispatcher,
+                                            args=(pool, raw_queue, parsed_queue, in_flight, cancel), daemon=True))
+            for thread in threads:
+                thread.start()
+
+            written = 0
+            total_batches = None
+            while total_batches is None or written < total_batches:
+                item = parsed_queue.get()
+                if isinstance(item, int):
+                    total_batches = item
+                    continue
+                if isinstance(item, BaseException):
+                    raise item
+                in_flight.release()
+                written += 1
+                try:
+                    results = item.result()
+                except BrokenProcessPool:
+                    # A parser process died; stop fetching and unblock a dispatcher waiting to submit
+                    cancel.set()
+                    in_flight.release(self.max_in_flight)
+                    raise
+                except Exception as e:
+                    print(f"Error in parser worker: {e}")
+                    continue
+                for combination, page, fighters, total_count, has_more_pages in results:
+                    self.write_page(combination, page, fighters)
+
+            for thread in threads:
+                thread.join()
+
+        self.scraper.sink.flush()
+
+        self.stats['elapsed'] = time.time() - start_time
+        return self.stats
+
+    def write_page(self, combination, page, fighters):
+        """Single writer: deduplicate and append one parsed page"""
+        new_fighters = self.scraper.filter_new_fighters(fighters)
+        if new_fighters:
+            # As in save_page: the reserved numbers join the index once their rows are fsynced
+            numbers = [f['মুক্তিযোদ্ধার নম্বর'] for f in new_fighters]
+            self.scraper.save_fighters_to_csv(
+                new_fighters, on_durable=lambda: self.scraper.existing_fighters.commit(numbers))
+        self.stats['pages'] += 1
+        self.stats['rows'] += len(fighters)
+        self.stats['new_rows'] += len(new_fighters)
+
+
+def saved_pages(pages_dir, scraper):
+    """(combination, page) work items and a reader for a directory of saved pages"""
+    pages_dir = Path(pages_dir)
+    work_items = []
+    for path in sorted(pages_dir.iterdir()):
+        match = PAGE_FILE_RE.match(path.name)
+        if match:
+            key, page = match.groups()
+            work_items.append((scraper.combination_from_key(key), int(page)))
+
+    def read_page(combination, page):
+        return (pages_dir / page_file_name(combination['key'], page)).read_bytes()
+
+    return work_items, read_page
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay saved listing pages through the parse pipeline')
+    parser.add_argument('--pages', required=True, help='Directory of saved pages named {key}-p{page}.html')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Parser processes')
+    parser.add_argument('--io-threads', type=int, default=4)
+    parser.add_argument('--queue-size', type=int, default=64, help='Raw pages buffered before parsing')
+    parser.add_argument('--max-in-flight', type=int, default=None, help='Parse batches outstanding (default: 2 x workers)')
+    parser.add_argument('--batch-size', type=int, default=8, help='Pages per parser task')
+    parser.add_argument('--parser', choices=available_backends(), default=default_backend())
+    parser.add_argument('--location-file', default='location_data.json')
+    parser.add_argument('--csv-file', default='replay_fighters.csv')
+    args = parser.parse_args()
+
+    # Replay never saves progress, so the progress file is only read if present
+    scraper = DivisionDistrictScraper(csv_file=args.csv_file, progress_file='replay_progress.json',
+                                      location_file=args.location_file, parser_backend=args.parser)
+    work_items, read_page = saved_pages(args.pages, scraper)
+    print(f"Replaying {len(work_items)} saved pages with {args.workers} parser processes ({args.parser})")
+
+    pipeline = ParsePipeline(scraper, parse_workers=args.workers, io_threads=args.io_threads,
+                             queue_size=args.queue_size, max_in_flight=args.max_in_flight,
+                             batch_size=args.batch_size)
+    stats = pipeline.run(work_items, read_page)
+    scraper.sink.close()
+
+    print(f"\nReplay completed!")
+    print(f"Total time: {stats['elapsed']:.2f} seconds")
+    print(f"Pages: {stats['pages']} ({stats['pages'] / max(stats['elapsed'], 1e-9):.1f} pages/sec), failed: {stats['failed_pages']}")
+    print(f"Rows parsed: {stats['rows']}, new rows written: {stats['new_rows']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Content-addressed mirror of the fighter and heir photos
+Photo URLs are streamed out of fighters/*.json (or a fighter_archive.py
+pack): fighter_photo_url under the fighter's id, and each waris_info
+photo_url under {id}/waris/{n}. They are fetched with bounded aiohttp
+concurrency, paced and retried like the detail pages. Each body is
+stored once under its SHA-256, at blobs/{hash[:2]}/{hash}. Identical
+uploads behind different URLs share one blob, and a URL used by
+several owners is fetched once.
+manifest.sqlite maps every owner to its URL and every URL to its blob,
+or to the error that stopped it. A rerun only fetches URLs the manifest
+has not settled (--retry-failed includes earlier failures). An
+interrupted run loses at most the entries since the last commit; those
+URLs are fetched again and land on the blobs already stored.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, urlunparse
+
+import aiohttp
+
+from detail_scraper import fetch_with_retries
+from division_district_scraper import REQUEST_HEADERS
+from fighter_index import to_ascii_digits
+from rate_controller import AdaptiveRateController, RetryPolicy
+from scrape_metrics import StageMetrics, set_worker
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT,                      -- NULL when the fetch failed
+    size INTEGER, content_type TEXT,
+    error TEXT, fetched_at TEXT
+);
+CREATE INDEX IF NOT EXISTS urls_sha256 ON urls(sha256);
+CREATE TABLE IF NOT EXISTS owners (
+    owner TEXT PRIMARY KEY,           -- fighter id, or {id}/waris/{n} for an heir
+    url TEXT NOT NULL
+);
+"""
+
+
+def iter_records(source):
+    """Records of a fighters/ directory (in file name order) or a packed archive"""
+    if os.path.isdir(source):
+        for name in sorted(name for name in os.listdir(source) if name.endswith('.json')):
+            try:
+                with open(os.path.join(source, name), 'r', encoding='utf-8') as f:
+                    yield json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Skipping {name}: {e}")
+        return
+
+    from fighter_archive import FighterArchive
+    with FighterArchive(source) as archive:
+        for data in archive.iter_bytes():
+            yield json.loads(data)
+
+
+def iter_photo_urls(source):
+    """(owner, url) for every photo in the dataset"""
+    for record in iter_records(source):
+        if not isinstance(record, dict):
+            continue
+        owner = to_ascii_digits(record.get('fighter_number') or '')
+        if record.get('fighter_photo_url'):
+            yield owner, record['fighter_photo_url']
+        for n, heir in enumerate(record.get('waris_info') or [], 1):
+            if isinstance(heir, dict) and heir.get('photo_url'):
+                yield f"{owner}/waris/{n}", heir['photo_url']
+
+
+class BlobStore:
+    """Files named by the SHA-256 of their content"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data):
+        """Store data unless an intact identical blob exists; returns (digest, stored)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if self.intact(path, digest, len(data)):
+            return digest, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())  # The blob's name must never point at unwritten data
+        try:
+            if os.path.exists(path):
+                os.replace(tmp_path, path)  # Repair a damaged blob in place
+                return digest, True
+            os.link(tmp_path, path)  # Fails if a concurrent fetch stored the same content first
+            return digest, True
+        except FileExistsError:
+            return digest, False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def intact(path, digest, size):
+        """Whether the blob at path exists with the expected size and hash"""
+        try:
+            if os.path.getsize(path) != size:
+                return False
+        except FileNotFoundError:
+            return False
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest() == digest
+
+
+class PhotoManifest:
+    def __init__(self, path, commit_every=1000):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.commit_every = commit_every
+        self.uncommitted = 0
+
+    def owner_url(self, owner):
+        row = self.db.execute('SELECT url FROM owners WHERE owner = ?', (owner,)).fetchone()
+        return row[0] if row else None
+
+    def url_state(self, url):
+        """(sha256, error) of a URL fetched before, or None"""
+        return self.db.execute('SELECT sha256, error FROM urls WHERE url = ?', (url,)).fetchone()
+
+    def set_owner(self, owner, url):
+        self.db.execute('INSERT OR REPLACE INTO owners VALUES (?, ?)', (owner, url))
+        self._written()
+
+    def record_url(self, url, digest=None, size=None, content_type=None, error=None):
+        self.db.execute('INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?)',
+                        (url, digest, size, content_type, error, datetime.now().isoformat()))
+        self._written()
+
+    def _written(self):
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.uncommitted = 0
+
+    def summary(self):
+        """Owner, URL and blob counts, and the bytes referenced versus stored"""
+        owners, owners_mirrored, referenced = self.db.execute(
+            'SELECT COUNT(*), COUNT(u.sha256), COALESCE(SUM(u.size), 0) '
+            'FROM owners o LEFT JOIN urls u ON u.url = o.url').fetchone()
+        urls, urls_failed = self.db.execute('SELECT COUNT(*), COUNT(error) FROM urls').fetchone()
+        blobs, stored = self.db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM '
+            '(SELECT sha256, MAX(size) AS size FROM urls WHERE sha256 IS NOT NULL GROUP BY sha256)').fetchone()
+        return {'owners': owners, 'owners_mirrored': owners_mirrored, 'urls': urls, 'urls_failed': urls_failed,
+                'blobs': blobs, 'bytes_referenced': referenced, 'bytes_stored': stored,
+                'dedup_ratio': round(referenced / stored, 3) if stored else 0.0}
+
+    def export(self, path):
+        """Write owner -> url, blob (or error) as JSON lines; returns the line count"""
+        count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            for owner, url, digest, content_type, error in self.db.execute(
+                    'SELECT o.owner, o.url, u.sha256, u.content_type, u.error '
+                    'FROM owners o LEFT JOIN urls u ON u.url = o.url ORDER BY o.owner'):
+                entry = {'owner': owner, 'url': url, 'sha256': digest}
+                if content_type:
+                    entry['content_type'] = content_type
+                if error or not digest:
+                    entry['error'] = error or 'not fetched'
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                count += 1
+        return count
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+
+class PhotoMirror:
+    def __init__(self, source='fighters', store_dir='photos', base_url=None,
+                 concurrency=20, requests_per_second=10.0, retry_failed=False, limit=None):
+        self.source = source
+        self.store_dir = store_dir
+        self.base_url = urlparse(base_url) if base_url else None
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.retry_failed = retry_failed
+        self.limit = limit
+        os.makedirs(store_dir, exist_ok=True)
+        self.blobs = BlobStore(os.path.join(store_dir, 'blobs'))
+        self.manifest = PhotoManifest(os.path.join(store_dir, 'manifest.sqlite'))
+        self.rate_controller = AdaptiveRateController(
+            initial_rate=min(requests_per_second or 5.0, 5.0),
+            max_rate=requests_per_second or None,
+            max_concurrency=concurrency,
+        )
+        self.retry_policy = RetryPolicy()
+        self.metrics = StageMetrics()
+        self.in_flight = set()
+        self.stats = {'owners': 0, 'already_mirrored': 0, 'fetched': 0, 'not_found': 0, 'failed': 0,
+                      'bytes_fetched': 0, 'new_blobs': 0, 'duplicate_blobs': 0}
+
+    def fetch_url(self, url):
+        """The URL to request: the photo's path on --base-url when one is set"""
+        if self.base_url is None:
+            return url
+        return urlunparse(urlparse(url)._replace(scheme=self.base_url.scheme, netloc=self.base_url.netloc))
+
+    def pending(self):
+        """URLs the manifest has not settled, recording every owner's URL on the way"""
+        queued = 0
+        for owner, url in iter_photo_urls(self.source):
+            self.stats['owners'] += 1
+            if self.manifest.owner_url(owner) != url:
+                self.manifest.set_owner(owner, url)
+            if url in self.in_flight:
+                continue
+            state = self.manifest.url_state(url)
+            if state is not None and (state[0] or not self.retry_failed):
+                self.stats['already_mirrored'] += 1
+                continue
+            if self.limit is not None and queued >= self.limit:
+                return
+            self.in_flight.add(url)
+            queued += 1
+            yield url
+
+    async def mirror_one(self, http, url):
+        status, body, headers, error = await fetch_with_retries(
+            http, self.fetch_url(url), self.rate_controller, self.retry_policy, self.metrics)
+        if body is None:
+            error = 'not found' if status == 404 else error or f"HTTP {status}"
+            self.stats['not_found' if status == 404 else 'failed'] += 1
+            self.manifest.record_url(url, error=error)
+            return
+
+        with self.metrics.time('blob_write'):
+            digest, stored = await asyncio.to_thread(self.blobs.put, body)
+        self.stats['fetched'] += 1
+        self.stats['bytes_fetched'] += len(body)
+        self.stats['new_blobs' if stored else 'duplicate_blobs'] += 1
+        self.manifest.record_url(url, digest, len(body), headers.get('Content-Type'))
+
+    async def worker(self, queue, http, worker_id=0):
+        set_worker(worker_id)
+        while True:
+            url = await queue.get()
+            try:
+                if url is None:
+                    return
+                await self.mirror_one(http, url)
+            except Exception as e:
+                print(f"Error mirroring {url}: {e}")
+            finally:
+                if url is not None:
+                    self.in_flight.discard(url)
+                queue.task_done()
+
+    def report_progress(self, elapsed):
+        stats = self.stats
+        print(f"  {stats['fetched']} photos fetched ({stats['fetched'] / elapsed:.1f}/s, "
+              f"{stats['bytes_fetched'] / elapsed / 1e6:.2f} MB/s), {stats['duplicate_blobs']} duplicates, "
+              f"{stats['not_found'] + stats['failed']} failed; {stats['owners']} owners read")
+
+    async def crawl(self):
+        queue = asyncio.Queue(maxsize=self.concurrency * 4)  # Bounded: the dataset is never read far ahead
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ssl=False)
+        timeout = aiohttp.ClientTimeout(total=60)
+        start = time.monotonic()
+        last_report = start
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=REQUEST_HEADERS) as http:
+            workers = [asyncio.create_task(self.worker(queue, http, worker_id))
+                       for worker_id in range(self.concurrency)]
+            try:
+                for url in self.pending():
+                    await queue.put(url)
+                    if time.monotonic() - last_report >= 10:
+                        last_report = time.monotonic()
+                        self.report_progress(last_report - start)
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+    def run(self):
+        """Mirror every photo the manifest has not settled; safe to interrupt and rerun"""
+        start_time = time.time()
+        try:
+            asyncio.run(self.crawl())
+        finally:
+            self.manifest.commit()
+            elapsed = time.time() - start_time
+            self.print_report(elapsed)
+
+    def print_report(self, elapsed):
+        stats = self.stats
+        fetched = stats['fetched']
+        print(f"Fetched {fetched} photos ({stats['bytes_fetched'] / 1e6:.2f} MB) in {elapsed:.2f} seconds "
+              f"({fetched / max(elapsed, 1e-9):.1f}/s, {stats['bytes_fetched'] / max(elapsed, 1e-9) / 1e6:.2f} MB/s); "
+              f"{stats['already_mirrored']} already mirrored, {stats['not_found']} not found, {stats['failed']} failed")
+        if fetched:
+            print(f"This run: {stats['new_blobs']} new blobs, {stats['duplicate_blobs']} duplicates of stored content "
+                  f"({100 * stats['duplicate_blobs'] / fetched:.1f}%)")
+        summary = self.manifest.summary()
+        print(f"Manifest: {summary['owners']} owners ({summary['owners_mirrored']} mirrored) -> "
+              f"{summary['urls']} URLs ({summary['urls_failed']} failed) -> {summary['blobs']} blobs; "
+              f"{summary['bytes_referenced'] / 1e6:.2f} MB referenced, {summary['bytes_stored'] / 1e6:.2f} MB stored, "
+              f"dedup ratio {summary['dedup_ratio']}")
+        print(f"Request pacing: {self.rate_controller.snapshot()}")
+        print(f"Stage timings (all workers):\n{self.metrics.report()}")
+
+    def close(self):
+        self.manifest.close()
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    request_count = 0
+
+    def do_GET(self):
+        type(self).request_count += 1
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_demo_photos(source, root, variants, missing_every):
+    """Files for every photo path of a dataset, drawn from a few distinct images (every Nth left missing)"""
+    images = [b'\x89PNG\r\n\x1a\n' + random.Random(n).randbytes(20000 + 997 * n) for n in range(variants)]
+    paths = sorted({urlparse(url).path for _, url in iter_photo_urls(source)})
+    for i, path in enumerate(paths):
+        if missing_every and i % missing_every == missing_every - 1:
+            continue
+        target = os.path.join(root, path.lstrip('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(images[zlib.crc32(path.encode()) % variants])
+    return len(paths)
+
+
+def demo(location_file, districts, default_size, variants, concurrency):
+    """Mirror a synthetic dataset from a local static file server, interrupted once and resumed"""
+    from fake_molwa_server import FakeMolwaData
+
+    with open(location_file, 'r', encoding='utf-8') as f:
+        location_data = json.load(f)
+    data = FakeMolwaData(location_data, default_size=default_size)
+    pairs = [(div_id, dist_id) for div_id, dist in location_data['districts'].items() for dist_id in dist][:districts]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fighters_dir = os.path.join(tmp, 'fighters')
+        www = os.path.join(tmp, 'www')
+        store = os.path.join(tmp, 'photos')
+        os.makedirs(fighters_dir)
+        for div_id, dist_id in pairs:
+            for fighter in data.fighters_for(div_id, dist_id):
+                with open(os.path.join(fighters_dir, f"{fighter['ascii_number']}.json"), 'w', encoding='utf-8') as f:
+                    json.dump(data.detail_record(fighter), f, ensure_ascii=False)
+        photo_count = write_demo_photos(fighters_dir, www, variants, missing_every=50)
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), partial(_QuietHandler, directory=www))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        print(f"{len(os.listdir(fighters_dir))} records, {photo_count} photo URLs "
+              f"({photo_count // 50} missing) from {variants} distinct images at {base_url}\n")
+
+        try:
+            for label, limit in (('First run, stopped early', photo_count // 3), ('Resumed', None), ('Rerun', None)):
+                print(f"== {label}")
+                mirror = PhotoMirror(fighters_dir, store, base_url=base_url, concurrency=concurrency,
+                                     requests_per_second=0, limit=limit)
+                mirror.run()
+                mirror.close()
+                print()
+
+            manifest = PhotoManifest(os.path.join(store, 'manifest.sqlite'))
+            blobs = BlobStore(os.path.join(store, 'blobs'))
+            mismatched = 0
+            for url, digest in manifest.db.execute('SELECT url, sha256 FROM urls WHERE sha256 IS NOT NULL'):
+                with open(os.path.join(www, urlparse(url).path.lstrip('/')), 'rb') as f:
+                    served = f.read()
+                with open(blobs.path(digest), 'rb') as f:
+                    mismatched += hashlib.sha256(served).hexdigest() != digest or f.read() != served
+            summary = manifest.summary()
+            manifest.close()
+            print(f"Server requests: {_QuietHandler.request_count} for {photo_count} URLs; "
+                  f"blobs on disk: {sum(len(files) for _, _, files in os.walk(blobs.root))}; "
+                  f"mismatched blobs: {mismatched}; owners mirrored: {summary['owners_mirrored']}/{summary['owners']}")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mirror fighter and heir photos into content-addressed storage')
+    parser.add_argument('--source', default='fighters', help='fighters/ directory or a fighter_archive.py pack')
+    parser.add_argument('--store', default='photos', help='Directory for blobs/ and manifest.sqlite')
+    parser.add_argument('--base-url', help='Fetch each photo path from this host instead (e.g. a local static file server)')
+    parser.add_argument('--concurrency', type=int, default=20, help='Maximum concurrent requests')
+    parser.add_argument('--rate', type=float, default=10.0,
+                        help='Maximum request rate (requests/sec, 0 = unlimited); the controller adapts below it')
+    parser.add_argument('--limit', type=int, help='Stop after queueing this many URLs')
+    parser.add_argument('--retry-failed', action='store_true', help='Fetch URLs that failed in earlier runs again')
+    parser.add_argument('--export', metavar='JSONL', help='Write the owner -> URL -> blob manifest as JSON lines and exit')
+    parser.add_argument('--demo', action='store_true', help='Mirror a synthetic dataset from a local static file server')
+    parser.add_argument('--location-file', default='location_data.json', help='Location data for --demo')
+    parser.add_argument('--districts', type=int, default=8, help='Districts of synthetic records for --demo')
+    parser.add_argument('--default-size', type=int, default=200, help='Fighters per district for --demo')
+    parser.add_argument('--variants', type=int, default=300, help='Distinct images behind the --demo photo URLs')
+    args = parser.parse_args()
+
+    if args.demo:
+        demo(args.location_file, args.districts, args.default_size, args.variants, args.concurrency)
+        return
+
+    if args.export:
+        manifest = PhotoManifest(os.path.join(args.store, 'manifest.sqlite'))
+        print(f"Wrote {manifest.export(args.export)} manifest entries to {args.export}")
+        manifest.close()
+        return
+
+    mirror = PhotoMirror(args.source, args.store, base_url=args.base_url, concurrency=args.concurrency,
+                         requests_per_second=args.rate, retry_failed=args.retry_failed, limit=args.limit)
+    try:
+        mirror.run()
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun to resume")
+    finally:
+        mirror.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Append-only progress journal for the listing scrapers
+Page completions are appended as one JSON line each instead of rewriting
+the whole progress document. Every compact_every entries (and at the end
+of a run) the in-memory progress is written as a checkpoint with an atomic
+rename and the journal is truncated. Loading reads the checkpoint and
+replays journal entries newer than the checkpoint's journal_seq, skipping a
+torn final line left by a crash mid-write. Run this module with
+--crash-test to SIGKILL journal writers mid-write and check every reload.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+
+def apply_progress_entry(progress, entry):
+    """Apply one page-completion entry to a progress document"""
+    combinations = progress['completed_combinations']
+    key = entry['key']
+    if key not in combinations:
+        combinations[key] = {
+            'last_page': 0,
+            'total_pages': 0,
+            'completed': False
+        }
+
+    # Pages finish out of order across workers, so entries may arrive late
+    combinations[key]['last_page'] = max(combinations[key]['last_page'], entry['page'])
+    if entry.get('total_pages'):
+        combinations[key]['total_pages'] = entry['total_pages']
+    if entry.get('completed'):
+        combinations[key]['completed'] = True
+
+    progress['new_records_found'] = progress.get('new_records_found', 0) + entry.get('new_records', 0)
+    progress['last_update'] = entry.get('ts', datetime.now().isoformat())
+    progress['current_combination'] = key
+    progress['journal_seq'] = entry['seq']
+
+
+class ProgressJournal:
+    def __init__(self, checkpoint_file, journal_file=None, compact_every=1000, fsync=False):
+        self.checkpoint_file = checkpoint_file
+        self.journal_file = journal_file or f"{os.path.splitext(checkpoint_file)[0]}.journal.jsonl"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.seq = 0
+        self.entries_since_checkpoint = 0
+        self._fh = None
+        self._lock = threading.Lock()
+
+    def load(self, progress):
+        """Replay journal entries on top of the checkpointed progress document"""
+        self.seq = progress.get('journal_seq', 0)
+        if not os.path.exists(self.journal_file):
+            return progress
+
+        replayed = 0
+        valid_end = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash; nothing valid can follow it
+                    break
+                valid_end += len(line)
+                if entry.get('seq', 0) <= self.seq:
+                    continue
+                apply_progress_entry(progress, entry)
+                self.seq = entry['seq']
+                replayed += 1
+
+        # Drop a torn tail so new entries are not appended onto a broken line
+        if valid_end < os.path.getsize(self.journal_file):
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(valid_end)
+
+        self.entries_since_checkpoint = replayed
+        if replayed:
+            print(f"Replayed {replayed} progress journal entries")
+        return progress
+
+    def record(self, progress, combination_key, page_number, total_pages=None, completed=False, new_records=0):
+        """Append one page completion, apply it to progress and compact when due"""
+        with self._lock:
+            self.seq += 1
+            entry = {
+                'seq': self.seq,
+                'key': combination_key,
+                'page': page_number,
+                'total_pages': total_pages or 0,
+                'completed': completed,
+                'new_records': new_records,
+                'ts': datetime.now().isoformat()
+            }
+
+            if self._fh is None:
+                self._fh = open(self.journal_file, 'ab')
+            self._fh.write((json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8'))
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+
+            apply_progress_entry(progress, entry)
+            self.entries_since_checkpoint += 1
+            if self.entries_since_checkpoint >= self.compact_every:
+                self._compact(progress)
+
+    def compact(self, progress):
+        """Write progress as a checkpoint and truncate the journal"""
+        with self._lock:
+            self._compact(progress)
+
+    def _compact(self, progress):
+        progress['journal_seq'] = self.seq
+        tmp_file = f"{self.checkpoint_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(progress, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.checkpoint_file)
+
+        # Entries up to journal_seq are now in the checkpoint; a crash before
+        # the truncate below is harmless because load() skips them
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'wb'):
+                pass
+        self.entries_since_checkpoint = 0
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+def read_checkpoint(checkpoint_file):
+    """The checkpointed progress document, or an empty one"""
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'completed_combinations': {}, 'new_records_found': 0}
+
+
+def crash_key(seq):
+    """Combination and page the crash-test writer records as entry seq"""
+    return f"1-{seq % 8}", seq // 8 + 1
+
+
+def crash_writer(checkpoint_file, log_path, compact_every):
+    """--crash-test child: record pages until killed, logging each seq once record() returns"""
+    journal = ProgressJournal(checkpoint_file, compact_every=compact_every)
+    progress = journal.load(read_checkpoint(checkpoint_file))
+    with open(log_path, 'a') as log:
+        while True:
+            key, page = crash_key(journal.seq + 1)
+            journal.record(progress, key, page, new_records=1)
+            log.write(f"{journal.seq}\n")
+            log.flush()
+
+
+def check_reload(checkpoint_file, durable):
+    """Reload after a kill; returns a list of problems"""
+    journal = ProgressJournal(checkpoint_file)
+    with contextlib.redirect_stdout(io.StringIO()):
+        progress = journal.load(read_checkpoint(checkpoint_file))
+    seq = progress.get('journal_seq', 0)
+    problems = []
+    if seq < durable:
+        problems.append(f"reloaded up to seq {seq}, but {durable} were recorded")
+    if progress['new_records_found'] != seq:
+        problems.append(f"{progress['new_records_found']} records counted for {seq} entries")
+    expected = {}
+    for n in range(1, seq + 1):
+        key, page = crash_key(n)
+        expected[key] = page
+    last_pages = {key: state['last_page'] for key, state in progress['completed_combinations'].items()}
+    if last_pages != expected:
+        problems.append(f"last pages {last_pages} instead of {expected}")
+    with open(journal.journal_file, 'rb') as f:
+        data = f.read()
+    if data and not data.endswith(b'\n'):
+        problems.append("torn line left in the journal after loading")
+    return problems, seq
+
+
+def crash_test(directory, rounds, compact_every=50, seed=0):
+    """
+    SIGKILL journal writers at random points, half the time leaving a torn
+    line behind; every reload must hold every recorded entry
+    """
+    import random
+    import signal
+    import subprocess
+    import sys
+
+    rng = random.Random(seed)
+    failures = 0
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        checkpoint_file = os.path.join(tmp, 'progress.json')
+        log_path = os.path.join(tmp, 'recorded.log')
+        seq = 0
+        for _ in range(rounds):
+            child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--crash-child',
+                                      checkpoint_file, log_path, str(compact_every)], stdout=subprocess.DEVNULL)
+            time.sleep(rng.uniform(0.2, 0.6))
+            child.send_signal(signal.SIGKILL)
+            child.wait()
+            if rng.random() < 0.5:
+                # A line write is not torn by SIGKILL, only by power loss: leave half an entry behind
+                journal_file = ProgressJournal(checkpoint_file).journal_file
+                torn = json.dumps({'seq': 0, 'key': '1-0', 'page': 1}).encode('utf-8')
+                with open(journal_file, 'ab') as f:
+                    f.write(torn[:rng.randrange(1, len(torn))])
+            with open(log_path) as f:
+                durable = max((int(line) for line in f if line.strip()), default=0)
+            problems, seq = check_reload(checkpoint_file, durable)
+            for problem in problems:
+                print(problem)
+            failures += len(problems)
+        print(f"{rounds} kills, {seq} entries after the last reload "
+              f"(checkpoint every {compact_every} entries)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that the progress journal survives writers killed mid-write')
+    parser.add_argument('--crash-test', type=int, default=20, metavar='ROUNDS', help='Writer processes to SIGKILL')
+    parser.add_argument('--compact-every', type=int, default=50, help='Journal entries between checkpoints')
+    parser.add_argument('--dir', default='.', help='Directory on the disk to test')
+    parser.add_argument('--crash-child', nargs=3, metavar=('CHECKPOINT', 'LOG', 'COMPACT_EVERY'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.crash_child:
+        checkpoint_file, log_path, compact_every = args.crash_child
+        crash_writer(checkpoint_file, log_path, int(compact_every))
+        return
+    failures = crash_test(args.dir, args.crash_test, args.compact_every)
+    print("OK" if not failures else f"{failures} failed checks")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Adaptive request pacing shared by every scraper worker
+AdaptiveRateController combines a token bucket (requests/sec) with an
+AIMD concurrency window: both grow additively while responses come back
+fast and clean, and are halved (at most once per latency window) on 429,
+5xx, timeouts or slow responses. A per-host circuit breaker stops all
+requests to a host after repeated 5xx/timeouts and lets a single probe
+through once the cooldown passes. RetryPolicy gives jittered exponential backoff.
+The controller is thread-safe and has blocking and asyncio acquire methods.
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+OK = 'ok'
+THROTTLED = 'throttled'
+SERVER_ERROR = 'server_error'
+TIMEOUT = 'timeout'
+CLIENT_ERROR = 'client_error'
+
+RETRYABLE_OUTCOMES = (THROTTLED, SERVER_ERROR, TIMEOUT)
+
+
+def classify_status(status):
+    """Map an HTTP status code to a controller outcome"""
+    if status == 429:
+        return THROTTLED
+    if status >= 500:
+        return SERVER_ERROR
+    if status >= 400:
+        return CLIENT_ERROR
+    return OK
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds form only)"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=4, max_throttled_retries=20, base_delay=1.0, max_delay=60.0):
+        self.max_retries = max_retries
+        self.max_throttled_retries = max_throttled_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, outcome, failures, throttles):
+        """
+        Whether to try again after `failures` 5xx/timeouts and `throttles`
+        429s so far. A 429 asks us to wait rather than signalling a broken
+        page, so it has its own, larger budget.
+        """
+        if outcome == THROTTLED:
+            return throttles <= self.max_throttled_retries
+        return outcome in RETRYABLE_OUTCOMES and failures <= self.max_retries
+
+    def delay(self, attempt):
+        """Full-jitter exponential backoff for the given (0-based) retry"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """closed -> open after failure_threshold consecutive failures -> half-open probe"""
+
+    def __init__(self, failure_threshold=8, cooldown=15.0, max_cooldown=300.0):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+
+    def wait_time(self, now):
+        """Seconds until a request may be sent (0 = now)"""
+        if self.state == 'open':
+            remaining = self.opened_at + self.cooldown - now
+            if remaining > 0:
+                return remaining
+            self.state = 'half-open'
+        if self.state == 'half-open' and self.probe_in_flight:
+            return 0.1
+        return 0.0
+
+    def on_send(self):
+        if self.state == 'half-open':
+            self.probe_in_flight = True
+
+    def on_success(self):
+        self.state = 'closed'
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+        self.probe_in_flight = False
+
+    def on_failure(self, now):
+        self.failures += 1
+        if self.state == 'half-open':
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open(now)
+        elif self.state == 'closed' and self.failures >= self.failure_threshold:
+            # Requests already in flight when it opened must not restart the cool-down
+            self._open(now)
+
+    def _open(self, now):
+        self.state = 'open'
+        self.opened_at = now
+        self.probe_in_flight = False
+        self.times_opened += 1
+
+
+class AdaptiveRateController:
+    def __init__(self, initial_rate=5.0, max_rate=20.0, min_rate=0.2,
+                 initial_concurrency=4, max_concurrency=16, min_concurrency=1,
+                 latency_target=3.0, failure_threshold=8, breaker_cooldown=15.0):
+        # max_rate=None disables the token bucket; only the concurrency window applies
+        self.rate = min(initial_rate, max_rate) if max_rate else None
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.concurrency = float(min(initial_concurrency, max_concurrency))
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_target = latency_target
+        self.failure_threshold = failure_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self.last_decrease = 0.0
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.breakers = {}
+        self.counters = {OK: 0, THROTTLED: 0, SERVER_ERROR: 0, TIMEOUT: 0, CLIENT_ERROR: 0, 'retries': 0}
+        self._lock = threading.Lock()
+
+    def _breaker(self, host):
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(self.failure_threshold, self.breaker_cooldown)
+        return self.breakers[host]
+
+    def try_acquire(self, host):
+        """Take a request slot if one is free; returns (granted, seconds to wait otherwise)"""
+        with self._lock:
+            now = time.monotonic()
+            breaker = self._breaker(host)
+            wait = max(breaker.wait_time(now), self.paused_until - now)
+            if wait > 0:
+                return False, wait
+            if self.in_flight >= int(self.concurrency):
+                return False, 0.01
+
+            if self.rate is not None:
+                self.tokens = min(self.tokens + (now - self.last_refill) * self.rate, max(self.rate, 1.0))
+                self.last_refill = now
+                if self.tokens < 1.0:
+                    return False, (1.0 - self.tokens) / self.rate
+                self.tokens -= 1.0
+
+            self.in_flight += 1
+            breaker.on_send()
+            return True, 0.0
+
+    def acquire(self, host):
+        """Block until a request to host may be sent"""
+        while True:
+            granted, wait = self.try_acquire(host)
+            if granted:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, host):
+        """Wait on the event loop until a request to host may be sent"""
+        while True:
+            granted, wait = self.try_acquire(host)
+            if granted:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, host, outcome, latency=None, retry_after=None):
+        """Report how a request went and adapt rate and concurrency"""
+        with self._lock:
+            now = time.monotonic()
+            self.in_flight -= 1
+            self.counters[outcome] += 1
+            breaker = self._breaker(host)
+
+            if outcome == CLIENT_ERROR:
+                breaker.on_success()
+                return
+
+            if outcome == OK:
+                breaker.on_success()
+                if latency is None or latency <= self.latency_target:
+                    # Additive increase: roughly +1 per window of successful requests
+                    self.concurrency = min(self.concurrency + 1.0 / self.concurrency, self.max_concurrency)
+                    if self.rate is not None:
+                        self.rate = min(self.rate + 1.0 / self.rate, self.max_rate)
+                else:
+                    self._decrease(now)
+                return
+
+            # 429 means "slow down", not "unhealthy": it backs off but does not trip the breaker
+            if outcome != THROTTLED:
+                breaker.on_failure(now)
+            self._decrease(now)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+    def _decrease(self, now):
+        # Multiplicative decrease, once per latency window so a burst of
+        # failures from the same overload only halves the limits once
+        if now - self.last_decrease < self.latency_target:
+            return
+        self.last_decrease = now
+        self.concurrency = max(self.concurrency / 2, self.min_concurrency)
+        if self.rate is not None:
+            self.rate = max(self.rate / 2, self.min_rate)
+
+    def record_retry(self):
+        with self._lock:
+            self.counters['retries'] += 1
+
+    def snapshot(self):
+        """Current limits and counters for progress reports"""
+        with self._lock:
+            return {
+                'rate': round(self.rate, 2) if self.rate is not None else None,
+                'concurrency': int(self.concurrency),
+                'in_flight': self.in_flight,
+                'breakers': {host: b.state for host, b in self.breakers.items()},
+                'breaker_trips': sum(b.times_opened for b in self.breakers.values()),
+                **self.counters,
+            }
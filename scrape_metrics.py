@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Per-stage metrics and profiling hooks for the scrapers
+StageMetrics keeps a latency histogram per (stage, worker) and running
+totals per (combination, stage) for fetch, parse, dedup, CSV write,
+fsync, progress save and lock waits, plus plain event counters. Workers
+label their own measurements with set_worker()/set_combination(), which
+are context variables, so asyncio tasks and threads each carry their own.
+Histograms are cumulative from the start of the run and exported as
+Prometheus text (serve() starts a /metrics endpoint) or as periodic JSONL
+snapshots. SamplingProfiler samples the Python stacks of every thread
+and writes collapsed stacks for flame graph tools. Run this module to
+measure the cost of one observation.
+"""
+
+import argparse
+import bisect
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram upper bounds in seconds: 50 us doubling up to about 105 s
+BUCKETS = tuple(0.00005 * 2 ** i for i in range(22))
+
+IDLE_MODULES = ('threading.py', 'queue.py', 'selectors.py', 'socketserver.py')
+
+_worker = contextvars.ContextVar('metrics_worker', default='')
+_combination = contextvars.ContextVar('metrics_combination', default='')
+
+
+def set_worker(worker_id):
+    """Label measurements made by the current thread or task with a worker id"""
+    _worker.set(str(worker_id))
+
+
+def set_combination(key):
+    """Label measurements made by the current thread or task with a combination key"""
+    _combination.set(key or '')
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q):
+        """q-quantile interpolated within its bucket, as histogram_quantile() does (None when empty)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[i - 1] if i else 0.0
+                return lower + (BUCKETS[i] - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+
+
+class TimedLock:
+    """threading.Lock wrapper recording acquire waits as the lock_wait.{name} stage"""
+
+    def __init__(self, metrics, name, lock=None):
+        self.metrics = metrics
+        self.stage = f"lock_wait.{name}"
+        self._lock = lock or threading.Lock()
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self._lock.acquire()
+        self.metrics.observe(self.stage, time.perf_counter() - start)
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+class StageMetrics:
+    def __init__(self, prefix='scraper'):
+        self.prefix = prefix
+        self.started = time.time()
+        self._histograms = {}    # (stage, worker) -> Histogram
+        self._combinations = {}  # (combination, stage) -> [count, seconds]
+        self._events = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        """Record one duration for a stage under the caller's worker and combination labels"""
+        key = (stage, _worker.get())
+        combination = _combination.get()
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+            if combination:
+                totals = self._combinations.get((combination, stage))
+                if totals is None:
+                    totals = self._combinations[(combination, stage)] = [0, 0.0]
+                totals[0] += 1
+                totals[1] += seconds
+
+    def time(self, stage):
+        """Context manager timing its block as one observation of a stage"""
+        return _Timer(self, stage)
+
+    def count(self, event, n=1):
+        with self._lock:
+            self._events[event] += n
+
+    def stages(self):
+        """{stage: Histogram} merged over workers"""
+        merged = {}
+        with self._lock:
+            for (stage, _), histogram in self._histograms.items():
+                merged.setdefault(stage, Histogram()).merge(histogram)
+        return merged
+
+    def snapshot(self, combinations=False):
+        """JSON-ready totals: per stage (merged), per worker, events and optionally per combination"""
+        with self._lock:
+            workers = {}
+            for (stage, worker), histogram in self._histograms.items():
+                if worker:
+                    workers.setdefault(worker, {})[stage] = round(histogram.sum, 6)
+            events = dict(self._events)
+            by_combination = {}
+            if combinations:
+                for (combination, stage), (count, seconds) in self._combinations.items():
+                    by_combination.setdefault(combination, {})[stage] = {'count': count, 'seconds': round(seconds, 6)}
+        stages = {}
+        for stage, histogram in sorted(self.stages().items()):
+            stages[stage] = {'count': histogram.count, 'seconds': round(histogram.sum, 6),
+                             'p50_ms': _ms(histogram.quantile(0.5)), 'p99_ms': _ms(histogram.quantile(0.99))}
+        snapshot = {'time': time.time(), 'uptime': round(time.time() - self.started, 3),
+                    'stages': stages, 'workers': workers, 'events': events}
+        if combinations:
+            snapshot['combinations'] = by_combination
+        return snapshot
+
+    def prometheus_text(self):
+        """Prometheus text exposition of every histogram, combination total and event counter"""
+        name = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {name} Time spent per scraper stage", f"# TYPE {name} histogram"]
+        with self._lock:
+            histograms = sorted((key, list(h.counts), h.sum, h.count) for key, h in self._histograms.items())
+            combinations = sorted((key, tuple(totals)) for key, totals in self._combinations.items())
+            events = sorted(self._events.items())
+        for (stage, worker), counts, total, count in histograms:
+            labels = f'stage="{stage}",worker="{worker}"'
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += n
+                le = bound if isinstance(bound, str) else f"{bound:g}"
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+
+        name = f"{self.prefix}_combination_stage_seconds"
+        lines += [f"# HELP {name} Time spent per combination and stage", f"# TYPE {name} summary"]
+        for (combination, stage), (count, seconds) in combinations:
+            labels = f'combination="{combination}",stage="{stage}"'
+            lines.append(f"{name}_sum{{{labels}}} {seconds:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+
+        name = f"{self.prefix}_events_total"
+        lines += [f"# HELP {name} Scraper event counters", f"# TYPE {name} counter"]
+        lines += [f'{name}{{event="{event}"}} {n}' for event, n in events]
+        return '\n'.join(lines) + '\n'
+
+    def report(self):
+        """Per-stage table for the end-of-run summary"""
+        stages = self.stages()
+        lines = [f"{'stage':<22}{'count':>9}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}"]
+        for stage, histogram in sorted(stages.items(), key=lambda item: -item[1].sum):
+            lines.append(f"{stage:<22}{histogram.count:>9}{histogram.sum:>10.2f}"
+                         f"{histogram.sum / histogram.count * 1e3:>10.2f}"
+                         f"{histogram.quantile(0.5) * 1e3:>10.2f}{histogram.quantile(0.99) * 1e3:>10.2f}")
+        events = self.snapshot()['events']
+        if events:
+            lines.append('events: ' + ', '.join(f"{event}={n}" for event, n in sorted(events.items())))
+        return '\n'.join(lines)
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve /metrics in Prometheus text format from a daemon thread; returns the server"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1e3, 3)
+
+
+class SnapshotWriter:
+    """Appends a StageMetrics snapshot to a JSONL file every interval seconds"""
+
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _write(self, final=False):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.metrics.snapshot(combinations=final), ensure_ascii=False) + '\n')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stop the writer and append a final snapshot with the per-combination totals"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._write(final=True)
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stack of every other thread every interval seconds.
+    Threads parked in a lock, queue or select wait are idle and skipped.
+    With focus function names, only samples inside one of them are kept,
+    cut to start at the outermost matching frame. write() emits collapsed
+    stacks ("outer;inner count" lines) for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, interval=0.005, focus=None):
+        self.interval = interval
+        self.focus = set(focus or ())
+        self.samples = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own or os.path.basename(frame.f_code.co_filename) in IDLE_MODULES:
+                continue
+            stack = []
+            cut = None
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                if code.co_name in self.focus:
+                    cut = len(stack)  # Outermost match so far (frames are walked inner to outer)
+                frame = frame.f_back
+            if self.focus:
+                if cut is None:
+                    continue
+                stack = stack[:cut]
+            self.samples[';'.join(reversed(stack))] += 1
+        self.sample_count += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, n in self.samples.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class MetricsExport:
+    """The optional outputs of a run: /metrics endpoint, JSONL snapshots and a sampling profile"""
+
+    def __init__(self, metrics, port=None, snapshot_file=None, interval=10.0,
+                 profile_file=None, profile_focus=None):
+        self.server = metrics.serve(port) if port else None
+        self.writer = SnapshotWriter(metrics, snapshot_file, interval).start() if snapshot_file else None
+        self.profile_file = profile_file
+        self.profiler = SamplingProfiler(focus=profile_focus).start() if profile_file else None
+        if self.server is not None:
+            print(f"Metrics: http://127.0.0.1:{port}/metrics")
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler.write(self.profile_file)
+            print(f"Profile: {self.profiler.sample_count} samples -> {self.profile_file}")
+        if self.server is not None:
+            self.server.shutdown()
+
+
+def add_metrics_arguments(parser):
+    """--metrics-port, --metrics-file, --metrics-interval, --profile and --profile-focus"""
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus text metrics on http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-file', help='Append a JSONL metrics snapshot every --metrics-interval seconds')
+    parser.add_argument('--metrics-interval', type=float, default=10.0)
+    parser.add_argument('--profile', help='Write sampled Python stacks (collapsed format) to this file')
+    parser.add_argument('--profile-focus', help='Comma-separated function names; keep only samples inside them')
+
+
+def metrics_export(metrics, args):
+    return MetricsExport(metrics, args.metrics_port, args.metrics_file, args.metrics_interval, args.profile,
+                         args.profile_focus.split(',') if args.profile_focus else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the cost of recording stage metrics')
+    parser.add_argument('--observations', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    metrics = StageMetrics()
+    per_thread = args.observations // args.threads
+
+    def work(worker_id):
+        set_worker(worker_id)
+        set_combination(f"30-{worker_id}")
+        for _ in range(per_thread):
+            with metrics.time('fetch'):
+                pass
+
+    start = time.perf_counter()
+    for _ in range(per_thread):
+        pass
+    empty = time.perf_counter() - start
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start - empty * args.threads
+    total = per_thread * args.threads
+    print(f"{total} timed blocks on {args.threads} threads: {elapsed / total * 1e6:.2f} us per observation")
+    print(f"Prometheus text: {len(metrics.prometheus_text())} bytes")
+
+
+if __name__ == "__main__":
+    main()
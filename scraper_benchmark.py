@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the listing and detail scrapers
+Every scenario runs in a fresh process against a local server: either the
+synthetic fake_molwa_server.py list (--latency, --latency-jitter,
+--error-rate) or pages recorded from any site root with --record and
+replayed with --fixtures. Each scenario reports pages/sec, rows/sec, CPU
+time per page (parser processes included), peak RSS and p50/p99 fetch
+latency from the scraper's stage metrics. Results are appended to
+benchmark_history.jsonl and compared with benchmark_baseline.json; a
+scenario that is slower, uses more CPU per page or more memory, or has a
+worse p99 than --threshold allows is reported as a regression and the
+exit status is 1.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from fake_molwa_server import FakeMolwaServer, to_bengali_digits
+from fighter_index import FIGHTER_NUMBER_FIELD
+from shard_benchmark import quiet
+
+SCENARIOS = ('listing-sequential', 'listing-threaded', 'listing-async', 'detail-async')
+# Result fields compared with the baseline, and whether a higher value is better
+COMPARED = {'pages_per_sec': True, 'rows_per_sec': True, 'cpu_ms_per_page': False,
+            'peak_rss_mb': False, 'p99_ms': False}
+
+
+def location_subset(location_data, divisions):
+    return {
+        'divisions': {k: v for k, v in location_data['divisions'].items() if k in divisions},
+        'districts': {k: v for k, v in location_data['districts'].items() if k in divisions},
+        'upazilas': {k: v for k, v in location_data.get('upazilas', {}).items() if k in divisions},
+        'prove_types': location_data.get('prove_types', {}),
+    }
+
+
+def unpaced(scraper, concurrency):
+    """Replace the scraper's pacing with an unlimited rate so the benchmark measures the scraper"""
+    from rate_controller import AdaptiveRateController
+    scraper.rate_controller = AdaptiveRateController(initial_concurrency=concurrency, max_rate=None,
+                                                     max_concurrency=concurrency)
+    return scraper
+
+
+def listing_sequential(options):
+    """The original path: get_page_results -> extract_fighters_from_html -> save_fighters_to_csv per page"""
+    from division_district_scraper import DivisionDistrictScraper
+    scraper = unpaced(DivisionDistrictScraper(**options['listing']), 1)
+    pages = 0
+    for combination in scraper.generate_combinations():
+        page = combination['start_page']
+        while True:
+            html_content = scraper.get_page_results(combination, page)
+            if html_content is None:
+                break
+            fighters, _, has_more_pages = scraper.extract_fighters_from_html(html_content, combination)
+            pages += 1
+            if fighters:
+                scraper.save_fighters_to_csv(fighters)
+            if not has_more_pages:
+                break
+            page += 1
+    scraper.sink.close()
+    return scraper.metrics, pages, scraper.sink.rows_written
+
+
+def listing_threaded(options):
+    from division_district_scraper import DivisionDistrictScraper
+    scraper = unpaced(DivisionDistrictScraper(**options['listing']), options['concurrency'])
+    scraper.run_scraping(max_workers=options['concurrency'])
+    return scraper.metrics, scraper.metrics.snapshot()['events'].get('pages', 0), scraper.sink.rows_written
+
+
+def listing_async(options):
+    from async_scraper import AsyncDivisionDistrictScraper
+    scraper = AsyncDivisionDistrictScraper(concurrency=options['concurrency'], requests_per_second=0,
+                                           parse_workers=options['parse_workers'], **options['listing'])
+    scraper.run_scraping()
+    return scraper.metrics, scraper.metrics.snapshot()['events'].get('pages', 0), scraper.sink.rows_written
+
+
+def detail_async(options):
+    from detail_scraper import DetailScraper
+    scraper = DetailScraper(csv_file=options['detail_input'], output_dir=os.path.join(options['workdir'], 'fighters'),
+                            progress_file=os.path.join(options['workdir'], 'detail_progress.json'),
+                            base_url=options['base_url'], concurrency=options['concurrency'],
+                            requests_per_second=0, parse_workers=options['parse_workers'])
+    scraper.run_scraper()
+    stats = scraper.stats
+    return scraper.metrics, stats['committed'] + stats['not_found'] + stats['failed'], stats['committed']
+
+
+SCENARIO_FUNCTIONS = {
+    'listing-sequential': listing_sequential,
+    'listing-threaded': listing_threaded,
+    'listing-async': listing_async,
+    'detail-async': detail_async,
+}
+
+
+def run_scenario(name, options):
+    """Child process entry point: run one scenario and measure it"""
+    start = time.perf_counter()
+    with quiet():
+        metrics, pages, rows = SCENARIO_FUNCTIONS[name](options)
+    wall = time.perf_counter() - start
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    cpu = sum(u.ru_utime + u.ru_stime for u in usage)
+    peak_kb = max(u.ru_maxrss for u in usage)  # Kilobytes on Linux
+    fetch = metrics.stages().get('fetch')
+    return {
+        'pages': pages,
+        'rows': rows,
+        'wall_s': round(wall, 3),
+        'cpu_s': round(cpu, 3),
+        'pages_per_sec': round(pages / wall, 2),
+        'rows_per_sec': round(rows / wall, 2),
+        'cpu_ms_per_page': round(cpu / max(pages, 1) * 1e3, 3),
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+        'p50_ms': round(fetch.quantile(0.5) * 1e3, 2) if fetch else None,
+        'p99_ms': round(fetch.quantile(0.99) * 1e3, 2) if fetch else None,
+    }
+
+
+def run_isolated(name, options):
+    # A fresh interpreter per run, so peak RSS and CPU belong to this scenario alone
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(run_scenario, name, options).result()
+
+
+def median_result(runs):
+    """Per-field median of repeated runs"""
+    result = {}
+    for field in runs[0]:
+        values = [run[field] for run in runs if run[field] is not None]
+        result[field] = round(statistics.median(values), 3) if values else None
+    return result
+
+
+def write_detail_input(path, ascii_ids):
+    """A one-column fighter number CSV for the detail scenario"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"{FIGHTER_NUMBER_FIELD}\n")
+        for ascii_id in ascii_ids:
+            f.write(f"{to_bengali_digits(ascii_id)}\n")
+
+
+def compare(results, baseline, threshold):
+    """Regression messages for every compared field worse than the baseline by more than threshold"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for field, higher_is_better in COMPARED.items():
+            old, new = previous.get(field), result.get(field)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{name} {field}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record_fixtures(args):
+    """Save listing pages and details pages from a site root for later --fixtures runs"""
+    from async_scraper import AsyncDivisionDistrictScraper
+    from detail_scraper import DetailScraper
+
+    class RecordingDetailScraper(DetailScraper):
+        async def fetch_detail(self, http, ascii_id):
+            html_content, error = await super().fetch_detail(http, ascii_id)
+            if html_content is not None:
+                with open(os.path.join(args.record, 'details', f"{ascii_id}.html"), 'wb') as f:
+                    f.write(html_content)
+            return html_content, error
+
+    os.makedirs(os.path.join(args.record, 'details'), exist_ok=True)
+    with open(args.location_file, 'r', encoding='utf-8') as f:
+        subset = location_subset(json.load(f), args.divisions.split(','))
+    location_file = os.path.join(args.record, 'location_data.json')
+    with open(location_file, 'w', encoding='utf-8') as f:
+        json.dump(subset, f, ensure_ascii=False, indent=2)
+
+    listing_csv = os.path.join(args.record, 'listing.csv')
+    AsyncDivisionDistrictScraper(
+        concurrency=args.concurrency, requests_per_second=args.rate,
+        save_pages_dir=os.path.join(args.record, 'listing'), csv_file=listing_csv,
+        progress_file=os.path.join(args.record, 'listing_progress.json'),
+        location_file=location_file, base_url=args.base_url).run_scraping()
+    RecordingDetailScraper(
+        csv_file=listing_csv, output_dir=os.path.join(args.record, 'fighters'),
+        progress_file=os.path.join(args.record, 'detail_progress.json'), base_url=args.base_url,
+        concurrency=args.concurrency, requests_per_second=args.rate, limit=args.details).run_scraper()
+    print(f"Fixtures recorded in {args.record}/ (replay with --fixtures {args.record})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the listing and detail scrapers against a local replay server')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument('--fixtures', help='Replay pages recorded with --record instead of the synthetic list')
+    parser.add_argument('--record', help='Record listing and details pages from --base-url into this directory and exit')
+    parser.add_argument('--base-url', default='https://mis.molwa.gov.bd', help='Site root to record from')
+    parser.add_argument('--rate', type=float, default=10.0, help='Request rate limit while recording')
+    parser.add_argument('--location-file', default='location_data.json')
+    parser.add_argument('--divisions', default='4', help='Comma-separated division ids to crawl (default: Khulna)')
+    parser.add_argument('--default-size', type=int, default=300, help='Synthetic fighters per district')
+    parser.add_argument('--details', type=int, default=2000, help='Fighters fetched by the detail scenario (or recorded)')
+    parser.add_argument('--latency', type=float, default=0.01, help='Server delay per request (seconds)')
+    parser.add_argument('--latency-jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 5xx')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--parse-workers', type=int, default=0, help='Parser processes for the async scenarios (0 = event loop)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario; the median of each figure is kept')
+    parser.add_argument('--baseline', default='benchmark_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true', help='Replace the baseline with this run')
+    parser.add_argument('--history', default='benchmark_history.jsonl')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative change counted as a regression')
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args)
+        return
+
+    if args.fixtures:
+        location_file = os.path.join(args.fixtures, 'location_data.json')
+        with open(location_file, 'r', encoding='utf-8') as f:
+            location_data = json.load(f)
+    else:
+        with open(args.location_file, 'r', encoding='utf-8') as f:
+            location_data = location_subset(json.load(f), args.divisions.split(','))
+    config = {
+        'fixtures': os.path.abspath(args.fixtures) if args.fixtures else 'synthetic',
+        'divisions': sorted(location_data['divisions']),
+        'default_size': None if args.fixtures else args.default_size,
+        'details': args.details, 'latency': args.latency, 'latency_jitter': args.latency_jitter,
+        'error_rate': args.error_rate, 'concurrency': args.concurrency, 'parse_workers': args.parse_workers,
+    }
+
+    server = FakeMolwaServer(location_data, default_size=args.default_size, latency=args.latency,
+                             latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                             replay_dir=args.fixtures)
+    results = {}
+    with server, tempfile.TemporaryDirectory() as workdir:
+        if not args.fixtures:
+            location_file = os.path.join(workdir, 'location_data.json')
+            with open(location_file, 'w', encoding='utf-8') as f:
+                json.dump(location_data, f, ensure_ascii=False)
+            ascii_ids = [fighter['ascii_number'] for fighter in server.httpd.data.all_fighters()]
+        else:
+            ascii_ids = server.httpd.data.detail_ids()
+        detail_input = os.path.join(workdir, 'detail_input.csv')
+        write_detail_input(detail_input, ascii_ids[:args.details])
+
+        print(f"Fixtures: {config['fixtures']}, divisions {','.join(config['divisions'])}, "
+              f"latency {args.latency}+{args.latency_jitter}s, error rate {args.error_rate}")
+        print(f"{'scenario':<20}{'pages':>7}{'rows':>8}{'wall s':>8}{'pages/s':>9}{'rows/s':>9}"
+              f"{'cpu ms/pg':>10}{'peak MB':>9}{'p50 ms':>8}{'p99 ms':>8}")
+        for name in args.scenarios.split(','):
+            runs = []
+            for run in range(args.repeat):
+                run_dir = os.path.join(workdir, f"{name}-{run}")
+                os.makedirs(run_dir)
+                options = {
+                    'workdir': run_dir, 'base_url': server.base_url, 'detail_input': detail_input,
+                    'concurrency': args.concurrency, 'parse_workers': args.parse_workers,
+                    'listing': {'csv_file': os.path.join(run_dir, 'listing.csv'),
+                                'progress_file': os.path.join(run_dir, 'listing_progress.json'),
+                                'location_file': location_file, 'base_url': server.base_url},
+                }
+                runs.append(run_isolated(name, options))
+            result = results[name] = median_result(runs)
+            print(f"{name:<20}{result['pages']:>7.0f}{result['rows']:>8.0f}{result['wall_s']:>8.2f}"
+                  f"{result['pages_per_sec']:>9.1f}{result['rows_per_sec']:>9.1f}{result['cpu_ms_per_page']:>10.2f}"
+                  f"{result['peak_rss_mb']:>9.1f}{result['p50_ms'] or 0:>8.1f}{result['p99_ms'] or 0:>8.1f}")
+
+    entry = {'time': datetime.now().isoformat(), 'revision': git_revision(), 'config': config, 'results': results}
+    with open(args.history, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    if baseline is None:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+    if baseline['config'] != config:
+        print(f"Baseline in {args.baseline} was run with a different configuration; not compared "
+              f"(rerun with --save-baseline to replace it)")
+        return
+
+    regressions = compare(results, baseline['results'], args.threshold)
+    print(f"Compared with baseline {baseline.get('revision') or ''} from {baseline['time']}: "
+          f"{len(regressions) or 'no'} regressions beyond {args.threshold:.0%}")
+    for message in regressions:
+        print(f"  REGRESSION {message}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Compare district-, upazila- and prove_type-level listing crawls
+Runs the async scraper once per shard level against a local fake MOLWA
+server with one hot district, and prints wall time, requests, rows written,
+unique fighter numbers and how many rows got their upazila filled in.
+"""
+
+import argparse
+import builtins
+import contextlib
+import json
+import os
+import tempfile
+import time
+
+from async_scraper import AsyncDivisionDistrictScraper
+from csv_sink import iter_rows
+from division_district_scraper import SHARD_LEVELS
+from fake_molwa_server import FakeMolwaServer
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the scraper's per-page output while a run is timed"""
+    original = builtins.print
+    builtins.print = lambda *args, **kwargs: None
+    try:
+        yield
+    finally:
+        builtins.print = original
+
+
+def run_level(shard_by, location_file, server, workdir, concurrency):
+    """Crawl everything at one shard level into a fresh CSV and return its stats"""
+    csv_file = os.path.join(workdir, f"{shard_by}.csv")
+    requests_before = server.request_count
+    start = time.perf_counter()
+    with quiet():
+        scraper = AsyncDivisionDistrictScraper(
+            concurrency=concurrency, requests_per_second=0, csv_file=csv_file,
+            progress_file=os.path.join(workdir, f"{shard_by}_progress.json"),
+            location_file=location_file, base_url=server.base_url, shard_by=shard_by)
+        scraper.run_scraping()
+    elapsed = time.perf_counter() - start
+
+    rows = list(iter_rows(csv_file))
+    return {
+        'units': len(list(scraper.all_combinations())),
+        'requests': server.request_count - requests_before,
+        'seconds': elapsed,
+        'rows': len(rows),
+        'unique': len({row['মুক্তিযোদ্ধার নম্বর'] for row in rows}),
+        'with_upazila': sum(1 for row in rows if row['উপজেলা'] != 'Unknown'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark shard levels of the listing crawl against a local fake server')
+    parser.add_argument('--location-file', default='location_data.json')
+    parser.add_argument('--divisions', default='4', help='Comma-separated division ids to crawl (default: Khulna)')
+    parser.add_argument('--levels', default=','.join(SHARD_LEVELS), help='Shard levels to compare')
+    parser.add_argument('--hot-district', default='4-35', help='District given --hot-size fighters')
+    parser.add_argument('--hot-size', type=int, default=3000)
+    parser.add_argument('--default-size', type=int, default=60, help='Fighters in every other district')
+    parser.add_argument('--unassigned-every', type=int, default=0, help='Every Nth fighter has no upazila (forces residual district passes)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Server delay per request (seconds)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    with open(args.location_file, 'r', encoding='utf-8') as f:
+        location_data = json.load(f)
+    divisions = args.divisions.split(',')
+    subset = {
+        'divisions': {k: v for k, v in location_data['divisions'].items() if k in divisions},
+        'districts': {k: v for k, v in location_data['districts'].items() if k in divisions},
+        'upazilas': {k: v for k, v in location_data['upazilas'].items() if k in divisions},
+        'prove_types': location_data['prove_types'],
+    }
+
+    server = FakeMolwaServer(location_data, district_sizes={args.hot_district: args.hot_size},
+                             default_size=args.default_size, latency=args.latency,
+                             unassigned_every=args.unassigned_every)
+    with server, tempfile.TemporaryDirectory() as workdir:
+        location_file = os.path.join(workdir, 'locations.json')
+        with open(location_file, 'w', encoding='utf-8') as f:
+            json.dump(subset, f, ensure_ascii=False)
+
+        print(f"{'level':<12}{'units':>8}{'requests':>10}{'seconds':>10}{'rows':>8}{'unique':>8}{'upazila':>9}")
+        for shard_by in args.levels.split(','):
+            stats = run_level(shard_by, location_file, server, workdir, args.concurrency)
+            print(f"{shard_by:<12}{stats['units']:>8}{stats['requests']:>10}{stats['seconds']:>10.2f}"
+                  f"{stats['rows']:>8}{stats['unique']:>8}{stats['with_upazila'] / max(stats['rows'], 1):>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
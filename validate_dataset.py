@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Multi-process validation of the fighter records
+Every worker compiles data-schema.json once (fastjsonschema, falling back
+to jsonschema) and checks chunks of fighters/*.json files, or block ranges
+of a fighter_archive.py pack, against it. On top of the schema it checks
+the invariants the scrapers rely on:
+  fighter_number  eleven Bengali digits, matching the file name
+  detail_url      the details URL of that fighter number
+  scraped_at      an ISO 8601 timestamp (naive, as datetime.isoformat() writes it)
+  location        basic_info division/district/upazila names exist in location_data.json
+Errors go to a JSON report; --scaling times the run at several worker counts.
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+try:
+    import jsonschema
+except ImportError:
+    jsonschema = None
+
+from detail_parser import SITE_URL
+from fighter_index import to_ascii_digits
+
+FIGHTER_NUMBER_RE = re.compile(r'^[০-৯]{11}$')
+
+
+def _is_iso_datetime(value):
+    try:
+        datetime.fromisoformat(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def compile_schema(schema):
+    """A function returning the schema error messages for one record (empty when valid)"""
+    if fastjsonschema is not None:
+        # The release files carry naive timestamps, which strict RFC 3339 date-time rejects
+        validate = fastjsonschema.compile(schema, formats={'date-time': _is_iso_datetime})
+
+        def errors(record):
+            try:
+                validate(record)
+                return []
+            except fastjsonschema.JsonSchemaException as e:
+                return [e.message]
+        return errors
+
+    if jsonschema is not None:
+        validator = jsonschema.Draft7Validator(schema)
+        return lambda record: [error.message for error in validator.iter_errors(record)]
+    raise ImportError("fastjsonschema or jsonschema is required to validate records")
+
+
+class LocationNames:
+    """Division, district and upazila names from location_data.json"""
+
+    def __init__(self, location_data):
+        self.divisions = set(location_data['divisions'].values())
+        self.districts = {}
+        self.upazilas = {}
+        for div_id, districts in location_data['districts'].items():
+            division = location_data['divisions'].get(div_id)
+            for dist_id, district in districts.items():
+                self.districts.setdefault(district, set()).add(division)
+                upazilas = location_data.get('upazilas', {}).get(div_id, {}).get(dist_id, {})
+                self.upazilas.setdefault(district, set()).update(upazilas.values())
+
+    def errors(self, basic_info):
+        division, district, upazila = (basic_info.get(field) for field in ('division', 'district', 'upazila'))
+        if division and division not in self.divisions:
+            return [f"unknown division {division!r}"]
+        if district:
+            if district not in self.districts:
+                return [f"unknown district {district!r}"]
+            if division and division not in self.districts[district]:
+                return [f"district {district!r} is not in division {division!r}"]
+            if upazila and upazila not in self.upazilas[district]:
+                return [f"upazila {upazila!r} is not in district {district!r}"]
+        return []
+
+
+class RecordChecker:
+    def __init__(self, schema, location_data):
+        self.schema_errors = compile_schema(schema)
+        self.locations = LocationNames(location_data)
+
+    def check(self, record, source, file_id=None):
+        """Error dicts for one record ({'source', 'check', 'message'})"""
+        found = [('schema', message) for message in self.schema_errors(record)]
+        if not isinstance(record, dict):
+            return [{'source': source, 'check': check, 'message': message} for check, message in found]
+
+        fighter_number = record.get('fighter_number')
+        if isinstance(fighter_number, str):
+            ascii_id = to_ascii_digits(fighter_number)
+            if not FIGHTER_NUMBER_RE.match(fighter_number):
+                found.append(('fighter_number', f"not eleven Bengali digits: {fighter_number!r}"))
+            if file_id is not None and file_id != ascii_id:
+                found.append(('fighter_number', f"file name {file_id} does not match {fighter_number}"))
+            expected_url = f"{SITE_URL}/freedom-fighter-list/details/{ascii_id}"
+            if 'detail_url' in record and record['detail_url'] != expected_url:
+                found.append(('detail_url', f"{record['detail_url']!r} is not {expected_url!r}"))
+        if 'scraped_at' in record and not _is_iso_datetime(record['scraped_at']):
+            found.append(('scraped_at', f"not an ISO 8601 timestamp: {record['scraped_at']!r}"))
+        if isinstance(record.get('basic_info'), dict):
+            found.extend(('location', message) for message in self.locations.errors(record['basic_info']))
+        return [{'source': source, 'check': check, 'message': message} for check, message in found]
+
+
+_checker = None
+
+
+def _init_worker(schema, location_data):
+    # Pool initializer: the schema is compiled once per process, not per chunk
+    global _checker
+    _checker = RecordChecker(schema, location_data)
+
+
+def check_files(paths):
+    """Worker entry point: validate a chunk of fighters/*.json files"""
+    errors = []
+    for path in paths:
+        name = os.path.basename(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError) as e:
+            errors.append({'source': name, 'check': 'json', 'message': str(e)})
+            continue
+        errors.extend(_checker.check(record, name, name[:-len('.json')]))
+    return len(paths), errors
+
+
+def check_archive_blocks(archive_path, start_block, stop_block):
+    """Worker entry point: validate a block range of a packed archive"""
+    from fighter_archive import FighterArchive
+    errors = []
+    records = 0
+    with FighterArchive(archive_path) as archive:
+        for data in archive.iter_bytes(start_block, stop_block):
+            records += 1
+            try:
+                record = json.loads(data)
+            except ValueError as e:
+                errors.append({'source': f"{archive_path}#{records}", 'check': 'json', 'message': str(e)})
+                continue
+            # A record that is not an object (or has no usable number) is named by its position
+            fighter_number = record.get('fighter_number') if isinstance(record, dict) else None
+            source = fighter_number if isinstance(fighter_number, str) and fighter_number else f"{archive_path}#{records}"
+            errors.extend(_checker.check(record, source))
+    return records, errors
+
+
+def work_chunks(source, chunk_size):
+    """(function, args) tasks covering a fighters/ directory or a packed archive"""
+    if os.path.isdir(source):
+        paths = sorted(entry.path for entry in os.scandir(source) if entry.name.endswith('.json'))
+        return [(check_files, (paths[i:i + chunk_size],)) for i in range(0, len(paths), chunk_size)]
+
+    from fighter_archive import FighterArchive
+    with FighterArchive(source) as archive:
+        block_count = archive.block_count
+        blocks_per_chunk = max(1, chunk_size * block_count // max(len(archive), 1))
+    return [(check_archive_blocks, (source, start, min(start + blocks_per_chunk, block_count)))
+            for start in range(0, block_count, blocks_per_chunk)]
+
+
+def validate(source, schema, location_data, workers=None, chunk_size=2000):
+    """Validate every record; returns (records, errors, seconds)"""
+    start = time.perf_counter()
+    records = 0
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                             initializer=_init_worker, initargs=(schema, location_data)) as pool:
+        futures = [pool.submit(function, *args) for function, args in work_chunks(source, chunk_size)]
+        for future in futures:
+            count, chunk_errors = future.result()
+            records += count
+            errors.extend(chunk_errors)
+    return records, errors, time.perf_counter() - start
+
+
+def write_report(path, source, records, errors, seconds, workers):
+    by_check = {}
+    for error in errors:
+        by_check[error['check']] = by_check.get(error['check'], 0) + 1
+    report = {
+        'source': os.path.abspath(source),
+        'validated_at': datetime.now().isoformat(),
+        'records': records,
+        'invalid_records': len({error['source'] for error in errors}),
+        'errors_by_check': by_check,
+        'workers': workers,
+        'seconds': round(seconds, 3),
+        'errors': errors,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate fighter records against data-schema.json and the scraper invariants')
+    parser.add_argument('source', nargs='?', default='fighters', help='fighters/ directory or a fighter_archive.py pack')
+    parser.add_argument('--schema', default='data-schema.json')
+    parser.add_argument('--location-file', default='location_data.json')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Validator processes')
+    parser.add_argument('--chunk-size', type=int, default=2000, help='Records per worker task')
+    parser.add_argument('--report', default='validation_report.json')
+    parser.add_argument('--scaling', help='Comma-separated worker counts to time instead of a single run (e.g. 1,2,4,8)')
+    args = parser.parse_args()
+
+    with open(args.schema, 'r', encoding='utf-8') as f:
+        schema = json.load(f)
+    with open(args.location_file, 'r', encoding='utf-8') as f:
+        location_data = json.load(f)
+    print(f"Schema validator: {'fastjsonschema' if fastjsonschema else 'jsonschema'}")
+
+    if args.scaling:
+        print(f"{'workers':>8}{'records':>10}{'seconds':>10}{'records/s':>12}{'speedup':>9}")
+        baseline = None
+        for workers in (int(n) for n in args.scaling.split(',')):
+            records, errors, seconds = validate(args.source, schema, location_data, workers, args.chunk_size)
+            baseline = baseline or seconds
+            print(f"{workers:>8}{records:>10}{seconds:>10.2f}{records / seconds:>12.0f}{baseline / seconds:>8.2f}x")
+        print(f"({os.cpu_count()} CPUs available)")
+        return
+
+    records, errors, seconds = validate(args.source, schema, location_data, args.workers, args.chunk_size)
+    report = write_report(args.report, args.source, records, errors, seconds, args.workers)
+    print(f"Validated {records} records in {seconds:.2f} seconds ({records / seconds:.0f} records/s, {args.workers} workers)")
+    print(f"{report['invalid_records']} invalid records, {len(errors)} errors {report['errors_by_check']}; report: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+Incremental re-verification of the listing and the fighter records
+The listing pass revalidates every cached listing page (stalest first)
+with conditional requests; only pages whose content hash changed are
+parsed, together with their previous cached copy, and the old and new
+rows are diffed by fighter number across all shards. The detail pass
+revalidates fighters/{id}.json records, those flagged by the listing pass
+first and then the least recently verified, against a manifest of page
+and record hashes; a record file is only rewritten when its content
+changed. Every difference is appended to a JSONL changelog before the
+cache or record that held the old content is replaced:
+  {"change": "added" | "removed" | "modified", "fighter_number", "sources", "fields": {name: [old, new]}}
+Run with --demo to measure a re-verify against a fresh crawl on a local
+fake server whose list is mutated between runs.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import aiohttp
+
+from async_scraper import AsyncDivisionDistrictScraper
+from csv_sink import iter_rows
+from detail_scraper import BENGALI_DIGITS, DetailScraper, build_record, write_record
+from division_district_scraper import REQUEST_HEADERS, SHARD_LEVELS
+from fighter_index import FIGHTER_NUMBER_FIELD, to_ascii_digits
+from http_transport import ResponseCache
+from page_planner import PAGE_SIZE
+
+
+def record_digest(record):
+    """sha1 of a record's content, ignoring when it was scraped"""
+    content = {name: value for name, value in record.items() if name != 'scraped_at'}
+    return hashlib.sha1(json.dumps(content, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _flatten(record, prefix=''):
+    fields = {}
+    for name, value in record.items():
+        if isinstance(value, dict):
+            fields.update(_flatten(value, f"{prefix}{name}."))
+        else:
+            fields[f"{prefix}{name}"] = value
+    return fields
+
+
+def field_diff(old, new, ignore=('scraped_at',)):
+    """{field: [old, new]} for every differing field; nested dicts become dotted names"""
+    old_fields, new_fields = _flatten(old or {}), _flatten(new or {})
+    return {name: [old_fields.get(name), new_fields.get(name)]
+            for name in sorted(old_fields.keys() | new_fields.keys())
+            if name not in ignore and old_fields.get(name) != new_fields.get(name)}
+
+
+class ChangeLog:
+    """
+    Append-only JSONL changelog. Each entry is written and flushed as soon
+    as it is found, before the listing cache or a record file moves past
+    the old content, so an interrupted run loses no differences (its rerun
+    may log some of them again). The listing and detail passes write
+    separate entries about the same fighter.
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self.changes = {}
+        self._fh = None
+
+    def _open(self):
+        if os.path.exists(self.path):
+            # A line torn by a crash would swallow the first entry appended after it
+            with open(self.path, 'r+b') as f:
+                data = f.read()
+                if data and not data.endswith(b'\n'):
+                    f.truncate(data.rfind(b'\n') + 1)
+        self._fh = open(self.path, 'a', encoding='utf-8')
+
+    def add(self, change, fighter_number, source, fields=None):
+        entry = {'ts': datetime.now().isoformat(), 'change': change, 'fighter_number': fighter_number,
+                 'sources': [source]}
+        if fields:
+            entry['fields'] = fields
+        if self._fh is None:
+            self._open()
+        self._fh.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._fh.flush()
+        if self.fsync:
+            os.fsync(self._fh.fileno())
+        self.changes.setdefault(fighter_number, change)
+
+    def sync(self):
+        """fsync the entries written so far"""
+        if self._fh is not None:
+            os.fsync(self._fh.fileno())
+
+    @property
+    def counts(self):
+        counts = {'added': 0, 'removed': 0, 'modified': 0}
+        for change in self.changes.values():
+            counts[change] += 1
+        return counts
+
+    def close(self):
+        if self._fh is not None:
+            self.sync()
+            self._fh.close()
+            self._fh = None
+
+
+class VerifyManifest:
+    """Per-record page sha1, ETag, record sha1 and last verification time"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def entry(self, ascii_id):
+        return self.entries.setdefault(ascii_id, {})
+
+    def verified_at(self, ascii_id):
+        return self.entries.get(ascii_id, {}).get('verified_at', 0)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+class ListingVerifier(AsyncDivisionDistrictScraper):
+    """Conditional re-crawl of cached listing pages that diffs only the pages that changed"""
+
+    def __init__(self, changelog, **kwargs):
+        super().__init__(**kwargs)
+        if self.response_cache is None:
+            raise ValueError("Listing verification needs the response cache (cache_dir)")
+        self.changelog = changelog
+        # Changed pages wait here until the changelog has their diff; leftovers are from a
+        # run that stopped before that, and their changes are found again
+        self.staged = ResponseCache(os.path.join(self.response_cache.cache_dir, 'staged'))
+        for name in os.listdir(self.staged.cache_dir):
+            os.remove(os.path.join(self.staged.cache_dir, name))
+        self.staged_pages = set()
+        self.discarded_pages = []
+        self.page_counts = {}
+        self.old_rows = {}
+        self.new_rows = {}
+        self.verify_stats = {'pages': 0, 'changed_pages': 0, 'parsed_pages': 0, 'failed_pages': 0,
+                             'retry_combinations': 0}
+
+    def verify_order(self):
+        """Every combination, the one whose first page was fetched longest ago first"""
+        def fetched_at(combination):
+            meta = self.response_cache.meta(combination['key'], 1)
+            return meta.get('fetched_at', 0) if meta else 0
+        return sorted(self.all_combinations(), key=fetched_at)
+
+    async def verify_page(self, http, combination, page):
+        """Revalidate one page; returns (changed, previous body, body) or None on failure"""
+        key = combination['key']
+        before = self.response_cache.meta(key, page)
+        previous = self.response_cache.load(key, page) if before else None
+        body = await self.fetch_page(http, combination, page)
+        self.verify_stats['pages'] += 1
+        if body is None:
+            self.verify_stats['failed_pages'] += 1
+            return None
+        return (key, page) in self.staged_pages, previous, body
+
+    def cache_response(self, combination, page, status, body, headers):
+        """Stage a changed page instead of replacing the cached copy the diff still needs"""
+        key = combination['key']
+        if status == 200:
+            meta = self.response_cache.meta(key, page)
+            if meta is None or meta.get('sha1') != hashlib.sha1(body).hexdigest():
+                self.staged.store(key, page, body, headers)
+                self.staged_pages.add((key, page))
+                return body
+        return super().cache_response(combination, page, status, body, headers)
+
+    def commit_staged(self):
+        """Move staged pages into the cache, drop vanished pages and record new page counts"""
+        for key, page in sorted(self.staged_pages):
+            meta = self.staged.meta(key, page)
+            self.response_cache.store(key, page, self.staged.load(key, page),
+                                      {'ETag': meta.get('etag'), 'Last-Modified': meta.get('last_modified')})
+            self.staged.discard(key, page)
+        for key, page in self.discarded_pages:
+            self.response_cache.discard(key, page)
+        for key, total_pages in self.page_counts.items():
+            self.save_progress(key, total_pages, total_pages, completed=True)
+
+    def unstage(self, key):
+        """Drop a combination's staged pages so the cache keeps the old copies to diff next run"""
+        for staged in [staged for staged in self.staged_pages if staged[0] == key]:
+            self.staged.discard(*staged)
+            self.staged_pages.discard(staged)
+
+    async def collect_rows(self, combination, page, previous, body, old_rows, new_rows):
+        """Parse a changed page and its previous copy into the given old/new row maps"""
+        self.verify_stats['changed_pages'] += 1
+        fighters, total_count, _ = await self.parse_page(combination, page, body)
+        self.verify_stats['parsed_pages'] += 1
+        for row in fighters:
+            new_rows[row[FIGHTER_NUMBER_FIELD]] = row
+        if previous is not None:
+            old_fighters, _, _ = await self.parse_page(combination, page, previous)
+            self.verify_stats['parsed_pages'] += 1
+            for row in old_fighters:
+                old_rows.setdefault(row[FIGHTER_NUMBER_FIELD], row)
+        return total_count
+
+    async def verify_combination(self, http, combination):
+        key = combination['key']
+        known_pages = self.progress['completed_combinations'].get(key, {}).get('total_pages', 0)
+        # Rows only join the diff once every page of the combination revalidated
+        old_rows, new_rows = {}, {}
+        failed = []
+        first = await self.verify_page(http, combination, 1)
+        if first is None:
+            self.verify_stats['retry_combinations'] += 1
+            return
+        changed, previous, body = first
+        if changed or not known_pages:
+            if changed:
+                total_count = await self.collect_rows(combination, 1, previous, body, old_rows, new_rows)
+            else:
+                _, total_count, _ = await self.parse_page(combination, 1, body)
+            total_pages = max(-(-total_count // PAGE_SIZE), 1)
+        else:
+            total_pages = known_pages
+
+        async def verify_rest(page):
+            result = await self.verify_page(http, combination, page)
+            if result is None:
+                failed.append(page)
+            elif result[0]:
+                await self.collect_rows(combination, page, result[1], result[2], old_rows, new_rows)
+
+        await asyncio.gather(*(verify_rest(page) for page in range(2, total_pages + 1)))
+        if failed:
+            # A missing page would show up as removed (or its moved rows as added); leave the
+            # whole combination for the next run, which finds the same changes in the cache
+            self.unstage(key)
+            self.verify_stats['retry_combinations'] += 1
+            return
+
+        # Pages past the new end of a shorter list only contribute removals
+        for page in range(total_pages + 1, known_pages + 1):
+            previous = self.response_cache.load(key, page)
+            if previous is not None:
+                old_fighters, _, _ = await self.parse_page(combination, page, previous)
+                for row in old_fighters:
+                    old_rows.setdefault(row[FIGHTER_NUMBER_FIELD], row)
+            self.discarded_pages.append((key, page))
+        if total_pages != known_pages:
+            self.page_counts[key] = total_pages
+        for number, row in old_rows.items():
+            self.old_rows.setdefault(number, row)
+        self.new_rows.update(new_rows)
+
+    async def verify_all(self):
+        if self.parse_workers:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ssl=False)
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=REQUEST_HEADERS) as http:
+            async def bounded(combination):
+                async with semaphore:
+                    await self.verify_combination(http, combination)
+            try:
+                await asyncio.gather(*(bounded(combination) for combination in self.verify_order()))
+            finally:
+                if self.parse_pool is not None:
+                    self.parse_pool.shutdown()
+                    self.parse_pool = None
+
+    def diff_rows(self):
+        """Changelog entries from the old and new rows of changed pages; returns (changed, removed) numbers"""
+        changed, removed = [], []
+        for number in sorted(self.old_rows.keys() | self.new_rows.keys()):
+            old, new = self.old_rows.get(number), self.new_rows.get(number)
+            if old is None:
+                self.changelog.add('added', number, 'listing')
+                changed.append(number)
+            elif new is None:
+                self.changelog.add('removed', number, 'listing')
+                removed.append(number)
+            else:
+                fields = field_diff(old, new)
+                if fields:
+                    self.changelog.add('modified', number, 'listing', fields)
+                    changed.append(number)
+        return changed, removed
+
+    def run_verify(self):
+        """Revalidate the whole listing; returns (changed, removed) fighter numbers"""
+        start_time = time.time()
+        try:
+            asyncio.run(self.verify_all())
+            changed, removed = self.diff_rows()
+            self.changelog.sync()  # The diff is on disk before the cache forgets the old pages
+            self.commit_staged()
+            # New fighters join the CSV the usual way (deduplicated by number)
+            added = self.filter_new_fighters([self.new_rows[number] for number in changed
+                                              if number not in self.old_rows])
+            if added:
+                self.save_fighters_to_csv(added)
+        finally:
+            self.checkpoint_progress()
+            self.sink.close()
+        stats = self.verify_stats
+        print(f"Listing: {stats['pages']} pages revalidated in {time.time() - start_time:.2f} seconds, "
+              f"{stats['changed_pages']} changed ({stats['parsed_pages']} parsed), {stats['failed_pages']} failed")
+        if stats['retry_combinations']:
+            print(f"⚠️  {stats['retry_combinations']} combinations had failed pages and are left for the next run")
+        print(f"Response cache: {self.response_cache.summary()}")
+        return changed, removed
+
+
+class DetailVerifier(DetailScraper):
+    """Revalidates fighters/{id}.json against the details pages, rewriting only changed records"""
+
+    def __init__(self, manifest, changelog, priority=(), max_records=None, max_age=0, **kwargs):
+        super().__init__(**kwargs)
+        self.manifest = manifest
+        self.changelog = changelog
+        self.priority = priority
+        self.max_records = max_records
+        self.max_age = max_age
+        self.stats = {'not_modified': 0, 'unchanged': 0, 'rewritten': 0, 'added': 0,
+                      'removed': 0, 'failed': 0, 'parsed': 0, 'bytes_written': 0}
+
+    def pending(self):
+        """Flagged fighters first, then every record file from least to most recently verified"""
+        seen = set()
+        order = [to_ascii_digits(number) for number in self.priority]
+        stale_before = time.time() - self.max_age
+        existing = [entry.name[:-len('.json')] for entry in os.scandir(self.output_dir)
+                    if entry.name.endswith('.json')]
+        order += sorted((ascii_id for ascii_id in existing if self.manifest.verified_at(ascii_id) < stale_before),
+                        key=self.manifest.verified_at)
+        items = []
+        for ascii_id in order:
+            if ascii_id not in seen:
+                seen.add(ascii_id)
+                items.append((None, 0, ascii_id))
+        return items[:self.max_records] if self.max_records else items
+
+    def report_progress(self, elapsed):
+        print(f"  Verified {self.stats['not_modified'] + self.stats['unchanged'] + self.stats['rewritten']} records "
+              f"({self.stats['rewritten']} rewritten, {self.stats['removed']} removed)")
+
+    async def scrape_one(self, http, row, offset, ascii_id):
+        entry = self.manifest.entry(ascii_id)
+        path = os.path.join(self.output_dir, f"{ascii_id}.json")
+        fighter_number = ascii_id.translate(BENGALI_DIGITS)
+        headers = {'If-None-Match': entry['etag']} if entry.get('etag') else None
+        status, body, response_headers, error = await self.fetch(http, self.detail_url(ascii_id), headers)
+
+        if status is None:
+            self.stats['failed'] += 1
+            return
+        if status == 404:
+            if not entry.get('removed'):
+                self.changelog.add('removed', fighter_number, 'detail')
+                entry['removed'] = True
+                self.stats['removed'] += 1
+        elif status == 304 or hashlib.sha1(body).hexdigest() == entry.get('sha1'):
+            self.stats['not_modified' if status == 304 else 'unchanged'] += 1
+        else:
+            parsed = await self.parse(body)
+            self.stats['parsed'] += 1
+            if parsed is None:
+                self.stats['failed'] += 1
+                return
+            record = build_record(fighter_number, ascii_id, parsed)
+            digest = record_digest(record)
+            old = None
+            if entry.get('record_sha1') != digest and os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    old = json.load(f)
+            if entry.get('record_sha1') == digest or (old is not None and record_digest(old) == digest):
+                self.stats['unchanged'] += 1
+            else:
+                # Logged before the rewrite: afterwards the old record is gone
+                if old is None:
+                    self.changelog.add('added', fighter_number, 'detail')
+                    self.stats['added'] += 1
+                else:
+                    self.changelog.add('modified', fighter_number, 'detail', field_diff(old, record))
+                await asyncio.to_thread(write_record, path, record, self.fsync)
+                self.stats['bytes_written'] += os.path.getsize(path)
+                self.stats['rewritten'] += 1
+            entry.update(sha1=hashlib.sha1(body).hexdigest(), etag=response_headers.get('ETag'),
+                         record_sha1=digest, removed=False)
+        entry['verified_at'] = time.time()
+
+    def run_verify(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        start_time = time.time()
+        try:
+            asyncio.run(self.crawl())
+        finally:
+            self.manifest.save()
+        stats = self.stats
+        print(f"Details: {stats['not_modified'] + stats['unchanged'] + stats['rewritten'] + stats['removed']} records "
+              f"revalidated in {time.time() - start_time:.2f} seconds; {stats['not_modified']} not modified, "
+              f"{stats['unchanged']} unchanged, {stats['rewritten']} rewritten ({stats['parsed']} parsed), "
+              f"{stats['removed']} removed, {stats['failed']} failed")
+
+
+def _written_bytes():
+    """Bytes this process has passed to write() so far (Linux), else 0"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _measure(server, function):
+    from shard_benchmark import quiet
+    requests_before, written_before = server.request_count, _written_bytes()
+    cpu, wall = time.process_time(), time.perf_counter()
+    with quiet():
+        function()
+    return (time.process_time() - cpu, time.perf_counter() - wall,
+            server.request_count - requests_before, _written_bytes() - written_before)
+
+
+def demo(location_file, default_size, concurrency, modified, removed, added):
+    """Fresh crawl, then two mutate + re-verify rounds against a local fake server"""
+    from fake_molwa_server import FakeMolwaServer
+
+    with open(location_file, 'r', encoding='utf-8') as f:
+        location_data = json.load(f)
+    server = FakeMolwaServer(location_data, default_size=default_size)
+    with server, tempfile.TemporaryDirectory() as workdir:
+        paths = {name: os.path.join(workdir, name) for name in
+                 ('listing.csv', 'progress.json', 'cache', 'fighters', 'detail_progress.json',
+                  'manifest.json', 'changelog.jsonl')}
+        common = dict(concurrency=concurrency, requests_per_second=0, parse_workers=0)
+        listing_options = dict(csv_file=paths['listing.csv'], progress_file=paths['progress.json'],
+                               location_file=location_file, base_url=server.base_url,
+                               cache_dir=paths['cache'], concurrency=concurrency, requests_per_second=0)
+
+        def fresh_crawl():
+            AsyncDivisionDistrictScraper(**listing_options).run_scraping()
+            DetailScraper(csv_file=paths['listing.csv'], output_dir=paths['fighters'],
+                          progress_file=paths['detail_progress.json'], base_url=server.base_url,
+                          **common).run_scraper()
+
+        def verify():
+            changelog = ChangeLog(paths['changelog.jsonl'])
+            try:
+                changed, gone = ListingVerifier(changelog, **listing_options).run_verify()
+                DetailVerifier(VerifyManifest(paths['manifest.json']), changelog, priority=changed + gone,
+                               output_dir=paths['fighters'], base_url=server.base_url, **common).run_verify()
+            finally:
+                changelog.close()
+            verify.counts = changelog.counts
+
+        print(f"{'run':<34}{'CPU s':>8}{'wall s':>8}{'requests':>10}{'MB written':>12}  changelog")
+        cpu, wall, sent, written = _measure(server, fresh_crawl)
+        records = sum(1 for _ in iter_rows(paths['listing.csv']))
+        print(f"{f'fresh crawl ({records} fighters)':<34}{cpu:>8.2f}{wall:>8.2f}{sent:>10}{written / 1e6:>12.2f}")
+        for round_number in (1, 2):
+            changes = server.httpd.data.mutate(modified, removed, added, seed=round_number)
+            cpu, wall, sent, written = _measure(server, verify)
+            label = f"re-verify {round_number}" + (' (no manifest yet)' if round_number == 1 else '')
+            expected = {kind: len(numbers) for kind, numbers in changes.items()}
+            print(f"{label:<34}{cpu:>8.2f}{wall:>8.2f}{sent:>10}{written / 1e6:>12.2f}  "
+                  f"{verify.counts} (mutated {expected})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-verify the listing and fighter records, logging what changed')
+    parser.add_argument('--cache-dir', help='Listing response cache of an earlier crawl (skip the listing pass if unset)')
+    parser.add_argument('--csv-file', default='../freedom_fighters_data.csv')
+    parser.add_argument('--progress-file', default='division_district_progress.json')
+    parser.add_argument('--location-file', default='location_data.json')
+    parser.add_argument('--shard-by', choices=SHARD_LEVELS, default='district')
+    parser.add_argument('--fighters-dir', default='fighters')
+    parser.add_argument('--manifest', default='verify_manifest.json', help='Page and record hashes of verified fighters')
+    parser.add_argument('--changelog', default='changelog.jsonl')
+    parser.add_argument('--base-url', default='https://mis.molwa.gov.bd')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rate', type=float, default=10.0, help='Maximum request rate (requests/sec, 0 = unlimited)')
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count(), help='Parser processes (0 = parse on the event loop)')
+    parser.add_argument('--max-records', type=int, help='Revalidate at most this many records (stalest first)')
+    parser.add_argument('--max-age', type=float, default=0,
+                        help='Skip pages and records verified less than this many seconds ago')
+    parser.add_argument('--skip-details', action='store_true')
+    parser.add_argument('--demo', action='store_true', help='Measure re-verification against a fresh crawl on a local fake server')
+    parser.add_argument('--demo-size', type=int, default=30, help='Fighters per district in the demo')
+    parser.add_argument('--demo-changes', default='20,5,5', help='Modified,removed,added fighters per demo round')
+    args = parser.parse_args()
+
+    if args.demo:
+        modified, removed, added = (int(n) for n in args.demo_changes.split(','))
+        demo(args.location_file, args.demo_size, args.concurrency, modified, removed, added)
+        return
+
+    changelog = ChangeLog(args.changelog)
+    changed, removed = [], []
+    try:
+        if args.cache_dir:
+            changed, removed = ListingVerifier(
+                changelog, csv_file=args.csv_file, progress_file=args.progress_file,
+                location_file=args.location_file, base_url=args.base_url, shard_by=args.shard_by,
+                cache_dir=args.cache_dir, cache_max_age=args.max_age, concurrency=args.concurrency,
+                requests_per_second=args.rate, parse_workers=args.parse_workers).run_verify()
+        if not args.skip_details:
+            DetailVerifier(VerifyManifest(args.manifest), changelog, priority=changed + removed,
+                           max_records=args.max_records, max_age=args.max_age, output_dir=args.fighters_dir,
+                           base_url=args.base_url, concurrency=args.concurrency, requests_per_second=args.rate,
+                           parse_workers=args.parse_workers).run_verify()
+    finally:
+        changelog.close()
+    print(f"Changelog ({args.changelog}): {changelog.counts}")
+
+
+if __name__ == "__main__":
+    main()